@@ -6,7 +6,16 @@ import pandas as pd
 import numpy as np
 import warnings
 from SemiPy.helper.plotting import create_scatter_plot
-from SemiPy.helper.wordsimilarity import levenshtein
+from SemiPy.helper.wordsimilarity import levenshtein_batch
+from SemiPy.Datasets.UnitArray import UnitArray, split_unit, unit_to_str, str_to_unit
+from SemiPy.Datasets.RaggedArray import RaggedArray
+from SemiPy.Datasets.SharedArray import SharedArray
+from SemiPy.helper.math import find_nearest_sorted_arg, find_sweep_changes, affine_grid_arg, interp_rows
+from SemiPy.Datasets.ParseCache import parse_cache
+from SemiPy.config.settings import DataSet_Dtype
+from SemiPy.Datasets.Readers import read_data_file, read_data_header, sniff_format, get_reader
+from functools import partial
+from physics.value import Value
 from collections import OrderedDict
 
 
@@ -18,13 +27,19 @@ class BaseDataSet(object):
 
     column_names = []
 
-    def __init__(self, data_path, given_column_names, common_column_names):
+    def __init__(self, data_path, given_column_names, common_column_names, dtype=None):
         """
         Base class for all DataSets
         Args:
             data_path (str or pd.DataFrame): Path to the csv, xls, or txt file or just the actual DataFrame
+            dtype (np.dtype or str): The float dtype the data are stored in, either float64 or float32.  Defaults to the DataSet_Dtype
+             setting (float64 unless changed)
         """
+        self.dtype = np.dtype(DataSet_Dtype if dtype is None else dtype)
+        assert self.dtype in (np.float64, np.float32), 'The dtype of a DataSet must be float64 or float32, not {0}'.format(self.dtype)
+
         self.data_path = data_path
+        self.df = None
         if isinstance(data_path, pd.DataFrame):
             self.df = data_path
 
@@ -41,32 +56,26 @@ class BaseDataSet(object):
 
             self.data_path = data_path
 
-            # now read the data.  If not txt, csv, or xls, raise and error
-            if 'csv' in self.data_path:
-                self.df = pd.read_csv(self.data_path)
-
-            elif 'txt' in self.data_path:
-                try:
-                    self.df = pd.read_csv(self.data_path, encoding='utf-16', sep='\t')
-                except UnicodeError:
-                    self.df = pd.read_csv(self.data_path, encoding='utf-8', sep='\t')
+            # detect the format from the content of the file and only read the header for now.  The data are parsed once the needed
+            # columns are known
+            file_format = sniff_format(self.data_path)
+            header = read_data_header(self.data_path, file_format)
 
-            elif 'xls' in self.data_path:
-                self.df = pd.read_excel(self.data_path)
-
-            else:
-                raise ValueError('The file in data_path is not txt, csv, or xls.  Please change to the correct format')
+        if self.df is not None:
+            header = list(self.df.columns)
 
         # placeholder for the gathered column names
         self.gathered_column_names = {}
+        # the unit of each gathered column (None if the column does not have a unit)
+        self.gathered_column_units = {}
 
         # loop th  rough all the column names
         for i in range(len(self.column_names)):
             # if no column name was given, then try to use common column names
             if given_column_names is None or given_column_names[i] is None:
-                names = self._find_similar_column(common_column_names[i])
+                names = self._find_similar_column(common_column_names[i], header)
             else:
-                names = self._find_similar_column(given_column_names[i])
+                names = self._find_similar_column(given_column_names[i], header)
 
             if names is None:
                 assert not (self.column_names[i] is self.master_dependent or self.column_names[i] is self.master_independent),\
@@ -75,11 +84,18 @@ class BaseDataSet(object):
 
             self.gathered_column_names[self.column_names[i]] = names
 
-    def _find_similar_column(self, names):
+        if self.df is None:
+            # parse only the gathered columns.  Parsing is slow, so use the cached columns if this file has been read before
+            gathered = set(name for names in self.gathered_column_names.values() if names is not None for name in names)
+            self.df = parse_cache.load(self.data_path, reader=partial(read_data_file, file_format=file_format),
+                                       columns=[name for name in header if name in gathered])
+
+    def _find_similar_column(self, names, columns=None):
         """
         Try to find the columns that closely match the names
         Args:
             names (list or str): List of strings or a single string of the column(s) trying to be found
+            columns (list): The column names to search.  Defaults to the columns of the DataFrame
 
         Returns:
             name of the columns
@@ -92,18 +108,24 @@ class BaseDataSet(object):
 
         # loop through looking for subset names.  If two names work, then raise an error.  This could be adjusted later that it defaults
         # to the longer name
+        if columns is None:
+            columns = self.df.columns
         found_column = None
+        found_distances = None
         for name in names:
-            column_names = [col for col in self.df.columns if name.lower() in col.lower()]
+            column_names = [col for col in columns if name.lower() in col.lower()]
             if len(column_names) != 0:
+                # score the name against all of the matching columns at once
+                distances = levenshtein_batch(name, column_names)
                 if result is not None:
                     # if found two words, use the one that has the highest similarity
-                    found = levenshtein(found_column, result[0])
-                    new = levenshtein(name, column_names[0])
+                    found = found_distances[0]
+                    new = distances[0]
                     if found < new:
                         warnings.warn('Two of the names given correspond to columns in the table.  Using {0} for {1} instead of {2} for {3}'.format(result[0], found_column, column_names[0], name))
                         name = found_column
                         column_names = result
+                        distances = found_distances
                     else:
                         warnings.warn(
                             'Two of the names given correspond to columns in the table.  Using {0} for {1} instead of {2} for {3}'.format(
@@ -111,6 +133,7 @@ class BaseDataSet(object):
                 # assert result is None, 'Two of the names given correspond to columns in the table'
                 result = column_names
                 found_column = name
+                found_distances = distances
 
         return result
 
@@ -128,6 +151,9 @@ class BaseDataSet(object):
         assert isinstance(column_data, np.ndarray), 'The column_name must be an np.ndarray'
         assert column_name not in self.df.columns, 'The column_name {0} is already in the dataset'.format(column_name)
 
+        # only the magnitudes are stored in the DataFrame, the unit is saved for the whole column major
+        column_data, unit = split_unit(column_data)
+
         try:
             self.df[column_name] = column_data
         except ValueError:
@@ -141,6 +167,8 @@ class BaseDataSet(object):
                 self.gathered_column_names[column_major_name] = []
             # now add the new column
             self.gathered_column_names[column_major_name].append(column_name)
+            if unit is not None:
+                self.gathered_column_units[column_major_name] = unit
 
     def remove_column(self, column_name):
         """
@@ -185,31 +213,137 @@ class BaseDataSet(object):
         result = self.df[self._get_column_names(column_name)].to_numpy()
         if master_independent_value_range is not None:
             master_column = self.df[self._get_column_names(self.master_independent)].to_numpy()
-            # find the values in each column closest to the min and max values
-            max_index = np.argmin(np.abs(master_column - np.ones(shape=(master_column.shape[-1],)) * master_independent_value_range[1]), axis=0)
-            min_index = np.argmin(np.abs(master_column - np.ones(shape=(master_column.shape[-1],)) * master_independent_value_range[0]), axis=0)
-            # now get the bool array
-            # master_bool = np.logical_and(np.array(master_column, dtype=np.float) <= master_independent_value_range[1],
-            #                              np.array(master_column, dtype=np.float) >= master_independent_value_range[0])
-            # # now make sure the resulting array is square, otherwise raise an error
-            dim = max_index[0] - min_index[0]
-            # num_columns = master_bool.shape[1]
-            # for i in range(master_bool.shape[-1]):
-            temp_result = []
-            for i in range(max_index.shape[0]):
-                assert max_index[i] - min_index[i] == dim,\
-                    "The indexing the column {0} by the master independent value range given {1} has resulted in a" \
-                    " non rectangular array.  Make sure that all {2} master independent columns have the same number" \
-                    " of data points for the given master independent value range".format(column_name,
-                                                                                          master_independent_value_range,
-                                                                                          self.master_independent)
-                temp_result.append(result[min_index[i]:max_index[i], i])
-            # now index the array
-
-            # result = np.transpose(np.array([result[master_bool[:, i], i] for i in range(result.shape[-1])]))
-            # result = np.transpose(np.reshape(result[master_bool], newshape=(num_columns, dim)))
-            result = np.transpose(np.array(temp_result))
-        return result
+            result = self._index_master_independent_range(column_name, np.transpose(result), np.transpose(master_column),
+                                                          master_independent_value_range)
+            if not isinstance(result, RaggedArray):
+                result = np.transpose(result)
+        return self._attach_unit(column_name, result)
+
+    def _index_master_independent_range(self, column_name, column_data, master_column, master_independent_value_range,
+                                        segment_start=None, segment_stop=None, grid=None):
+        """
+        Index the column data by a range of the master independent values.  The master independent is monotonic within a sweep segment,
+        so the indices of the min and max values are found with a binary search on every set at once instead of scanning the columns.
+        Args:
+            column_name (str): The name of the column being indexed
+            column_data (np.ndarray): The column data of shape (number of sets, number of points)
+            master_column (np.ndarray): The master independent data of shape (number of sets, number of points)
+            master_independent_value_range (list): Range of min and max values of the master independent to be indexed
+            segment_start (int or np.ndarray): The first index of the sweep segment of each set.  Defaults to 0
+            segment_stop (int or np.ndarray): The last index (exclusive) of the sweep segment of each set.  Defaults to the end of the
+             monotonic sweep starting at segment_start
+            grid (tuple or None): The (first, step) of the master independent if the sweep segment is an affine grid (see
+             find_affine_grid).  The indices are then computed directly instead of searched for
+
+        Returns:
+            np.ndarray of the indexed column data of shape (number of sets, number of indexed points), or a RaggedArray if the sets have a
+            different number of points in the range
+        """
+        master_column = np.asarray(master_column, dtype=np.float64)
+        num_sets = master_column.shape[0]
+        start = np.zeros(shape=(num_sets,), dtype=int) + (0 if segment_start is None else segment_start)
+        if segment_stop is None:
+            stop = self._get_monotonic_stop(master_column, start)
+        else:
+            stop = np.zeros(shape=(num_sets,), dtype=int) + segment_stop
+
+        # find the values in each column closest to the min and max values
+        min_value, max_value = [np.full(shape=(num_sets,), fill_value=self._column_magnitude(self.master_independent, value))
+                                for value in master_independent_value_range]
+        if grid is not None:
+            first, step = grid
+            min_index = start + affine_grid_arg(first, step, stop - start, min_value)
+            max_index = start + affine_grid_arg(first, step, stop - start, max_value)
+        else:
+            # the sweep direction of each segment (1 for increasing, -1 for decreasing)
+            sets = np.arange(num_sets)
+            direction = np.sign(master_column[sets, stop - 1] - master_column[sets, start])
+            direction[direction == 0] = 1
+            min_index = find_nearest_sorted_arg(master_column, min_value, start, stop, direction)
+            max_index = find_nearest_sorted_arg(master_column, max_value, start, stop, direction)
+
+        # sets with a different number of points in the range are returned as a RaggedArray instead of a padded array
+        dim = np.abs(max_index - min_index)
+        if not np.all(dim == dim[0]):
+            return RaggedArray.from_ranges(column_data, np.minimum(min_index, max_index), dim)
+        return self._index_range(column_data, np.minimum(min_index, max_index), dim[0])
+
+    @staticmethod
+    def _get_monotonic_stop(master_column, start):
+        """
+        Get the end of the monotonic sweep starting at start for every set
+        Args:
+            master_column (np.ndarray): The master independent data of shape (number of sets, number of points)
+            start (np.ndarray): The first index of the sweep of each set
+
+        Returns:
+            np.ndarray of the last index (exclusive) of the sweep of each set
+        """
+        step = np.sign(np.diff(master_column, axis=-1))
+        after_start = np.arange(step.shape[-1]) >= start[:, np.newaxis]
+        # the direction of each sweep is given by the first step that changes the master independent
+        first_step = np.argmax((step != 0) & after_start, axis=-1)
+        direction = step[np.arange(step.shape[0]), first_step]
+        # the sweep ends at the first step in the opposite direction or at the first nan
+        breaks = ((step == -direction[:, np.newaxis]) | np.isnan(step)) & after_start
+        return np.where(np.any(breaks, axis=-1), np.argmax(breaks, axis=-1) + 1, master_column.shape[-1])
+
+    @staticmethod
+    def _index_range(column_data, start, dim):
+        """
+        Index dim points of every set of the column data, starting at the start index of each set
+        Args:
+            column_data (np.ndarray): The column data of shape (number of sets, number of points)
+            start (np.ndarray): The first index of each set
+            dim (int): The number of points to index
+
+        Returns:
+            np.ndarray of shape (number of sets, dim).  This is a view of column_data if the start indices of the sets are equally spaced
+        """
+        if np.all(start == start[0]):
+            return column_data[:, start[0]:start[0] + dim]
+
+        shift = np.diff(start)
+        if np.all(shift == shift[0]) and column_data.dtype != object:
+            # every set is shifted by the same number of points, so a single strided view can index all of the sets
+            return np.lib.stride_tricks.as_strided(column_data[:, start[0]:], shape=(column_data.shape[0], dim),
+                                                   strides=(column_data.strides[0] + shift[0] * column_data.strides[1],
+                                                            column_data.strides[1]),
+                                                   writeable=False)
+
+        return column_data[np.arange(start.shape[0])[:, np.newaxis], start[:, np.newaxis] + np.arange(dim)]
+
+    def _column_magnitude(self, column_name, value):
+        """
+        Get the magnitude of a value in the unit of a column
+        Args:
+            column_name (str): The name of the column
+            value (Value or float): The value
+
+        Returns:
+            float
+        """
+        unit = self.gathered_column_units.get(column_name, None)
+        if isinstance(value, Value) and unit is not None and value.unit.dimensionality == unit.dimensionality:
+            return float(value.adjust_unit(unit))
+        return float(value)
+
+    def _attach_unit(self, column_name, column_data):
+        """
+        Attach the unit of the column to the column data
+        Args:
+            column_name (str): The name of the column
+            column_data (np.ndarray): The column data
+
+        Returns:
+            UnitArray if the column has a unit, otherwise column_data
+        """
+        unit = self.gathered_column_units.get(column_name, None)
+        if unit is None:
+            return column_data
+        if isinstance(column_data, RaggedArray):
+            return RaggedArray(column_data.data, column_data.offsets, unit=unit)
+        return UnitArray(column_data, unit=unit, dtype=self.dtype)
 
     def _get_column_names(self, column_name):
         # # first look if the column name is in the super gathered names list.
@@ -256,9 +390,11 @@ class BaseDataSet(object):
         Returns:
             None
         """
-        new_column = func(self.get_column(column_name))
+        new_column, unit = split_unit(func(self.get_column(column_name)))
 
         self.df[self._get_column_names(column_name)] = new_column
+        if unit is not None:
+            self.gathered_column_units[column_name] = unit
 
     def __assert_valid_column_name(self, column_name):
         assert column_name in self.gathered_column_names.keys(), 'The column name {0} is not in the list of column names {1}'.format(column_name,
@@ -285,6 +421,58 @@ class BaseDataSet(object):
 
         """
         return self.get_column(self.master_independent)
+
+    def __getstate__(self):
+        """
+        Get the state of the DataSet for pickling.  Columns of Values are saved as float arrays and the units as strings, so the pickle
+        does not hold a python object for every data point
+        """
+        return self._pack_state(self.__dict__.copy())
+
+    def __setstate__(self, state):
+        self.__dict__.update(self._unpack_state(state))
+
+    def _pack_state(self, state):
+        """
+        Convert the attributes of the DataSet to their compact pickled form
+        Args:
+            state (dict): A copy of the attributes of the DataSet
+
+        Returns:
+            dict of the pickled state
+        """
+        state['gathered_column_units'] = {column_name: unit_to_str(unit) for column_name, unit in self.gathered_column_units.items()}
+        if not isinstance(state['data_path'], str):
+            # the given DataFrame or dict is the same data as the df
+            state['data_path'] = None
+        if state['df'] is not None:
+            columns = []
+            for column in state['df'].columns:
+                column_data, unit = split_unit(state['df'][column].to_numpy())
+                if unit is None and column_data.dtype == object:
+                    # not a numeric column, so it is saved as is
+                    columns.append((column, column_data, False, None))
+                else:
+                    columns.append((column, np.asarray(column_data, dtype=np.float64), unit is not None, unit_to_str(unit)))
+            state['df'] = columns
+        return state
+
+    def _unpack_state(self, state):
+        """
+        Convert the pickled state of a DataSet back to its attributes
+        Args:
+            state (dict): The pickled state from _pack_state
+
+        Returns:
+            dict of the attributes
+        """
+        state['gathered_column_units'] = {column_name: str_to_unit(unit) for column_name, unit in state['gathered_column_units'].items()}
+        if state['df'] is not None:
+            state['df'] = pd.DataFrame(OrderedDict(
+                (column, Value.array_like(column_data, unit=str_to_unit(unit)) if is_value else column_data)
+                for column, column_data, is_value, unit in state['df']))
+        return state
+
     # def add_super_set(self, set_name, set_values):
     #     """
     #     Add a super set to the DataSet
@@ -305,7 +493,12 @@ class SetDataSet(BaseDataSet):
     def __init__(self, secondary_independent_values=None, *args, **kwargs):
         """
         A DataSet with sub sets within it dictated by the secondary_independent variable.  If there are any duplicate values for the
-        secondary_independent, the first value will be used
+        secondary_independent, the first value will be used.
+
+        The data of all the sets are stored in a single dense array of shape (number of sets, number of points, number of quantities),
+        so columns and sets are returned as views of that array without copying.  Each quantity is only moved from the DataFrame into
+        the data array (and converted to floats) the first time it is used, and its columns are then dropped from the DataFrame.  The
+        DataFrame is released once every quantity is in the data array, so the data are not held twice.
         Args:
             *args:
             **kwargs:
@@ -313,42 +506,498 @@ class SetDataSet(BaseDataSet):
 
         super(SetDataSet, self).__init__(*args, **kwargs)
 
+        # the index of each quantity (i.e. 'vg' or 'id') along the last axis of the data array
+        self._quantity_index = OrderedDict()
+        # placeholder for the data array
+        self._data = None
+        # the DataFrame columns of the quantities that have not been moved into the data array yet
+        self._unloaded_quantities = OrderedDict()
+        # the data array with spare sets and quantities for adding new data, of which self._data is a view (see _reserve)
+        self._buffer = None
+        # the (func, columns it depends on) of the derived quantities, and the derived quantities that need to be (re)computed
+        self._derived_columns = OrderedDict()
+        self._stale_columns = set()
+        # the rows of the sets appended since each derived quantity was computed, which are computed without the other sets
+        self._stale_sets = OrderedDict()
+        # the (SharedArray handle, block, array, owner) if the data array was moved to shared memory (see share_memory)
+        self._shared = None
+
         if self.data_path is not None:
             # now gather what the secondary independent values are for each set
             if secondary_independent_values is None:
                 assert self._get_column_names(self.secondary_independent) is not None,\
                     'Cannot find the required column {0} in the dataset'.format(self.secondary_independent)
-                column_values = self.get_column(self.secondary_independent)[:, 0]
+                column_values, _ = split_unit(self.df[self._get_column_names(self.secondary_independent)].to_numpy()[0])
+                column_values = np.array(column_values, dtype=np.float64)
             else:
-                num_sets = self.get_column(self.master_independent).shape[0]
+                num_sets = len(self._get_column_names(self.master_independent))
                 assert num_sets == len(secondary_independent_values),\
                     'You provided {0} values for {1}, but there are {2} sets'.format(len(secondary_independent_values),
                                                                                      self.secondary_independent, num_sets)
                 column_values = secondary_independent_values
 
+            # the row of each set in the data array, indexed by the secondary independent value
             self.secondary_indep_values = OrderedDict()
 
             # loop through grabbing the values and ignoring any duplicates (always taking the first column)
-            index = 0
+            set_columns = []
             for i in range(len(column_values)):
                 if self.secondary_indep_values.get(column_values[i], None) is None and not np.isnan(column_values[i]):
-                    # now add all the column names to the secondary_indep_values dict
-                    self.secondary_indep_values[column_values[i]] =\
-                        [column[index] for column in self.gathered_column_names.values() if column is not None]
-                    index += 1
-                # else remove all the data from that set
-                else:
-                    self.remove_column(column_name=[columns[index] for columns in self.gathered_column_names.values() if columns is not None])
+                    self.secondary_indep_values[column_values[i]] = len(set_columns)
+                    set_columns.append(i)
 
             # count the number of sets
             self.num_secondary_indep_sets = len(self.secondary_indep_values.keys())
 
+            # the found columns are only moved into the data array when they are first used (see _load_quantity)
+            self._set_columns = set_columns
+            self._data = np.empty(shape=(self.num_secondary_indep_sets, self.df.shape[0], 0), dtype=self.dtype)
+            for column_name, columns in self.gathered_column_names.items():
+                if columns is not None:
+                    self._unloaded_quantities[column_name] = columns
+            # the loaded columns are dropped from a shallow copy, so that a given DataFrame is not changed
+            self.df = self.df.copy(deep=False)
+            self._drop_loaded_columns([])
+
+    @classmethod
+    def stream(cls, data_path, chunk_size=100000, sweeps_per_set=2, *args, **kwargs):
+        """
+        Read a long format data file (all sets stacked in the same columns) in chunks and yield a DataSet for every set, so files much
+        larger than memory can be processed one set at a time.  A set ends when the secondary independent value changes, or when the
+        master independent has changed sweep direction sweeps_per_set times (i.e. after a forward and backward sweep).
+        Args:
+            data_path (str): Path to the text data file
+            chunk_size (int): The number of rows read at a time
+            sweeps_per_set (int): The number of sweep directions in a set.  Use 1 for files of repeated single direction sweeps
+            *args: Passed on to the DataSet of every set
+            **kwargs: Passed on to the DataSet of every set
+
+        Returns:
+            generator of DataSets of type cls
+
+        Example:
+            >>> for idvg in IdVgDataSet.stream(data_path='stress.txt', chunk_size=50000):
+            ...     extractor = FETExtractor(FET=fet, idvg_path=idvg)
+        """
+        reader, file_format = get_reader(data_path)
+        assert file_format.kind == 'text', 'Only text files can be streamed, not {0}'.format(file_format.kind)
+
+        # match the columns on the first row of the file and only read the gathered columns
+        first_row = cls(data_path=reader(data_path, file_format, nrows=1), *args, **kwargs)
+        gathered = first_row.gathered_column_names
+        header = read_data_header(data_path, file_format)
+        columns = [name for name in header if any(names is not None and name in names for names in gathered.values())]
+        master_column = gathered[cls.master_independent][0]
+        secondary_column = gathered[cls.secondary_independent][0] if gathered.get(cls.secondary_independent, None) else None
+
+        remainder = None
+        for chunk in reader(data_path, file_format, usecols=columns, chunksize=chunk_size):
+            remainder = chunk if remainder is None else pd.concat([remainder, chunk], ignore_index=True)
+            set_ends = cls._find_set_ends(remainder[master_column].to_numpy(dtype=np.float64),
+                                          None if secondary_column is None else remainder[secondary_column].to_numpy(dtype=np.float64),
+                                          sweeps_per_set)
+            start = 0
+            for end in set_ends:
+                yield cls(data_path=remainder.iloc[start:end].reset_index(drop=True), *args, **kwargs)
+                start = end
+            remainder = remainder.iloc[start:].reset_index(drop=True)
+
+        if remainder is not None and remainder.shape[0] != 0:
+            yield cls(data_path=remainder, *args, **kwargs)
+
+    @staticmethod
+    def _find_set_ends(master, secondary, sweeps_per_set):
+        """
+        Find the ends of the complete sets in long format data.  The points after the last end may belong to a set that continues in
+        the next chunk
+        Args:
+            master (np.ndarray): The master independent values
+            secondary (np.ndarray or None): The secondary independent values
+            sweeps_per_set (int): The number of sweep directions in a set
+
+        Returns:
+            list of the (exclusive) end index of every complete set
+        """
+        set_ends = []
+        start = 0
+        while True:
+            end = None
+            if secondary is not None:
+                before, after = secondary[start:-1], secondary[start + 1:]
+                changed = (after != before) & ~(np.isnan(after) & np.isnan(before))
+                secondary_change = np.flatnonzero(changed)
+                if secondary_change.size != 0:
+                    end = start + secondary_change[0] + 1
+            sweep_changes = find_sweep_changes(master[start:end])[:, 0]
+            if sweep_changes.size >= sweeps_per_set:
+                end = start + sweep_changes[sweeps_per_set - 1]
+            if end is None:
+                return set_ends
+            set_ends.append(end)
+            start = end
+
     def __assert_secondary_value(self, value):
         assert value in self.secondary_indep_values.keys(),\
             'The secondary value of {0} for {1} is not in the list of secondary values of this dataset {2}'.format(value,
                                                                                                                    self.secondary_independent,
                                                                                                                    list(self.secondary_indep_values.keys()))
 
+    def __assert_valid_quantity(self, column_name):
+        assert column_name in self._quantity_index.keys(), 'The column name {0} is not in the list of column names {1}'.format(
+            column_name, list(self._quantity_index.keys()) + list(self._unloaded_quantities.keys()))
+
+    def _get_quantity_index(self, column_name):
+        """
+        Get the index of a quantity along the last axis of the data array, loading the quantity if it has not been used yet
+        Args:
+            column_name (str): The name of the quantity
+
+        Returns:
+            int
+        """
+        self._load_quantity(column_name)
+        if column_name in self._stale_columns:
+            self._compute_derived_column(column_name)
+        elif column_name in self._stale_sets.keys():
+            self._compute_derived_sets(column_name)
+        self.__assert_valid_quantity(column_name)
+        return self._quantity_index[column_name]
+
+    def add_derived_column(self, column_name, func, depends_on):
+        """
+        Add a column that is computed from other columns.  The column is computed the first time it is used, and computed again the next
+        time it is used after any of the columns it depends on changes (i.e. by adjust_column).  When a set is added by append_sweep, only
+        the new set is computed
+        Args:
+            column_name (str): The name of the derived column
+            func (callable): Called with the columns in depends_on (as from get_column) and returns the data of the derived column of
+             shape (number of sets, number of points).  Only given the new sets after append_sweep, so func must only use its arguments
+            depends_on (list): The names of the columns the derived column is computed from
+
+        Returns:
+            None
+
+        Example:
+            >>> idvg.add_derived_column('resistance', func=lambda vd, id: vd / id, depends_on=['vd', 'id'])
+        """
+        assert isinstance(column_name, str), 'The column_name must be a string'
+        assert column_name not in self._unloaded_quantities.keys() and \
+            (column_name in self._derived_columns.keys() or column_name not in self._quantity_index.keys()),\
+            'The column_name {0} is already in the dataset'.format(column_name)
+        assert column_name not in depends_on, 'The derived column {0} cannot depend on itself'.format(column_name)
+        self._derived_columns[column_name] = (func, tuple(depends_on))
+        self._stale_columns.add(column_name)
+        self._invalidate(column_name)
+
+    def invalidate_column(self, column_name):
+        """
+        Mark a derived column, and the derived columns computed from it, as stale, i.e. when a value its function uses other than the
+        columns it depends on has changed
+        Args:
+            column_name (str): The name of the derived column
+
+        Returns:
+            None
+        """
+        if column_name in self._derived_columns.keys():
+            self._stale_columns.add(column_name)
+        self._invalidate(column_name)
+
+    def _invalidate(self, column_name):
+        """
+        Mark every derived column that depends (directly or through other derived columns) on a column as stale
+        Args:
+            column_name (str): The name of the column that changed
+
+        Returns:
+            None
+        """
+        for name, (_, depends_on) in self._derived_columns.items():
+            if column_name in depends_on and name not in self._stale_columns:
+                self._stale_columns.add(name)
+                self._invalidate(name)
+
+    def _compute_derived_column(self, column_name):
+        """
+        Compute a derived column from the columns it depends on and save it in the data array
+        Args:
+            column_name (str): The name of the derived column
+
+        Returns:
+            None
+        """
+        func, depends_on = self._derived_columns[column_name]
+        self._stale_columns.discard(column_name)
+        self._stale_sets.pop(column_name, None)
+        column_data, unit = split_unit(func(*[self.get_column(name) for name in depends_on]))
+        column_data = np.asarray(column_data)
+        if column_name not in self._quantity_index.keys():
+            self._add_quantity(column_name, column_data, unit)
+            return
+
+        # overwrite the stale data of the quantity
+        self._copy_on_write()
+        quantity = self._quantity_index[column_name]
+        self._data[:, :, quantity] = np.nan
+        self._data[:column_data.shape[0], :column_data.shape[-1], quantity] = column_data
+        if unit is not None:
+            self.gathered_column_units[column_name] = unit
+
+    def _compute_derived_sets(self, column_name):
+        """
+        Compute the stale sets of a derived column (i.e. the sets added by append_sweep) from the same sets of the columns it depends on.
+        The other sets of the derived column are still valid, so they are not computed again
+        Args:
+            column_name (str): The name of the derived column
+
+        Returns:
+            None
+        """
+        func, depends_on = self._derived_columns[column_name]
+        rows = self._stale_sets.pop(column_name)
+        column_data, _ = split_unit(func(*[self.get_column(name)[rows] for name in depends_on]))
+        column_data = np.asarray(column_data)
+
+        self._copy_on_write()
+        quantity = self._quantity_index[column_name]
+        self._data[rows, :, quantity] = np.nan
+        self._data[rows, :column_data.shape[-1], quantity] = column_data
+
+    def _load_quantity(self, column_name):
+        """
+        Move the data of a quantity from the DataFrame into the data array, if it has not been loaded yet
+        Args:
+            column_name (str): The name of the quantity
+
+        Returns:
+            None
+        """
+        columns = self._unloaded_quantities.pop(column_name, None)
+        if columns is not None:
+            column_data, unit = split_unit(self.df[columns].to_numpy())
+            column_data = np.transpose(np.array(column_data, dtype=self.dtype))
+            self._add_quantity(column_name, column_data[[i for i in self._set_columns if i < column_data.shape[0]]], unit)
+            self._drop_loaded_columns(columns)
+
+    def _drop_loaded_columns(self, columns):
+        """
+        Drop the columns of a quantity from the DataFrame once it is in the data array (unless another unloaded quantity uses them), and
+        release the DataFrame once every quantity is loaded
+        Args:
+            columns (list): The DataFrame columns of the quantity
+
+        Returns:
+            None
+        """
+        if len(self._unloaded_quantities) == 0:
+            self.df = None
+            return
+        needed = set(name for names in self._unloaded_quantities.values() for name in names)
+        for column in columns:
+            if column not in needed and column in self.df.columns:
+                del self.df[column]
+
+    def _add_quantity(self, column_name, column_data, unit=None):
+        """
+        Append a new quantity to the last axis of the data array
+        Args:
+            column_name (str): The name of the quantity
+            column_data (np.ndarray): The data of the quantity of shape (number of sets, number of points)
+            unit (pint.unit): The unit of the quantity.  None if the quantity does not have a unit
+
+        Returns:
+            None
+        """
+        self._add_quantities([(column_name, column_data, unit)])
+
+    def _add_quantities(self, quantities):
+        """
+        Append new quantities to the last axis of the data array with a single resize
+        Args:
+            quantities (list): (name, data, unit) of each new quantity (see _add_quantity)
+
+        Returns:
+            None
+        """
+        first = self._data.shape[-1]
+        self._reserve(self._data.shape[0], first + len(quantities))
+        self._data[:, :, first:] = np.nan
+        for quantity, (column_name, column_data, unit) in enumerate(quantities, first):
+            self._data[:column_data.shape[0], :column_data.shape[-1], quantity] = column_data
+            self._quantity_index[column_name] = quantity
+            if unit is not None:
+                self.gathered_column_units[column_name] = unit
+
+    def _reserve(self, num_sets, num_quantities):
+        """
+        Make the data array hold num_sets sets and num_quantities quantities.  The data array is a view of a larger buffer that grows
+        geometrically, so adding sets or quantities one at a time costs amortized O(points x quantities) per set and
+        O(sets x points) per quantity instead of copying the whole data array every time
+        Args:
+            num_sets (int): The new number of sets
+            num_quantities (int): The new number of quantities
+
+        Returns:
+            None
+        """
+        sets, points, quantities = self._data.shape
+        if self._buffer is None or self._data.base is not self._buffer or self._buffer.shape[0] < num_sets or \
+                self._buffer.shape[2] < num_quantities:
+            set_capacity = max(num_sets, 2 * sets) if num_sets > sets else num_sets
+            quantity_capacity = max(num_quantities, 2 * quantities) if num_quantities > quantities else num_quantities
+            self._buffer = np.full(shape=(set_capacity, points, quantity_capacity), fill_value=np.nan, dtype=self._data.dtype)
+            self._buffer[:sets, :, :quantities] = self._data
+        self._data = self._buffer[:num_sets, :, :num_quantities]
+
+    def _secondary_key(self, secondary_value):
+        # the key of a secondary independent value in self.secondary_indep_values
+        return secondary_value
+
+    def append_sweep(self, secondary_value, columns):
+        """
+        Append a new set to the dataset, i.e. when a sweep of a live measurement finishes.  The data of the existing sets are not
+        changed, and the sets are stored with spare capacity, so appending a set costs amortized O(points).
+        Args:
+            secondary_value (float or Value): The value of the secondary independent of the new set
+            columns (dict): The data of the new set for every quantity, i.e. {'vg': vg, 'id': id}.  Must include the master independent.
+             Quantities that are not given are filled with nan
+
+        Returns:
+            None
+        """
+        secondary_value = self._secondary_key(secondary_value)
+        assert secondary_value not in self.secondary_indep_values.keys(),\
+            'The secondary value {0} is already in the dataset'.format(secondary_value)
+        columns = OrderedDict((column_name.lower(), column_data) for column_name, column_data in columns.items())
+        assert self.master_independent in columns.keys(), 'The new set must have the master independent {0}'.format(self.master_independent)
+
+        # every quantity must be in the data array before the number of sets changes
+        for column_name in list(self._unloaded_quantities.keys()):
+            self._load_quantity(column_name)
+
+        # make room for the new set, adding points to the existing sets if the new set is longer
+        num_points = max(np.shape(column_data)[-1] for column_data in columns.values())
+        if num_points > self._data.shape[1]:
+            extra_points = np.full(shape=(self._data.shape[0], num_points - self._data.shape[1], self._data.shape[2]), fill_value=np.nan,
+                                   dtype=self.dtype)
+            self._data = np.concatenate((self._data, extra_points), axis=1)
+        row = self._data.shape[0]
+        self._reserve(row + 1, self._data.shape[-1])
+        # only the new set of the derived quantities is computed when they are next used, the existing sets are still valid
+        for column_name in self._derived_columns.keys():
+            if column_name not in self._stale_columns:
+                self._stale_sets.setdefault(column_name, []).append(row)
+        self._data[row] = np.nan
+        self.secondary_indep_values[secondary_value] = row
+        self.num_secondary_indep_sets = len(self.secondary_indep_values.keys())
+
+        if self.secondary_independent in self._quantity_index.keys() and self.secondary_independent not in columns.keys():
+            columns[self.secondary_independent] = np.full(shape=(num_points,), fill_value=float(secondary_value))
+
+        for column_name, column_data in columns.items():
+            column_data, unit = split_unit(column_data)
+            column_unit = self.gathered_column_units.get(column_name, None)
+            if unit is not None and column_unit is not None and unit != column_unit:
+                column_data = UnitArray(column_data, unit=unit).adjust_unit(column_unit).magnitude
+            if column_name not in self._quantity_index.keys():
+                self._add_quantity(column_name, np.full(shape=self._data.shape[:2], fill_value=np.nan), unit)
+            column_data = np.asarray(column_data, dtype=self.dtype)
+            self._data[row, :column_data.shape[-1], self._quantity_index[column_name]] = column_data
+
+    def __getstate__(self):
+        """
+        Same as BaseDataSet.__getstate__, but every quantity is moved into the data array first, so only the data array (without the
+        spare capacity) is pickled and not the DataFrame.  Derived columns are computed and saved as plain columns, since their functions
+        (usually lambdas) cannot be pickled
+        """
+        self._load_all_quantities()
+        return super(SetDataSet, self).__getstate__()
+
+    def _load_all_quantities(self):
+        # move every quantity into the data array and compute the stale derived columns
+        for column_name in list(self._unloaded_quantities.keys()):
+            self._load_quantity(column_name)
+        for column_name in list(self._stale_columns) + list(self._stale_sets.keys()):
+            self._get_quantity_index(column_name)
+
+    def _is_shared(self):
+        # True if the data array is (still) in the shared memory block.  Adding sets or quantities moves it to a new array
+        return self._shared is not None and self._data is self._shared[2]
+
+    def _copy_on_write(self):
+        # the data array attached from another process is read only, so it is copied before it is changed in place
+        if self._is_shared() and not self._shared[3]:
+            self._data = np.array(self._data)
+
+    def share_memory(self):
+        """
+        Move the data array into a shared memory block, i.e. before sending the DataSet to worker processes.  Pickling the DataSet then
+        only saves the handle of the block instead of the data, and the unpickled DataSet uses the data in the block without copying.
+        The process that shared the data owns the block and should call release_shared_memory when the workers are done
+        Returns:
+            SharedArray handle of the block
+        """
+        if self._is_shared():
+            return self._shared[0]
+        self.release_shared_memory()
+        self._load_all_quantities()
+        handle, block, array = SharedArray.create(self._data)
+        self._data, self._buffer = array, None
+        self._shared = (handle, block, array, True)
+        return handle
+
+    def release_shared_memory(self):
+        """
+        Copy the data array out of the shared memory block and close the block.  The block is freed if this DataSet created it
+        Returns:
+            None
+        """
+        if self._shared is None:
+            return
+        handle, block, array, owner = self._shared
+        if self._data is array:
+            self._data = np.array(array)
+        self._shared = None
+        del array
+        SharedArray.release(block, unlink=owner)
+
+    def _pack_state(self, state):
+        state['df'] = None
+        if self._is_shared():
+            state['_data'] = None
+            state['_shared'] = self._shared[0]
+        else:
+            state['_data'] = np.ascontiguousarray(self._data)
+            state['_shared'] = None
+        state['_buffer'] = None
+        state['_derived_columns'] = OrderedDict()
+        state['_stale_columns'] = set()
+        state['_stale_sets'] = OrderedDict()
+        if 'secondary_indep_values' in state.keys():
+            state['secondary_indep_values'] = [(float(value), unit_to_str(getattr(value, 'unit', None)), row)
+                                               for value, row in self.secondary_indep_values.items()]
+        return super(SetDataSet, self)._pack_state(state)
+
+    def _unpack_state(self, state):
+        state = super(SetDataSet, self)._unpack_state(state)
+        if state.get('_shared', None) is not None:
+            # attach to the shared data array instead of loading a copy
+            handle = state['_shared']
+            block, array = handle.attach()
+            array.flags.writeable = False
+            state['_data'] = array
+            state['_shared'] = (handle, block, array, False)
+        if 'secondary_indep_values' in state.keys():
+            state['secondary_indep_values'] = OrderedDict(
+                (value if unit is None else Value(value=value, unit=str_to_unit(unit)), row)
+                for value, unit, row in state['secondary_indep_values'])
+        return state
+
+    def _view(self, column_data):
+        # make the view read only so the data array can only be changed through the DataSet functions
+        column_data.flags.writeable = False
+        return column_data
+
     # def add_super_set(self, set_name, set_values):
     #     # same as DataSet, but adds the
 
@@ -360,15 +1009,127 @@ class SetDataSet(BaseDataSet):
             return_set_values (bool): If True, return the columns and corresponding set values
 
         Returns:
-            np.ndarray
+            np.ndarray of shape (number of sets, number of points)
         """
-        # same as super class, just make sure the shape is column, row not row, column
-        column_data = np.transpose(super(SetDataSet, self).get_column(column_name, master_independent_value_range))
+        column_data = self._get_column_data(column_name, master_independent_value_range)
         if return_set_values:
-            return column_data, list([key for key in self.secondary_indep_values.keys()
-                                      if self.gathered_column_names[column_name]])
+            return column_data, self.get_secondary_indep_values()
         return column_data
 
+    def resample(self, column_names, grid=None, num_points=None, value_range=None, segment_start=None, segment_stop=None):
+        """
+        Linearly interpolate columns of every set onto a common grid of master independent values, i.e. to compare devices at the same
+        carrier density.  All sets and columns are interpolated in one batched call
+        Args:
+            column_names (str or list): The name of the column (or names of the columns) to resample
+            grid (np.ndarray or None): The common grid of master independent values.  If None, num_points evenly spaced values are used
+             over the range covered by every set
+            num_points (int or None): The number of points of the automatic grid.  Defaults to the largest number of points of any set
+             within the range of the grid
+            value_range (list or None): [min, max] bounds of the automatic grid.  Either can be None
+            segment_start (int or np.ndarray): The first index of the sweep segment to resample.  Defaults to 0
+            segment_stop (int or np.ndarray): The last index (exclusive) of the sweep segment to resample.  Defaults to the end of the
+             monotonic sweep starting at segment_start
+
+        Returns:
+            grid, and the resampled column (or list of columns if column_names is a list) of shape (number of sets, number of grid
+            points).  Grid values outside the range of a set are nan
+        """
+        names = [column_names] if isinstance(column_names, str) else list(column_names)
+        quantities = [self._get_quantity_index(name.lower()) for name in names]
+        master_column = self._data[:, :, self._get_quantity_index(self.master_independent)]
+
+        num_sets = master_column.shape[0]
+        start = np.zeros(shape=(num_sets,), dtype=int) + (0 if segment_start is None else segment_start)
+        if segment_stop is None:
+            stop = self._get_monotonic_stop(master_column, start)
+        else:
+            stop = np.zeros(shape=(num_sets,), dtype=int) + segment_stop
+
+        if grid is None:
+            grid = self._get_common_grid(master_column, start, stop, num_points, value_range)
+        else:
+            grid, unit = split_unit(grid)
+            master_unit = self.gathered_column_units.get(self.master_independent, None)
+            if unit is not None and master_unit is not None:
+                grid = UnitArray(grid, unit=unit).adjust_unit(master_unit).magnitude
+            grid = np.asarray(grid, dtype=np.float64)
+
+        columns = interp_rows(master_column, [self._data[:, :, quantity] for quantity in quantities], grid, start, stop)
+        columns = [self._attach_unit(name.lower(), column_data) for name, column_data in zip(names, columns)]
+        return self._attach_unit(self.master_independent, grid), columns[0] if isinstance(column_names, str) else columns
+
+    def _get_common_grid(self, master_column, start, stop, num_points=None, value_range=None):
+        """
+        Get an evenly spaced grid over the range of master independent values covered by every set
+        Args:
+            master_column (np.ndarray): The master independent data of shape (number of sets, number of points)
+            start (np.ndarray): The first index of the sweep segment of each set
+            stop (np.ndarray): The last index (exclusive) of the sweep segment of each set
+            num_points (int or None): The number of points of the grid.  Defaults to the largest number of points of any set within the
+             range of the grid
+            value_range (list or None): [min, max] bounds of the grid.  Either can be None
+
+        Returns:
+            np.ndarray of the grid
+        """
+        points = np.arange(master_column.shape[1])
+        in_segment = (points >= start[:, np.newaxis]) & (points < stop[:, np.newaxis])
+        low = np.max(np.min(np.where(in_segment, master_column, np.inf), axis=-1))
+        high = np.min(np.max(np.where(in_segment, master_column, -np.inf), axis=-1))
+        if value_range is not None:
+            if value_range[0] is not None:
+                low = max(low, self._column_magnitude(self.master_independent, value_range[0]))
+            if value_range[1] is not None:
+                high = min(high, self._column_magnitude(self.master_independent, value_range[1]))
+        assert low < high, 'The sets do not have a common range of {0} values to resample to'.format(self.master_independent)
+
+        if num_points is None:
+            num_points = int(np.max(np.sum(in_segment & (master_column >= low) & (master_column <= high), axis=-1)))
+        return np.linspace(low, high, max(num_points, 2))
+
+    def get_ragged_column(self, column_name):
+        """
+        Get a column without the nan padding of the sets with fewer points
+        Args:
+            column_name (str): The name of the column
+
+        Returns:
+            RaggedArray with the points of each set
+        """
+        column_data = self._get_column_data(column_name)
+        # the sets are padded at the end, so the number of points of each set is the number of master independent values
+        lengths = np.sum(~np.isnan(self._data[:, :, self._get_quantity_index(self.master_independent)]), axis=-1)
+        return RaggedArray.from_padded(column_data, lengths=lengths)
+
+    def _get_column_data(self, column_name, master_independent_value_range=None, segment_start=None, segment_stop=None, grid=None):
+        """
+        Get the data of a column, optionally indexed by a range of the master independent values within a sweep segment
+        Args:
+            column_name (str): The name of the column
+            master_independent_value_range (list or None): Range of min and max values of the master independent to be indexed
+            segment_start (int or np.ndarray): The first index of the sweep segment used for the range.  Defaults to 0
+            segment_stop (int or np.ndarray): The last index (exclusive) of the sweep segment used for the range.  Defaults to the end of
+             the monotonic sweep starting at segment_start
+            grid (tuple or None): The (first, step) of the master independent if the sweep segment is an affine grid
+
+        Returns:
+            np.ndarray of shape (number of sets, number of points), or a RaggedArray if the sets have a different number of points in the
+            master independent value range
+        """
+        column_name = column_name.lower()
+
+        # load the quantities before indexing the data array, since loading a quantity replaces the array
+        quantity = self._get_quantity_index(column_name)
+        master_quantity = self._get_quantity_index(self.master_independent) if master_independent_value_range is not None else None
+
+        column_data = self._view(self._data[:, :, quantity])
+        if master_independent_value_range is not None:
+            master_column = self._data[:, :, master_quantity]
+            column_data = self._index_master_independent_range(column_name, column_data, master_column, master_independent_value_range,
+                                                               segment_start, segment_stop, grid)
+        return self._attach_unit(column_name, column_data)
+
     def adjust_column(self, column_name, func):
         """
         Similar to adjust_column for DataSet but deals with 2D arrays
@@ -391,17 +1152,6 @@ class SetDataSet(BaseDataSet):
         #     # new_column_name = '{0}_{1}'.format(column_name, i)
         #     super(SetDataSet, self).adjust_column(self.gathered_column_names, column_data[i, :])
 
-    def __get_column_name_secondary_value(self, column_name, secondary_value):
-
-        self.__assert_secondary_value(secondary_value)
-        secondary_column_names = self.secondary_indep_values[secondary_value]
-
-        # get all the columns for that name
-        column_names = self._get_column_names(column_name)
-
-        # now return any overlapping names in the two lists
-        return list(set(column_names).intersection(secondary_column_names))
-
     def get_set_indexed_columns(self, column_name):
         """
         Get a dictionary of columns with keys being the set values
@@ -428,22 +1178,11 @@ class SetDataSet(BaseDataSet):
         Returns:
             np.ndarray of the column
         """
+        quantity = self._get_quantity_index(column_name)
+        self.__assert_secondary_value(secondary_value)
 
-
-        # get the index of that value
-
-        # column_name = column_name.lower()
-
-        # assert column_name in self.column_names, 'The column name {0} is not in the list of column names {1}'.format(column_name,
-        #                                                                                                              self.column_names)
-        # now return the column
-        # column_names = self._get_column_names(column_name)
-        # only grab columns from that set.
-        columns = self.__get_column_name_secondary_value(column_name, secondary_value)
-        result = self.df[columns].to_numpy()
-        assert result.shape[1] == 1, 'You are attempting to grab multiple columns for a single secondary_value, which should not be' \
-                                     ' possible.  You have found a bug, congrats.  Please report'
-        return result[:, 0]
+        result = self._data[self.secondary_indep_values[secondary_value], :, quantity]
+        return self._attach_unit(column_name, self._view(result))
 
     def __assert_valid_column(self, column_name, column_data):
         """
@@ -456,7 +1195,8 @@ class SetDataSet(BaseDataSet):
 
         """
         assert isinstance(column_data, np.ndarray), 'The column_data must be of type np.ndarray, not {0}'.format(type(column_data))
-        # assert column_data.shape[0] == len(self.secondary_indep_values.keys())
+        assert column_data.shape[-1] <= self._data.shape[1], 'The column_data has {0} points, but the sets in this dataset only have' \
+                                                             ' {1} points'.format(column_data.shape[-1], self._data.shape[1])
 
     def add_column(self, column_name, column_data, secondary_indep_value=None):
         """
@@ -468,20 +1208,80 @@ class SetDataSet(BaseDataSet):
         Returns:
             None
         """
+        assert isinstance(column_name, str), 'The column_name must be a string'
         self.__assert_valid_column(column_name, column_data)
 
+        column_data, unit = split_unit(column_data)
+
         if secondary_indep_value is not None:
             self.__assert_secondary_value(secondary_indep_value)
-            new_column_name = '{0}_{1}'.format(column_name, secondary_indep_value)
-            self.secondary_indep_values[secondary_indep_value].append(new_column_name)
-            super(SetDataSet, self).add_column(new_column_name, column_data, column_major_name=column_name)
-
-        # now add each new column to the dataset
+            # add the quantity for all sets (if it does not exist yet) and then fill in the data of the set
+            self._load_quantity(column_name)
+            if column_name not in self._quantity_index.keys():
+                self._add_quantity(column_name, np.full(shape=self._data.shape[:2], fill_value=np.nan), unit)
+            self._copy_on_write()
+            self._data[self.secondary_indep_values[secondary_indep_value], :len(column_data),
+                       self._quantity_index[column_name]] = column_data
+            self._invalidate(column_name)
+
+        # now add the new quantity to the dataset
         else:
-            for i, key in enumerate(self.secondary_indep_values.keys()):
-                new_column_name = '{0}_{1}'.format(column_name, i)
-                self.secondary_indep_values[key].append(new_column_name)
-                super(SetDataSet, self).add_column(new_column_name, column_data[i, :], column_major_name=column_name)
+            assert column_name not in self._quantity_index.keys() and column_name not in self._unloaded_quantities.keys() and \
+                column_name not in self._derived_columns.keys(), 'The column_name {0} is already in the dataset'.format(column_name)
+            self._add_quantity(column_name, column_data, unit)
+            self._invalidate(column_name)
+
+    def remove_column(self, column_name):
+        """
+        Remove a column from the DataSet
+        Args:
+            column_name (str or list): The name of the column to be removed.
+
+        Returns:
+            None
+        """
+        if isinstance(column_name, str):
+            column_name = [column_name]
+        for name in column_name:
+            # the columns derived from the removed column can no longer be computed, so they are marked stale to fail when used
+            self._invalidate(name)
+            if self._derived_columns.pop(name, None) is not None:
+                self._stale_columns.discard(name)
+                self._stale_sets.pop(name, None)
+                if name not in self._quantity_index.keys():
+                    continue
+            columns = self._unloaded_quantities.pop(name, None)
+            if columns is not None:
+                # the quantity was never moved into the data array
+                self.gathered_column_units.pop(name, None)
+                self._drop_loaded_columns(columns)
+                continue
+            self.__assert_valid_quantity(name)
+            self._data = np.delete(self._data, self._quantity_index.pop(name), axis=-1)
+            self.gathered_column_units.pop(name, None)
+        # now reindex the remaining quantities
+        self._quantity_index = OrderedDict((name, i) for i, name in enumerate(self._quantity_index.keys()))
+
+    def add_columns(self, columns):
+        """
+        Add several new columns to the dataset at once.  All of the columns are written into the data array with a single resize
+        Args:
+            columns (dict): The data of each new column, of shape (number of sets, number of points)
+
+        Returns:
+            None
+        """
+        quantities = []
+        for column_name, column_data in columns.items():
+            assert isinstance(column_name, str), 'The column_name must be a string'
+            self.__assert_valid_column(column_name, column_data)
+            assert column_name not in self._quantity_index.keys() and column_name not in self._unloaded_quantities.keys() and \
+                column_name not in self._derived_columns.keys(), 'The column_name {0} is already in the dataset'.format(column_name)
+            column_data, unit = split_unit(column_data)
+            quantities.append((column_name, np.asarray(column_data), unit))
+        self._add_quantities(quantities)
+        for column_name in columns.keys():
+            self._invalidate(column_name)
 
     def update_column_data(self, column_name, column_data):
         """
@@ -493,11 +1293,16 @@ class SetDataSet(BaseDataSet):
         Returns:
             None
         """
+        quantity = self._get_quantity_index(column_name)
         self.__assert_valid_column(column_name, column_data)
 
-        # now loop through the rows in column_data and adjust the columns
-        for i, row in enumerate(column_data):
-            self.df[self.gathered_column_names[column_name][i]] = row
+        column_data, unit = split_unit(column_data)
+        if unit is not None:
+            self.gathered_column_units[column_name] = unit
+
+        self._copy_on_write()
+        self._data[:, :, quantity] = column_data
+        self._invalidate(column_name)
 
     def get_secondary_indep_values(self):
         """
@@ -507,6 +1312,18 @@ class SetDataSet(BaseDataSet):
         """
         return list(self.secondary_indep_values.keys())
 
+    def has_column(self, column_name):
+        """
+        Check if a column is in the dataset (loaded, not loaded yet, or derived)
+        Args:
+            column_name (str): The name of the column
+
+        Returns:
+            bool
+        """
+        return column_name in self._quantity_index.keys() or column_name in self._unloaded_quantities.keys() or \
+            column_name in self._derived_columns.keys()
+
     def add_column_set(self, column_name, column_data, secondary_value):
         """
         Similar to add_column, but allows adding a column specifically to a set indexed by the secondary value a column to the dataset
@@ -518,11 +1335,4 @@ class SetDataSet(BaseDataSet):
         Returns:
             None
         """
-        assert isinstance(column_name, str), 'The column_name must be a string'
-        assert isinstance(column_data, np.ndarray), 'The column_name must be an np.ndarray'
-        self.__assert_secondary_value(secondary_value)
-        assert column_name not in self.df.columns, 'The column_name {0} is already in the dataset'.format(column_name)
-
-        raise NotImplementedError('Need to finish')
-
-        self.df[column_name] = column_data
+        self.add_column(column_name, column_data, secondary_indep_value=secondary_value)
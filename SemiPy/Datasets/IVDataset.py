@@ -2,6 +2,8 @@
 DataSet for IdVg data
 """
 from SemiPy.Datasets.Dataset import SetDataSet
+from SemiPy.Datasets.UnitArray import split_unit
+from SemiPy.helper.math import find_sweep_changes, find_affine_grid
 from SemiPy.config.globals import common_drain_current_names, common_drain_voltage_names, common_gate_current_names, common_gate_voltage_names,\
     common_source_current_names, common_source_voltage_names
 import numpy as np
@@ -30,60 +32,143 @@ class BiDirectionalDataSet(SetDataSet):
         """
         if common_column_names is None:
             common_column_names = self.column_names
+        # the parsed column names of get_column requests (see _check_fwd_bwd)
+        self._column_requests = {}
         super(BiDirectionalDataSet, self).__init__(given_column_names=given_column_names, common_column_names=common_column_names, *args, **kwargs)
 
-        # now divide the data into fwd, bwd sweeps, if they exist
-        # get the args where the master independent changes sign.  If there are multiple for each row, raise an error
-        # change_i = np.argwhere(np.diff(np.array(self.get_column(self.master_independent), dtype=np.float)) == 0.0)
-        change_i, self.sweep_number = self._get_sweep_index()
-        # self.sweep_number = ((change_i.shape[0]) / self.num_secondary_indep_sets) + 1
-        assert self.sweep_number < 3, 'IV sweeps can only have a single direction or a forward and backward.' \
-                                      '  Yours has {0} sweep directions'.format(self.sweep_number)
-
-        if self.sweep_number > 1:
-            assert np.all(change_i[:, 1] == change_i[1, 1]), 'All IV sweeps must have the same number of x data points'
-        # now save the change point
-        self.change_i = change_i[0, 1]
+        # now divide the data into sweeps.  Every change in sweep direction of every set is found at once and saved as the start and stop
+        # index of every sweep of every set, so the sweeps never have to be searched for again
+        self.sweep_segments = self._get_sweep_segments(self.get_column(self.master_independent))
+        self.sweep_number = self.sweep_segments.shape[1]
+        # now save the first change point (i.e. between the forward and backward sweeps)
+        self.change_i = self.sweep_segments[0, 0, 1] if self.sweep_number > 1 else self._data.shape[1] + 1
+        # the (first, step) of every sweep that is an affine grid, so that value ranges are indexed without searching the sweeps
+        self.sweep_grids = self._get_sweep_grids()
 
         # now convert the secondary independents to values
         self._convert_secondary_independent_to_value()
 
-        # convert all the columns to Values
+        # save the unit of every column, unless the data were given as Values that already have units
         for column, unit in zip(self.column_names, self.column_units):
-            if self.gathered_column_names[column] is not None and not isinstance(self.get_column(column).flat[0], Value):
-                self.adjust_column(column, func=self._convert_to_value(unit=unit))
+            if self.gathered_column_names[column] is not None and self.gathered_column_units.get(column, None) is None:
+                self.gathered_column_units[column] = unit
+
+    @property
+    def num_cycles(self):
+        """
+        The number of sweep cycles in each set.  A cycle is a forward sweep followed by a backward sweep
+        """
+        return (self.sweep_number + 1) // 2
+
+    def _get_sweep_segments(self, master_column):
+        """
+        Get the segment index of the sweeps by finding every change in sweep direction of every set in one pass
+        Args:
+            master_column (np.ndarray): The master independent data of shape (number of sets, number of points)
+
+        Returns:
+            np.ndarray of shape (number of sets, number of sweeps, 2) with the start and stop (exclusive) index of every sweep
+        """
+        master_column = np.asarray(master_column, dtype=np.float64)
+        num_sets = master_column.shape[0]
+
+        # the changes are found accounting for duplicate final points i.e. Vg = [1, 2, 3, 3, 2, 1] => [3]
+        change_i = find_sweep_changes(master_column)
+        num_changes = np.bincount(change_i[:, 0], minlength=num_sets)
+        assert np.all(num_changes == num_changes[0]),\
+            'All IV sets must have the same number of sweeps, but the sets have {0} sweeps'.format(num_changes + 1)
+        change_i = change_i[:, 1].reshape(num_sets, num_changes[0])
+        assert np.all(change_i == change_i[0]), 'All IV sweeps must have the same number of x data points'
+
+        segments = np.zeros(shape=(num_sets, num_changes[0] + 1, 2), dtype=int)
+        segments[:, 1:, 0] = change_i
+        segments[:, :-1, 1] = change_i
+        # sets with fewer points are padded with nan at the end
+        segments[:, -1, 1] = np.sum(~np.isnan(master_column), axis=-1)
+        return segments
+
+    def _get_sweep_grids(self, master_column=None, sweep_segments=None):
+        """
+        Get the affine grid of every sweep of the master independent (i.e. a np.linspace Vg sweep).  If all sets have the same grid for
+        a sweep, the first value and step are saved once for all of the sets
+        Args:
+            master_column (np.ndarray): The master independent data of shape (number of sets, number of points).  Defaults to the master
+             independent of all sets
+            sweep_segments (np.ndarray): The sweep segments of the sets in master_column.  Defaults to the segments of all sets
+
+        Returns:
+            list with the (first, step) of each sweep, or None for sweeps that are not affine grids
+        """
+        if master_column is None:
+            master_column = self._data[:, :, self._get_quantity_index(self.master_independent)]
+            sweep_segments = self.sweep_segments
+        # the grids of all sweeps are found at once
+        first, step = find_affine_grid(master_column, sweep_segments[..., 0], sweep_segments[..., 1])
+        affine = ~np.any(np.isnan(first), axis=0)
+        shared = np.all(np.isclose(first, first[0]) & np.isclose(step, step[0]), axis=0)
+        return [None if not affine[sweep] else (float(first[0, sweep]), float(step[0, sweep])) if shared[sweep] else
+                (first[:, sweep], step[:, sweep]) for sweep in range(sweep_segments.shape[1])]
 
     @staticmethod
-    def _convert_to_value(unit):
-        # creates a lambda function for converting values to a unit
-        return lambda x: Value.array_like(x, unit=unit)
+    def _merge_sweep_grid(grid, new_grid, num_sets):
+        # a sweep is only an affine grid if it is one in every set
+        if grid is None or new_grid is None:
+            return None
+        # keep the shared grid if the new set has the same grid, otherwise the grid of every set is saved
+        if not isinstance(grid[0], np.ndarray) and np.isclose(grid[0], new_grid[0]) and np.isclose(grid[1], new_grid[1]):
+            return grid
+        return tuple(np.append(np.broadcast_to(value, (num_sets,)), new_value) for value, new_value in zip(grid, new_grid))
+
+    def _get_sweeps(self, cycle=None, direction=None):
+        """
+        Get the first and last sweep of a cycle and direction
+        Args:
+            cycle (int or None): The index of the cycle.  Defaults to the first cycle if a direction is given
+            direction (str or None): 'fwd' or 'bwd'.  If None, both sweeps of the cycle
 
-    def _get_sweep_index(self, array=None):
+        Returns:
+            (first sweep, last sweep) or None if neither cycle nor direction is given
         """
-        Get the index where the sweep direction changes
+        if cycle is None and direction is None:
+            return None
+        cycle = 0 if cycle is None else cycle
+        assert direction in (None, 'fwd', 'bwd'), 'The direction must be fwd or bwd, not {0}'.format(direction)
+        assert 0 <= cycle < self.num_cycles, 'There are {0} cycles in this dataset, so cycle {1} does not exist'.format(self.num_cycles,
+                                                                                                                      cycle)
+        first = 2 * cycle + (1 if direction == 'bwd' else 0)
+        last = min(2 * cycle + (0 if direction == 'fwd' else 1), self.sweep_number - 1)
+        assert first <= last, 'Cycle {0} of this dataset does not have a {1} sweep'.format(cycle, direction)
+        return first, last
+
+    def get_sweep_slice(self, direction, cycle=None):
+        """
+        Get the slice of a sweep along the points axis of the columns, i.e. to split columns given to a derived column function into sweeps
         Args:
-            array (np.ndarray): Defaults to the master_independent column data unless a different array is givem
+            direction (str): 'fwd' or 'bwd'
+            cycle (int or None): The cycle of the sweep.  Defaults to the first cycle
 
         Returns:
-            np.ndarray with all the index points of change in sweep direction
-            number of sweeps in each column
+            slice
         """
-        if array is None:
-            array = np.array(self.get_column(self.master_independent), dtype=np.float)
-        else:
-            array = np.array(array, dtype=np.float)
-        # this formula will find the point of change in sweep direction accounting for duplicate final points i.e. Vg = [1, 2, 3, 3, 2, 1] => change_i = [2]
-        change_i = np.argwhere(np.abs(np.diff(np.sign(array[..., 2:] - array[..., :-2]))) == 2.0) + 1
-
-        # now get the number of sweeps
-        number_of_sweeps = ((change_i.shape[0]) / self.num_secondary_indep_sets) + 1
-        # if there are now switches in direction, then make the last i the change point
-        if len(change_i) == 0:
-            change_i = np.array([[i + 1, array.shape[1]] for i in range(array.shape[0])])
-            number_of_sweeps = 1
-        return change_i + 1, number_of_sweeps
+        if self.sweep_number == 1:
+            # the same as the _fwd and _bwd columns of a single sweep dataset
+            return slice(None)
+        return self._sweep_slice(self._get_sweeps(cycle, direction))
+
+    def _sweep_slice(self, sweeps):
+        # the slice of the sweeps along the points axis.  All sets have the same change points, and the last sweep includes the
+        # padding of shorter sets so that the columns stay rectangular
+        first, last = sweeps
+        stop = None if last == self.sweep_number - 1 else self.sweep_segments[0, last, 1]
+        return slice(self.sweep_segments[0, first, 0], stop)
 
     def _check_fwd_bwd(self, column_name):
+        # the parsing of the column name is saved, since it is done for every get_column
+        if column_name not in self._column_requests.keys():
+            self._column_requests[column_name] = self.__parse_fwd_bwd(column_name)
+        return self._column_requests[column_name]
+
+    def __parse_fwd_bwd(self, column_name):
         # check if fwd or bwd are in the column name
         if '_fwd' in column_name:
             if self.sweep_number == 1:
@@ -100,51 +185,116 @@ class BiDirectionalDataSet(SetDataSet):
         else:
             return column_name, False, False
 
-    def get_column(self, column_name, return_set_values=False, master_independent_value_range=None):
+    def get_column(self, column_name, return_set_values=False, master_independent_value_range=None, cycle=None, direction=None):
         """
 
         Args:
             column_name:
             return_set_values:
             master_independent_value_range (list or None): List of range of desired values.
+            cycle (int or None): Only get the sweeps of this cycle (a forward and backward sweep).  Column names ending in _fwd or _bwd
+             default to the first cycle
+            direction (str or None): Only get the 'fwd' or 'bwd' sweep of the cycle
 
         Returns:
 
+        Example:
+            >>> stress.get_column('id', cycle=10, direction='bwd')
         """
         # add logic to deal with fwd and bwd requests
-        column_name, fwd, bwd = self._check_fwd_bwd(column_name)
-
-        column_data = super(BiDirectionalDataSet, self).get_column(column_name, return_set_values,
-                                                                   master_independent_value_range)
-        # if the column was indexed, we need to locate the new inflection point
-        if master_independent_value_range is not None and (fwd or bwd):
-            change_i, _ = self._get_sweep_index(array=super(BiDirectionalDataSet, self).get_column(self.master_independent,
-                                                                                                False, master_independent_value_range))
-            # if no inflection point, then just return the column data
-            if len(change_i) == 0:
-                return column_data
-            change_i = change_i[1, 1]
-        elif fwd or bwd:
-            change_i = self.change_i
-        if fwd:
-            column_data = column_data[..., :change_i]
-        elif bwd:
-            column_data = column_data[..., change_i:]
+        column_name, sweeps = self._parse_sweeps(column_name, cycle, direction)
+
+        if sweeps is None:
+            column_data = self._get_column_data(column_name, master_independent_value_range)
+        elif master_independent_value_range is not None:
+            # only search for the range within the sweep
+            assert sweeps[0] == sweeps[1], 'A master independent value range can only be indexed within a single sweep direction'
+            segment = self.sweep_segments[:, sweeps[0]]
+            column_data = self._get_column_data(column_name, master_independent_value_range, segment_start=segment[:, 0],
+                                                segment_stop=segment[:, 1], grid=self.sweep_grids[sweeps[0]])
+        else:
+            # a view of the sweeps
+            column_data = self._get_column_data(column_name)[..., self._sweep_slice(sweeps)]
 
+        if return_set_values:
+            return column_data, self.get_secondary_indep_values()
         return column_data
 
-    def get_column_set(self, column_name, secondary_value):
-        column_name, fwd, bwd = self._check_fwd_bwd(column_name)
+    def resample(self, column_names, grid=None, num_points=None, value_range=None, cycle=None, direction=None):
+        """
+        Same as SetDataSet.resample, but resamples a single sweep
+        Args:
+            column_names (str or list): The name of the column (or names of the columns) to resample
+            grid (np.ndarray or None): The common grid of master independent values.  If None, an evenly spaced grid over the range
+             covered by every set is used
+            num_points (int or None): The number of points of the automatic grid
+            value_range (list or None): [min, max] bounds of the automatic grid
+            cycle (int or None): The cycle of the sweep.  Defaults to the first cycle
+            direction (str or None): 'fwd' or 'bwd'.  Defaults to the fwd sweep
+
+        Returns:
+            grid, and the resampled column (or list of columns) of shape (number of sets, number of grid points)
+        """
+        first, last = self._get_sweeps(cycle, 'fwd' if direction is None else direction)
+        segment = self.sweep_segments[:, first]
+        return super(BiDirectionalDataSet, self).resample(column_names, grid=grid, num_points=num_points, value_range=value_range,
+                                                          segment_start=segment[:, 0], segment_stop=segment[:, 1])
+
+    def get_column_set(self, column_name, secondary_value, cycle=None, direction=None):
+        column_name, sweeps = self._parse_sweeps(column_name, cycle, direction)
 
         column_data = super(BiDirectionalDataSet, self).get_column_set(column_name, secondary_value)
 
-        if fwd:
-            column_data = column_data[..., :self.change_i]
-        elif bwd:
-            column_data = column_data[..., self.change_i:]
+        if sweeps is not None:
+            column_data = column_data[..., self._sweep_slice(sweeps)]
 
         return column_data
 
+    def _parse_sweeps(self, column_name, cycle, direction):
+        # get the sweeps of a column request from the _fwd or _bwd ending of the column name or the cycle and direction
+        column_name, fwd, bwd = self._check_fwd_bwd(column_name)
+        if fwd or bwd:
+            direction = 'fwd' if fwd else 'bwd'
+        return column_name, self._get_sweeps(cycle, direction)
+
+    def append_sweep(self, secondary_value, columns):
+        """
+        Same as SetDataSet.append_sweep, but also checks that the new set has the same sweep directions as the existing sets.  Only
+        the new set is searched for the change in sweep direction.
+        Args:
+            secondary_value (float or Value): The value of the secondary independent of the new set
+            columns (dict): The data of the new set for every quantity, i.e. {'vg': vg, 'id': id}
+
+        Returns:
+            None
+        """
+        master_column = next(column_data for column_name, column_data in columns.items() if column_name.lower() == self.master_independent)
+        new_segments = self._get_sweep_segments(np.asarray(split_unit(master_column)[0], dtype=np.float64)[np.newaxis])
+        assert new_segments.shape[1] == self.sweep_number, 'The new set has {0} sweep directions, but the sets in this dataset have' \
+                                                           ' {1}'.format(new_segments.shape[1], self.sweep_number)
+        assert np.all(new_segments[0, :-1, 1] == self.sweep_segments[0, :-1, 1]), 'All IV sweeps must have the same number of x data points'
+
+        super(BiDirectionalDataSet, self).append_sweep(secondary_value, columns)
+
+        # add the segments of the new set, and merge the grids of only the new set with the grids of the other sets
+        num_sets = self.sweep_segments.shape[0]
+        self.sweep_segments = np.concatenate((self.sweep_segments, new_segments), axis=0)
+        new_grids = self._get_sweep_grids(self._data[-1:, :, self._get_quantity_index(self.master_independent)], new_segments)
+        self.sweep_grids = [self._merge_sweep_grid(grid, new_grid, num_sets) for grid, new_grid in zip(self.sweep_grids, new_grids)]
+
+    def update_column_data(self, column_name, column_data):
+        super(BiDirectionalDataSet, self).update_column_data(column_name, column_data)
+        # the grids are in the values of the master independent, so they change with it (i.e. when its unit is adjusted)
+        if column_name.lower() == self.master_independent:
+            self.sweep_grids = self._get_sweep_grids()
+
+    def _secondary_key(self, secondary_value):
+        # the secondary independent values are saved as Values in the unit of the secondary independent
+        unit = self.column_units[self.column_names.index(self.secondary_independent)]
+        if isinstance(secondary_value, Value):
+            return secondary_value.adjust_unit(unit)
+        return Value(value=secondary_value, unit=unit)
+
     def _convert_secondary_independent_to_value(self):
         # converts the keys in the secondary independent dict to values
         secondary_value_unit = self.column_units[self.column_names.index(self.secondary_independent)]
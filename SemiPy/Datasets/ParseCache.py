@@ -0,0 +1,212 @@
+"""
+On-disk cache of parsed instrument files.  Parsing the utf-16 txt and xls exports with pandas is by far the slowest part of loading a
+DataSet, so the parsed columns are saved as .npy files and memory mapped on later loads of the same file.
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from SemiPy.config.settings import ParseCache_Path, ParseCache_Max_Size, ParseCache_Enabled
+from SemiPy.helper.paths import confirm_dir
+
+
+class ParseCache(object):
+    """
+    Cache of parsed DataFrames keyed by the file path, size, modification time, and content hash of the parsed file.  Each entry is a
+    directory holding the numeric columns as a single column-major .npy file (memory mapped when loaded), any non-numeric columns as
+    a .npy object array, and a meta.json file with the column names.  When the cache grows above max_size bytes, the least recently
+    used entries are removed.  The cache used by the DataSets is off unless SEMIPY_PARSE_CACHE_ENABLED=1 (see settings.py).
+
+    Args:
+        path (str): The directory of the cache
+        max_size (int): The max size of the cache in bytes
+        enabled (bool): If False, files are always parsed and nothing is saved
+
+    Example:
+        >>> cache = ParseCache(path='/tmp/semipy_cache', max_size=2**30, enabled=True)
+        >>> df = cache.load('WSe2_Sample_4_Id_Vg.txt', reader=Readers.read_data_file)
+    """
+
+    meta_file = 'meta.json'
+    numeric_file = 'numeric.npy'
+    object_file = 'object.npy'
+
+    hash_block_size = 2**20
+
+    def __init__(self, path=ParseCache_Path, max_size=ParseCache_Max_Size, enabled=ParseCache_Enabled):
+        self.path = path
+        self.max_size = max_size
+        self.enabled = enabled
+
+    def load(self, data_path, reader, columns=None):
+        """
+        Load the parsed DataFrame of the file from the cache, or parse the file with reader and add it to the cache
+        Args:
+            data_path (str): Path to the file
+            reader (callable): Function that parses the file at data_path into a pd.DataFrame, called as reader(data_path, columns)
+            columns (list or None): The names of the columns to parse.  If None, all columns are parsed
+
+        Returns:
+            pd.DataFrame
+        """
+        if not self.enabled:
+            return reader(data_path, columns)
+
+        key = self.key(data_path, columns)
+        df = self.get(key)
+        if df is None:
+            df = reader(data_path, columns)
+            self.put(key, df)
+        return df
+
+    def key(self, data_path, columns=None):
+        """
+        Get the cache key of a file from its absolute path, size, modification time, and content hash, and the parsed columns
+        Args:
+            data_path (str): Path to the file
+            columns (list or None): The names of the parsed columns
+
+        Returns:
+            str
+        """
+        stat = os.stat(data_path)
+        key = '{0}|{1}|{2}|{3}|{4}'.format(os.path.abspath(data_path), stat.st_size, stat.st_mtime_ns,
+                                           file_hash(data_path, block_size=self.hash_block_size),
+                                           '*' if columns is None else '|'.join(columns))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Get the DataFrame of a cache entry.  The numeric columns are memory mapped copy-on-write, so changing the DataFrame does not
+        change the cache
+        Args:
+            key (str): The cache key
+
+        Returns:
+            pd.DataFrame or None if the key is not in the cache
+        """
+        entry = os.path.join(self.path, key)
+        try:
+            with open(os.path.join(entry, self.meta_file), 'r') as file:
+                meta = json.load(file)
+            numeric = np.load(os.path.join(entry, self.numeric_file), mmap_mode='c')
+            objects = np.load(os.path.join(entry, self.object_file), allow_pickle=True) if meta['object_columns'] else None
+        except (OSError, ValueError, KeyError):
+            # a missing or broken entry is treated as a miss
+            return None
+
+        # mark the entry as recently used for the eviction.  The entry may be read only or already evicted by another process
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+        df = pd.DataFrame(numeric, columns=meta['numeric_columns'], copy=False)
+        for i, column in enumerate(meta['object_columns']):
+            df[column] = objects[:, i]
+        return df[meta['columns']]
+
+    def put(self, key, df):
+        """
+        Add a DataFrame to the cache.  The entry is written to a temporary directory and then moved into place, so other processes
+        never load a half written entry
+        Args:
+            key (str): The cache key
+            df (pd.DataFrame): The parsed DataFrame
+
+        Returns:
+            None
+        """
+        confirm_dir(self.path)
+        columns = [str(column) for column in df.columns]
+        if len(set(columns)) != len(columns):
+            # the columns are saved by name, so duplicate names cannot be cached
+            return
+
+        numeric_columns = [column for column in df.columns if pd.api.types.is_numeric_dtype(df[column])]
+        object_columns = [column for column in df.columns if column not in numeric_columns]
+        meta = {'columns': columns, 'numeric_columns': [str(column) for column in numeric_columns],
+                'object_columns': [str(column) for column in object_columns]}
+
+        temp_entry = tempfile.mkdtemp(dir=self.path, prefix='.tmp')
+        try:
+            np.save(os.path.join(temp_entry, self.numeric_file),
+                    np.asfortranarray(df[numeric_columns].to_numpy(dtype=np.float64)))
+            if object_columns:
+                np.save(os.path.join(temp_entry, self.object_file), df[object_columns].to_numpy(dtype=object), allow_pickle=True)
+            with open(os.path.join(temp_entry, self.meta_file), 'w') as file:
+                json.dump(meta, file)
+            os.rename(temp_entry, os.path.join(self.path, key))
+        except OSError:
+            # another process already added the entry (or the cache is not writable)
+            shutil.rmtree(temp_entry, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is smaller than max_size
+        Returns:
+            None
+        """
+        evict_entries(self.path, self.max_size)
+
+    def clear(self):
+        """
+        Remove all entries from the cache
+        Returns:
+            None
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def file_hash(data_path, block_size=2**20):
+    """
+    The sha1 hash of the content of a file
+    Args:
+        data_path (str): Path to the file
+        block_size (int): The number of bytes read at once
+
+    Returns:
+        str of the hex digest
+    """
+    content_hash = hashlib.sha1()
+    with open(data_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+def evict_entries(path, max_size):
+    """
+    Remove the least recently used entries of a cache directory until it is smaller than max_size.  Each entry is a directory, and the
+    modification time of the directory is the last time it was used
+    Args:
+        path (str): The directory of the cache
+        max_size (int): The max size of the cache in bytes
+
+    Returns:
+        None
+    """
+    entries = []
+    for key in os.listdir(path):
+        entry = os.path.join(path, key)
+        if key.startswith('.') or not os.path.isdir(entry):
+            continue
+        size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+        entries.append((os.path.getmtime(entry), size, entry))
+
+    total_size = sum(entry[1] for entry in entries)
+    for _, size, entry in sorted(entries):
+        if total_size <= max_size:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total_size -= size
+
+
+# the cache used by the DataSets
+parse_cache = ParseCache()
@@ -0,0 +1,138 @@
+"""
+Ragged arrays for the sets of a DataSet that have a different number of points
+"""
+import numpy as np
+from SemiPy.Datasets.UnitArray import UnitArray
+
+
+class RaggedArray(object):
+    """
+    The points of a number of sets of different lengths stored as one flat float array and an array of offsets (like a CSR layout), so
+    set i is data[offsets[i]:offsets[i + 1]].  There is no padding, so each set is a view of the flat array without any nan values.
+
+    Args:
+        data (np.ndarray): The flat data of all the sets
+        offsets (np.ndarray): The index of the first point of each set in data, followed by the total number of points
+        unit (pint.unit): The unit of the data.  If None, the sets are plain np.ndarrays
+
+    Example:
+        >>> ragged = RaggedArray.from_padded(np.array([[1.0, 2.0, 3.0], [4.0, 5.0, np.nan]]), unit=ureg.volt)
+        >>> ragged.lengths
+        array([3, 2])
+        >>> ragged[1]
+        [4. 5.] volt
+    """
+
+    def __init__(self, data, offsets, unit=None):
+        self.data = _as_float(data)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.unit = unit
+        assert self.offsets.ndim == 1 and self.offsets[0] == 0 and self.offsets[-1] == self.data.shape[0], \
+            'The offsets of a RaggedArray must start at 0 and end at the number of points ({0})'.format(self.data.shape[0])
+
+    @classmethod
+    def from_padded(cls, array, lengths=None, unit=None):
+        """
+        Create a RaggedArray from a nan padded array of shape (number of sets, number of points)
+        Args:
+            array (np.ndarray): The padded array
+            lengths (np.ndarray): The number of points of each set.  Defaults to the index after the last non nan point of each set
+            unit (pint.unit): The unit of the data.  Defaults to the unit of array if it is a UnitArray
+
+        Returns:
+            RaggedArray
+        """
+        if unit is None:
+            unit = getattr(array, 'unit', None)
+        array = _as_float(array)
+        if lengths is None:
+            valid = ~np.isnan(array)
+            lengths = np.where(np.any(valid, axis=-1), array.shape[-1] - np.argmax(valid[:, ::-1], axis=-1), 0)
+        return cls.from_ranges(array, np.zeros(shape=(array.shape[0],), dtype=int), lengths, unit=unit)
+
+    @classmethod
+    def from_ranges(cls, array, start, lengths, unit=None):
+        """
+        Create a RaggedArray from a range of points of each set of an array
+        Args:
+            array (np.ndarray): The data of shape (number of sets, number of points)
+            start (np.ndarray): The first index of each set
+            lengths (np.ndarray): The number of points of each set
+
+        Returns:
+            RaggedArray
+        """
+        lengths = np.asarray(lengths, dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        sets = np.repeat(np.arange(lengths.shape[0]), lengths)
+        points = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - np.asarray(start), lengths)
+        return cls(_as_float(array)[sets, points], offsets, unit=unit)
+
+    @property
+    def lengths(self):
+        """
+        The number of points of each set
+        """
+        return np.diff(self.offsets)
+
+    @property
+    def values(self):
+        """
+        The flat data of all the sets as a UnitArray (or np.ndarray if there is no unit)
+        """
+        return self._wrap(self.data)
+
+    @property
+    def segment_index(self):
+        """
+        The set of every point of the flat data
+        """
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, item):
+        return self._wrap(self.data[self.offsets[item]:self.offsets[item + 1]])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return 'RaggedArray({0}, unit={1})'.format([np.array2string(self.data[self.offsets[i]:self.offsets[i + 1]])
+                                                    for i in range(len(self))], self.unit)
+
+    def _wrap(self, data):
+        if self.unit is None:
+            return data
+        return UnitArray(data, unit=self.unit, dtype=data.dtype)
+
+    def to_padded(self, fill_value=np.nan):
+        """
+        Convert to a padded array of shape (number of sets, max number of points)
+        Args:
+            fill_value (float): The value of the padding
+
+        Returns:
+            UnitArray (or np.ndarray if there is no unit)
+        """
+        lengths = self.lengths
+        result = np.full(shape=(len(self), lengths.max(initial=0)), fill_value=fill_value, dtype=self.data.dtype)
+        result[self.segment_index, np.arange(self.data.shape[0]) - np.repeat(self.offsets[:-1], lengths)] = self.data
+        return self._wrap(result)
+
+    def trim(self):
+        """
+        Cut every set to the number of points of the shortest set
+        Returns:
+            UnitArray (or np.ndarray if there is no unit) of shape (number of sets, min number of points)
+        """
+        dim = self.lengths.min(initial=0)
+        return self._wrap(self.data[self.offsets[:-1, np.newaxis] + np.arange(dim)])
+
+
+def _as_float(data):
+    # float32 data are kept as float32 (see the dtype of the DataSets), everything else is converted to float64
+    data = np.asarray(data)
+    return data if data.dtype in (np.float32, np.float64) else data.astype(np.float64)
@@ -0,0 +1,211 @@
+"""
+Readers for the data files of the DataSets.  The format of a file is detected from its content (magic bytes, byte order mark, and
+delimiter) instead of its name, and faster readers for specific instrument layouts can be registered with register_reader.
+"""
+import csv
+import codecs
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+# the excel engines of pandas are optional, so the header of an excel file is read with pandas if they are missing
+try:
+    import xlrd
+except ImportError:
+    xlrd = None
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+# the number of bytes read from the start of a file to detect its format
+sniff_size = 4096
+
+# magic bytes of the binary formats
+_ole2_magic = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+_zip_magic = b'PK\x03\x04'
+
+# byte order marks of the text encodings.  The utf-16 decoder uses the byte order mark to find the endianness
+_boms = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+class FileFormat(object):
+    """
+    The format of a data file
+    Args:
+        kind (str): 'text', 'xls' (OLE2 excel), or 'xlsx' (zipped excel)
+        encoding (str or None): The encoding of a text file
+        sep (str or None): The delimiter of a text file
+    """
+
+    def __init__(self, kind, encoding=None, sep=None):
+        self.kind = kind
+        self.encoding = encoding
+        self.sep = sep
+
+    def __repr__(self):
+        return 'FileFormat(kind={0}, encoding={1}, sep={2})'.format(self.kind, self.encoding, repr(self.sep))
+
+
+def sniff_format(data_path):
+    """
+    Detect the format of a data file from its first bytes
+    Args:
+        data_path (str): Path to the file
+
+    Returns:
+        FileFormat
+    """
+    with open(data_path, 'rb') as file:
+        head = file.read(sniff_size)
+    return _sniff_head(head, data_path)
+
+
+def _sniff_head(head, data_path):
+    if head.startswith(_ole2_magic):
+        return FileFormat('xls')
+    if head.startswith(_zip_magic):
+        return FileFormat('xlsx')
+
+    encoding = next((encoding for bom, encoding in _boms if head.startswith(bom)), None)
+    if encoding is None:
+        # utf-16 without a byte order mark has a zero byte in every other byte of ascii text
+        if len(head) > 1 and head[1::2].count(0) > len(head) // 4:
+            encoding = 'utf-16-le'
+        elif len(head) > 1 and head[0::2].count(0) > len(head) // 4:
+            encoding = 'utf-16-be'
+        else:
+            encoding = 'utf-8'
+
+    # cut the head at the last full line so partial characters and rows do not confuse the delimiter sniffing
+    text = head.decode(encoding, errors='ignore')
+    lines = text.splitlines()[:-1] or text.splitlines()
+    try:
+        sep = csv.Sniffer().sniff('\n'.join(lines), delimiters='\t,;').delimiter
+    except csv.Error:
+        assert len(lines) != 0, 'The file {0} is empty'.format(data_path)
+        sep = '\t' if '\t' in lines[0] else ','
+    return FileFormat('text', encoding=encoding, sep=sep)
+
+
+def _read_text(data_path, file_format, **kwargs):
+    return pd.read_csv(data_path, encoding=file_format.encoding, sep=file_format.sep, **kwargs)
+
+
+def _read_excel(data_path, file_format, **kwargs):
+    # pandas parses the whole sheet even if no rows are requested, so only the header row is read with the engine
+    if kwargs.get('nrows') == 0:
+        header = _read_excel_header(data_path, file_format)
+        if header is not None:
+            return TextParser([header], header=0, **kwargs).read()
+    # the OLE2 xls files can only be read with xlrd.  Let pandas pick the engine of the zipped xlsx files
+    engine = 'xlrd' if file_format.kind == 'xls' else None
+    return pd.read_excel(data_path, engine=engine, **kwargs)
+
+
+def _read_excel_header(data_path, file_format):
+    """
+    Read the first row of the first sheet of an excel file without parsing the rest of the workbook
+    Args:
+        data_path (str): Path to the file
+        file_format (FileFormat): The format of the file
+
+    Returns:
+        list of the header cells converted the same way as pandas, or None if the engine of the file is not installed
+    """
+    if file_format.kind == 'xls' and xlrd is not None:
+        book = xlrd.open_workbook(data_path, on_demand=True)
+        try:
+            sheet = book.sheet_by_index(0)
+            header = sheet.row_values(0) if sheet.nrows else []
+        finally:
+            book.release_resources()
+    elif file_format.kind == 'xlsx' and openpyxl is not None:
+        book = openpyxl.load_workbook(data_path, read_only=True, data_only=True)
+        try:
+            header = list(next(book.worksheets[0].iter_rows(max_row=1, values_only=True), ()))
+        finally:
+            book.close()
+        # pandas trims the empty cells at the end of the rows of xlsx files
+        while header and header[-1] is None:
+            header.pop()
+    else:
+        return None
+    # pandas reads empty cells as empty strings and whole numbers as ints
+    return ['' if cell is None else int(cell) if isinstance(cell, float) and cell.is_integer() else cell for cell in header]
+
+
+# the registered readers as (sniff, reader) pairs.  The most recently registered reader that accepts a file is used
+_readers = [(lambda data_path, file_format: file_format.kind == 'text', _read_text),
+            (lambda data_path, file_format: file_format.kind in ('xls', 'xlsx'), _read_excel)]
+
+
+def register_reader(sniff, reader):
+    """
+    Register a reader for data files.  Readers are tried in the reverse order of registration, so a dedicated reader for a specific
+    instrument layout takes priority over the default text and excel readers.
+    Args:
+        sniff (callable): Called as sniff(data_path, file_format) with the detected FileFormat.  Returns True if reader can read the
+         file
+        reader (callable): Called as reader(data_path, file_format, **kwargs) and returns a pd.DataFrame.  Must accept the pandas
+         keyword arguments nrows, usecols, and dtype
+
+    Returns:
+        None
+    """
+    _readers.append((sniff, reader))
+
+
+def get_reader(data_path, file_format=None):
+    """
+    Get the reader for a data file
+    Args:
+        data_path (str): Path to the file
+        file_format (FileFormat): The format of the file.  Detected from the file if None
+
+    Returns:
+        reader, FileFormat
+    """
+    if file_format is None:
+        file_format = sniff_format(data_path)
+    for sniff, reader in reversed(_readers):
+        if sniff(data_path, file_format):
+            return reader, file_format
+    raise ValueError('There is no reader for the file {0} with format {1}'.format(data_path, file_format))
+
+
+def read_data_file(data_path, columns=None, file_format=None):
+    """
+    Parse a data file with the registered reader for its format
+    Args:
+        data_path (str): Path to the file
+        columns (list or None): The names of the columns to parse.  These are parsed as floats if possible.  If None, all columns
+         are parsed
+        file_format (FileFormat): The format of the file.  Detected from the file if None
+
+    Returns:
+        pd.DataFrame
+    """
+    reader, file_format = get_reader(data_path, file_format)
+    if columns is None:
+        return reader(data_path, file_format)
+
+    try:
+        return reader(data_path, file_format, usecols=columns, dtype={column: np.float64 for column in columns})
+    except (ValueError, TypeError):
+        # some of the columns are not numeric, so let pandas pick the dtypes
+        return reader(data_path, file_format, usecols=columns)
+
+
+def read_data_header(data_path, file_format=None):
+    """
+    Read only the column names of a data file
+    Args:
+        data_path (str): Path to the file
+        file_format (FileFormat): The format of the file.  Detected from the file if None
+
+    Returns:
+        list of the column names
+    """
+    reader, file_format = get_reader(data_path, file_format)
+    return list(reader(data_path, file_format, nrows=0).columns)
@@ -0,0 +1,88 @@
+"""
+Numpy arrays in shared memory blocks, so the data of the DataSets can be handed to worker processes without copying
+"""
+import numpy as np
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # shared memory was added in python 3.8
+    shared_memory = None
+
+
+class SharedArray(object):
+    """
+    A handle to an np.ndarray in a multiprocessing.shared_memory block.  The handle only holds the name, shape, and dtype of the block,
+    so it is cheap to pickle, and attach gives an array backed by the same memory in any process on the machine.
+
+    Args:
+        name (str): The name of the shared memory block
+        shape (tuple): The shape of the array
+        dtype (np.dtype): The dtype of the array
+
+    Example:
+        >>> handle, block, array = SharedArray.create(np.arange(10.0))
+        # in a worker process
+        >>> block, array = handle.attach()
+    """
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    def __repr__(self):
+        return 'SharedArray(name={0}, shape={1}, dtype={2})'.format(self.name, self.shape, self.dtype)
+
+    @classmethod
+    def create(cls, array):
+        """
+        Copy an array into a new shared memory block.  The process that creates the block owns it and must unlink it when it is no
+        longer needed (see release)
+        Args:
+            array (np.ndarray): The array to share
+
+        Returns:
+            SharedArray handle, the shared_memory.SharedMemory block, and the array backed by the block
+        """
+        assert shared_memory is not None, 'Shared memory requires python 3.8 or later'
+        array = np.asarray(array)
+        # a block cannot be empty
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared[...] = array
+        return cls(block.name, array.shape, array.dtype), block, shared
+
+    def attach(self):
+        """
+        Attach to the shared memory block of the handle
+        Returns:
+            the shared_memory.SharedMemory block and the array backed by the block.  The block must be kept alive as long as the array
+            is used
+        """
+        assert shared_memory is not None, 'Shared memory requires python 3.8 or later'
+        try:
+            block = shared_memory.SharedMemory(name=self.name, track=False)
+        except TypeError:
+            # before python 3.13 attaching also registers the block with the resource tracker.  Worker processes share the resource
+            # tracker of the process that created the block, so this does not change when the block is freed
+            block = shared_memory.SharedMemory(name=self.name)
+        return block, np.ndarray(self.shape, dtype=self.dtype, buffer=block.buf)
+
+    @staticmethod
+    def release(block, unlink=False):
+        """
+        Close a shared memory block
+        Args:
+            block (shared_memory.SharedMemory): The block
+            unlink (bool): If True, also free the block.  Only the owner of the block should unlink it
+
+        Returns:
+            None
+        """
+        if unlink:
+            block.unlink()
+        try:
+            block.close()
+        except BufferError:
+            # arrays backed by the block are still in use, so the block is closed when they are freed
+            pass
@@ -0,0 +1,234 @@
+"""
+Unit-aware numpy arrays for dense DataSet column storage
+"""
+import numpy as np
+from physics.value import Value, ureg
+
+
+# ufuncs where the result keeps the unit of the first input
+_unit_preserving_ufuncs = (np.negative, np.positive, np.absolute, np.fabs, np.rint, np.floor, np.ceil, np.trunc,
+                           np.conjugate, np.log10, np.log, np.log2, np.exp)
+
+# ufuncs that require both inputs to be in the same unit.  The result keeps the unit of the first input
+_same_unit_ufuncs = (np.add, np.subtract, np.maximum, np.minimum, np.fmax, np.fmin, np.hypot, np.remainder, np.fmod)
+
+# ufuncs that require both inputs to be in the same unit, but the result is unitless (i.e. bool)
+_comparison_ufuncs = (np.greater, np.greater_equal, np.less, np.less_equal, np.equal, np.not_equal)
+
+# array functions that join a sequence of arrays.  The result is in the unit of the first UnitArray
+_joining_functions = (np.concatenate, np.stack, np.vstack, np.hstack, np.column_stack)
+
+
+class UnitArray(np.ndarray):
+    """
+    A float ndarray with a single unit attached to the whole array.  DataSets store their columns as contiguous float arrays and
+    return them as UnitArrays, so math on the columns runs at numpy speed while keeping track of the units.  A Value is only
+    created when a single element is indexed (or an array is reduced to a scalar, i.e. max or min).
+
+    Args:
+        array (np.ndarray or list): The magnitudes of the array.  Object arrays of Values are converted to floats
+        unit (pint.unit): The unit of all the values in the array.  Defaults to dimensionless
+        dtype (np.dtype): The float dtype of the array.  Defaults to np.float64
+
+    Example:
+        >>> vg = UnitArray(np.linspace(0.0, 10.0, 21), unit=ureg.volt)
+        >>> vg[-1]
+        10.0 volt
+        >>> (vg / Value(2.0, ureg.micrometer)).unit
+        volt / micrometer
+    """
+
+    # make sure numpy uses the UnitArray operators over the Value operators (Value.__array_priority__ is 17)
+    __array_priority__ = 20
+
+    def __new__(cls, array, unit=None, dtype=np.float64):
+        magnitude, array_unit = split_unit(array)
+        obj = np.asarray(magnitude, dtype=dtype).view(cls)
+        if unit is None:
+            unit = array_unit if array_unit is not None else ureg.dimensionless
+        obj.unit = unit
+        return obj
+
+    def __array_finalize__(self, obj):
+        self.unit = getattr(obj, 'unit', ureg.dimensionless)
+
+    def __reduce__(self):
+        # add the unit to the pickled state of the array as a string (see unit_to_str)
+        reconstruct, arguments, state = super(UnitArray, self).__reduce__()
+        return reconstruct, arguments, (state, unit_to_str(self.unit))
+
+    def __setstate__(self, state):
+        state, unit = state
+        self.unit = str_to_unit(unit) if isinstance(unit, str) else unit
+        super(UnitArray, self).__setstate__(state)
+
+    def __getitem__(self, item):
+        result = super(UnitArray, self).__getitem__(item)
+        if isinstance(result, UnitArray):
+            return result
+        return Value(value=float(result), unit=self.unit)
+
+    def __setitem__(self, key, value):
+        magnitude, unit = split_unit(value)
+        if unit is not None and unit != self.unit:
+            magnitude = np.asarray(magnitude) * _conversion_factor(unit, self.unit)
+        super(UnitArray, self).__setitem__(key, magnitude)
+
+    def __repr__(self):
+        return '{0} {1}'.format(np.array2string(self.magnitude), self.unit)
+
+    __str__ = __repr__
+
+    @property
+    def magnitude(self):
+        """
+        The magnitudes of the array as a plain np.ndarray view (no copy)
+        """
+        return self.view(np.ndarray)
+
+    def to_values(self):
+        """
+        Convert the array to an object array of Values
+        Returns:
+            np.ndarray of Values
+        """
+        return Value.array_like(self.magnitude, unit=self.unit)
+
+    def adjust_unit(self, desired_unit):
+        """
+        Convert the array into the desired unit
+        Args:
+            desired_unit (pint.unit): The new unit
+
+        Returns:
+            UnitArray in the desired unit
+        """
+        return UnitArray(self.magnitude * _conversion_factor(self.unit, desired_unit), unit=desired_unit, dtype=self.dtype)
+
+    def mean(self, *args, **kwargs):
+        return _wrap(self.magnitude.mean(*args, **kwargs), self.unit)
+
+    def std(self, *args, **kwargs):
+        return _wrap(self.magnitude.std(*args, **kwargs), self.unit)
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func in _joining_functions:
+            # join the arrays in the unit of the first array
+            arrays = args[0]
+            unit = next(x.unit for x in arrays if isinstance(x, UnitArray))
+            arrays = [UnitArray(x, unit=unit).magnitude if not isinstance(x, UnitArray) else x.adjust_unit(unit).magnitude
+                      for x in arrays]
+            return _wrap(func(arrays, *args[1:], **kwargs), unit)
+        return super(UnitArray, self).__array_function__(func, types, args, kwargs)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        magnitudes, units = zip(*[split_unit(x) for x in inputs])
+        magnitudes = list(magnitudes)
+        if kwargs.get('out', None) is not None:
+            kwargs['out'] = tuple(x.view(np.ndarray) if isinstance(x, UnitArray) else x for x in kwargs['out'])
+        # the unit of the first input with a unit
+        unit = next((u for u in units if u is not None), None)
+        if unit is None:
+            return getattr(ufunc, method)(*magnitudes, **kwargs)
+
+        if ufunc in _same_unit_ufuncs or ufunc in _comparison_ufuncs:
+            # convert all inputs to the first unit.  Inputs without units are assumed to be in that unit
+            for i in range(len(magnitudes)):
+                if units[i] is not None and units[i] != unit:
+                    magnitudes[i] = np.asarray(magnitudes[i]) * _conversion_factor(units[i], unit)
+            result_unit = None if ufunc in _comparison_ufuncs else unit
+        elif ufunc in _unit_preserving_ufuncs:
+            result_unit = unit
+        elif ufunc is np.multiply and method == '__call__':
+            result_unit = _combine_units(units, lambda a, b: a * b)
+        elif ufunc in (np.true_divide, np.divide) and method == '__call__':
+            result_unit = _combine_units(units, lambda a, b: a / b)
+        elif ufunc is np.reciprocal:
+            result_unit = ureg.dimensionless / unit
+        elif ufunc is np.sqrt:
+            result_unit = unit ** 0.5
+        elif ufunc is np.square:
+            result_unit = unit ** 2
+        elif ufunc is np.power and method == '__call__' and units[1] is None and np.ndim(magnitudes[1]) == 0:
+            result_unit = units[0] ** float(magnitudes[1])
+        else:
+            result_unit = None
+
+        # the reduce methods only make sense for the same-unit ufuncs (i.e. add.reduce is sum, maximum.reduce is max)
+        if method not in ('__call__', 'reduce', 'accumulate', 'reduceat', 'at') or \
+                (method != '__call__' and ufunc not in _same_unit_ufuncs):
+            result_unit = None
+
+        result = getattr(ufunc, method)(*magnitudes, **kwargs)
+
+        if result_unit is None or result is None:
+            return result
+        if isinstance(result, tuple):
+            return tuple(_wrap(x, result_unit) for x in result)
+        return _wrap(result, result_unit)
+
+
+def split_unit(x):
+    """
+    Split x into its magnitudes and unit
+    Args:
+        x (UnitArray, Value, np.ndarray, or float): The data to be split.  Object arrays of Values use the unit of the first Value
+
+    Returns:
+        magnitudes, unit (None if x does not have a unit)
+    """
+    if isinstance(x, UnitArray):
+        return x.view(np.ndarray), x.unit
+    elif isinstance(x, Value):
+        return float(x), x.unit
+    elif isinstance(x, np.ndarray) and x.dtype == object and x.size != 0 and isinstance(x.flat[0], Value):
+        # an object array of Values (i.e. from Value.array_like) is converted to floats using the unit of the first value
+        return np.array(x, dtype=float), x.flat[0].unit
+    return x, None
+
+
+def unit_to_str(unit):
+    """
+    Convert a unit to a string for pickling.  Unpickled pint units belong to a new unit registry and cannot be used with the units of
+    ureg, so units are always pickled as strings and parsed with ureg when loaded
+    Args:
+        unit (pint.unit or None): The unit
+
+    Returns:
+        str or None
+    """
+    return None if unit is None else str(unit)
+
+
+def str_to_unit(unit):
+    """
+    Convert a string from unit_to_str back to a unit of ureg
+    Args:
+        unit (str or None): The string of the unit
+
+    Returns:
+        pint.unit or None
+    """
+    return None if unit is None else ureg.Unit(unit)
+
+
+def _conversion_factor(unit, desired_unit):
+    # the multiplicative factor to convert from unit to desired_unit
+    return (1.0 * unit).to(desired_unit).magnitude
+
+
+def _combine_units(units, func):
+    # combine the units of a binary ufunc, treating missing units as dimensionless
+    a, b = [ureg.dimensionless if u is None else u for u in units]
+    return func(a, b)
+
+
+def _wrap(result, unit):
+    # wrap the result of a ufunc with the unit.  Scalars become Values
+    if isinstance(result, np.ndarray) and result.ndim != 0:
+        if result.dtype == bool:
+            return result
+        result = result.view(UnitArray)
+        result.unit = unit
+        return result
+    return Value(value=float(result), unit=unit)
@@ -1,8 +1,16 @@
 """
 Testing for transistor models
 """
+import os
+import pickle
+import shutil
+import tempfile
 import unittest
+import numpy as np
+import pandas as pd
 from SemiPy.Datasets.IVDataset import IdVdDataSet, IdVgDataSet
+from SemiPy.Datasets.UnitArray import UnitArray
+from SemiPy.Datasets.RaggedArray import RaggedArray
 from physics.value import Value, ureg
 from SemiPy.helper.paths import get_abs_semipy_path
 
@@ -36,3 +44,441 @@ class TestIVDataSets(unittest.TestCase):
         self.assertEqual(len(result.shape), 1, 'Error in the IdVgDataSet object get column set function. Result should only have '
                                                '1 dimension but it has {0}'.format(len(result.shape)))
 
+
+    def test_dense_column_storage(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+
+        result = dataset.get_column(column_name='id')
+
+        self.assertIsInstance(result, UnitArray, 'Error in the IdVgDataSet object get column function.  The column should be'
+                                                 ' a UnitArray but is {0}'.format(type(result)))
+
+        self.assertEqual(result.dtype, np.float64, 'Error in the IdVgDataSet column storage.  The column should be stored as float64'
+                                                   ' but is {0}'.format(result.dtype))
+
+        self.assertEqual(result.unit, ureg.amp, 'Error in the IdVgDataSet column storage.  The unit of Id should be amps but is'
+                                                ' {0}'.format(result.unit))
+
+        result = dataset.get_column_set(column_name='id', secondary_value=Value(1.0, ureg.volt))
+
+        self.assertIsInstance(result[0], Value, 'Error in the IdVgDataSet object get column set function.  Indexing a single point'
+                                                ' should return a Value but returned {0}'.format(type(result[0])))
+
+    def test_set_views(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+
+        column = dataset.get_column(column_name='id')
+        column_set = dataset.get_column_set(column_name='id', secondary_value=Value(1.0, ureg.volt))
+
+        self.assertTrue(np.shares_memory(column, column_set), 'Error in the IdVgDataSet object get column set function.  The column set'
+                                                              ' should be a view of the dataset, not a copy')
+
+        self.assertEqual(column.shape[0], len(dataset.get_secondary_indep_values()), 'Error in the IdVgDataSet object get column'
+                                                                                      ' function.  There should be one row per Vd set')
+
+    def test_bwd_value_range(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+
+        result = dataset.get_column(column_name='vg_bwd', master_independent_value_range=[0, 10.0])
+
+        self.assertEqual(result[0][0], Value(10.0, ureg.volt), 'Error in the IdVgDataSet object get column function when requesting the'
+                                                               ' bwd master independent value range.  First Vg value should be 10.0 volt'
+                                                               ' but is {0}'.format(result[0][0]))
+
+        self.assertEqual(result[0][-1], Value(0.5, ureg.volt), 'Error in the IdVgDataSet object get column function when requesting the'
+                                                               ' bwd master independent value range.  Last Vg value should be 0.5 volt'
+                                                               ' but is {0}'.format(result[0][-1]))
+
+        self.assertEqual(result.shape[0], len(dataset.get_secondary_indep_values()), 'Error in the IdVgDataSet object get column'
+                                                                                      ' function.  There should be one row per Vd set')
+
+    def test_lazy_columns(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+
+        self.assertNotIn('id', dataset._quantity_index.keys(), 'Error in the IdVgDataSet.  The id column should not be loaded until'
+                                                               ' it is used')
+
+        result = dataset.get_column(column_name='id')
+
+        self.assertEqual(result.unit, ureg.amp, 'Error in the IdVgDataSet.  The unit of the lazily loaded Id should be amps but is'
+                                                ' {0}'.format(result.unit))
+
+        # the loaded columns are dropped from the DataFrame, and the DataFrame is released once every column is loaded
+        self.assertFalse(any(column in dataset.df.columns for column in dataset.gathered_column_names['id']),
+                         'Error in the IdVgDataSet.  The loaded Id columns should be dropped from the DataFrame')
+        for column_name, columns in dataset.gathered_column_names.items():
+            if columns is not None:
+                dataset.get_column(column_name)
+        self.assertIsNone(dataset.df, 'Error in the IdVgDataSet.  The DataFrame should be released once every column is loaded')
+
+        # a given DataFrame is not changed
+        df = pd.DataFrame({'GateV(1)': np.arange(5.0), 'DrainI(1)': np.arange(5.0) * 1e-6, 'DrainV(1)': np.full(5, 0.1)})
+        IdVgDataSet(data_path=df).get_column('id')
+        self.assertEqual(list(df.columns), ['GateV(1)', 'DrainI(1)', 'DrainV(1)'])
+
+    def test_stream(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+
+        # stack the first three sets into a long format file
+        df = pd.read_csv(path, encoding='utf-16', sep='\t')
+        sets = [df[['DrainI({0})'.format(i), 'DrainV({0})'.format(i), 'GateV({0})'.format(i)]] for i in (1, 2, 3)]
+        df = pd.concat([columns.set_axis(['DrainI', 'DrainV', 'GateV'], axis=1) for columns in sets], ignore_index=True)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            long_path = os.path.join(temp_dir, 'long.txt')
+            df.to_csv(long_path, sep='\t', index=False)
+            # read fewer rows at a time than there are in a set
+            streamed = list(IdVgDataSet.stream(data_path=long_path, chunk_size=100))
+        finally:
+            shutil.rmtree(temp_dir)
+
+        self.assertEqual(len(streamed), 3, 'Error in IdVgDataSet.stream.  There should be 3 sets but there are {0}'.format(len(streamed)))
+
+        for i, streamed_set in enumerate(streamed):
+            self.assertTrue(np.array_equal(streamed_set.get_column('id').magnitude[0], dataset.get_column('id').magnitude[i]),
+                            'Error in IdVgDataSet.stream.  The Id of set {0} does not match the Id of the full dataset'.format(i))
+
+    def test_append_sweep(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+        id_before = np.array(dataset.get_column('id').magnitude)
+
+        vg = dataset.get_column_set('vg', Value(2.0, ureg.volt))
+        id = dataset.get_column_set('id', Value(2.0, ureg.volt)) * 2.0
+        for vd in (2.5, 3.0, 3.5):
+            dataset.append_sweep(Value(vd * 1000.0, ureg.millivolt), {'Vg': vg, 'Id': id})
+
+        self.assertEqual(dataset.get_secondary_indep_values()[-1], Value(3.5, ureg.volt), 'Error in IdVgDataSet.append_sweep.  The last'
+                                                                                          ' Vd should be 3.5 volt but is {0}'.format(
+            dataset.get_secondary_indep_values()[-1]))
+
+        self.assertTrue(np.array_equal(dataset.get_column('id').magnitude[:3], id_before), 'Error in IdVgDataSet.append_sweep.  The'
+                                                                                           ' existing sets should not change')
+
+        result = dataset.get_column_set('id', Value(3.0, ureg.volt))
+
+        self.assertTrue(np.array_equal(result.magnitude, id.magnitude), 'Error in IdVgDataSet.append_sweep.  The Id of the new set does'
+                                                                        ' not match the appended data')
+
+        result = dataset.get_column('vd_fwd')
+
+        self.assertEqual(result.shape, (6, dataset.change_i), 'Error in IdVgDataSet.append_sweep.  The fwd Vd should have shape {0} but'
+                                                              ' has shape {1}'.format((6, dataset.change_i), result.shape))
+
+    def test_add_columns(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+
+        id = dataset.get_column('id')
+        dataset.add_columns({'id_2x': id * 2.0, 'id_3x': id * 3.0})
+
+        result = dataset.get_column('id_3x')
+
+        self.assertTrue(np.array_equal(result.magnitude, id.magnitude * 3.0), 'Error in the IdVgDataSet object add columns function.  The'
+                                                                              ' added column does not match the given data')
+
+        self.assertEqual(result.unit, ureg.amp, 'Error in the IdVgDataSet object add columns function.  The unit of the added column'
+                                                ' should be amps but is {0}'.format(result.unit))
+
+    def test_sweep_views(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+
+        column = dataset.get_column('id')
+        fwd = dataset.get_column('id_fwd')
+        bwd = dataset.get_column('id_bwd')
+
+        self.assertTrue(np.shares_memory(column, fwd) and np.shares_memory(column, bwd), 'Error in the IdVgDataSet object get column'
+                                                                                         ' function.  The fwd and bwd sweeps should be'
+                                                                                         ' views of the column')
+
+        self.assertEqual(fwd.shape[-1] + bwd.shape[-1], column.shape[-1], 'Error in the IdVgDataSet object get column function.  The fwd'
+                                                                          ' and bwd sweeps should split the column')
+
+    def test_cycles(self):
+
+        # two sets of 3 up and down cycles of Vg
+        vg = np.tile(np.concatenate((np.linspace(-10.0, 10.0, 21), np.linspace(10.0, -10.0, 21))), 3)
+        df = pd.DataFrame({'GateV(1)': vg, 'DrainI(1)': np.arange(vg.size) * 1e-6, 'DrainV(1)': np.full(vg.size, 0.1),
+                           'GateV(2)': vg, 'DrainI(2)': np.arange(vg.size) * 2e-6, 'DrainV(2)': np.full(vg.size, 1.0)})
+
+        dataset = IdVgDataSet(data_path=df)
+
+        self.assertEqual(dataset.num_cycles, 3, 'Error in the IdVgDataSet sweep segmentation.  There should be 3 cycles but there are'
+                                                ' {0}'.format(dataset.num_cycles))
+
+        result = dataset.get_column('id', cycle=2, direction='bwd')
+
+        self.assertTrue(np.allclose(result.magnitude[1], np.arange(5 * 21, 6 * 21) * 2e-6), 'Error in the IdVgDataSet get column function.'
+                                                                                           '  The Id of the bwd sweep of the last cycle is'
+                                                                                           ' wrong')
+
+        result = dataset.get_column('vg', cycle=1, direction='fwd', master_independent_value_range=[0.0, 5.0])
+
+        self.assertEqual((result[0][0], result[0][-1]), (Value(0.0, ureg.volt), Value(4.0, ureg.volt)), 'Error in the IdVgDataSet get'
+                                                                                                        ' column function when'
+                                                                                                        ' requesting the master'
+                                                                                                        ' independent value range of'
+                                                                                                        ' a cycle')
+
+        # 0 -> 10 -> 0 -> 10 -> 0 without repeating the final point of each sweep
+        vg = np.concatenate((np.linspace(0.0, 10.0, 21), np.linspace(9.5, 0.0, 20), np.linspace(0.5, 10.0, 20), np.linspace(9.5, 0.0, 20)))
+        dataset = IdVgDataSet(data_path=pd.DataFrame({'GateV(1)': vg, 'DrainI(1)': np.arange(vg.size) * 1e-6,
+                                                      'DrainV(1)': np.full(vg.size, 0.1)}))
+
+        self.assertEqual(dataset.sweep_segments[0].tolist(), [[0, 21], [21, 41], [41, 61], [61, 81]], 'Error in the IdVgDataSet sweep'
+                                                                                                     ' segmentation.  The sweeps'
+                                                                                                     ' without a repeated final'
+                                                                                                     ' point are wrong')
+
+    def test_ragged_range(self):
+
+        # two single sweep sets with a different Vg step, so the second set has more points in any Vg range
+        vg = np.linspace(-10.0, 10.0, 41)
+        vg_coarse = np.concatenate((np.linspace(-10.0, 10.0, 21), np.full(20, np.nan)))
+        df = pd.DataFrame({'GateV(1)': vg_coarse, 'DrainI(1)': vg_coarse * 1e-6 + 1e-6, 'DrainV(1)': np.full(vg.size, 0.1),
+                           'GateV(2)': vg, 'DrainI(2)': vg * 2e-6, 'DrainV(2)': np.full(vg.size, 1.0)})
+
+        dataset = IdVgDataSet(data_path=df)
+
+        vg = dataset.get_column('vg', master_independent_value_range=[0.0, 5.0])
+        id = dataset.get_column('id', master_independent_value_range=[0.0, 5.0])
+
+        self.assertIsInstance(id, RaggedArray, 'Error in the IdVgDataSet get column function.  Sets with a different number of points in'
+                                               ' the range should be a RaggedArray but are {0}'.format(type(id)))
+
+        self.assertEqual(list(id.lengths), [5, 10], 'Error in the IdVgDataSet get column function.  The sets should have 5 and 10 points'
+                                                    ' in the range but have {0}'.format(list(id.lengths)))
+
+        self.assertTrue(np.allclose(id[0].magnitude, vg[0].magnitude * 1e-6 + 1e-6) and
+                        np.allclose(id[1].magnitude, vg[1].magnitude * 2e-6), 'Error in the IdVgDataSet get column function.  The Id of'
+                                                                              ' the sets in the range is wrong')
+
+        self.assertEqual(id.to_padded().shape, (2, 10), 'Error in RaggedArray.to_padded.  The padded Id should have the shape of the'
+                                                        ' longest set')
+
+        self.assertEqual(list(dataset.get_ragged_column('vg').lengths), [21, 41], 'Error in the IdVgDataSet get ragged column function.'
+                                                                                  '  The padding of the first set was not removed')
+
+    def test_affine_grid(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+
+        self.assertEqual(dataset.sweep_grids, [(-20.0, 0.5), (20.0, -0.5)], 'Error in the IdVgDataSet sweep grids.  The Vg sweeps should'
+                                                                            ' be the grids (-20.0, 0.5) and (20.0, -0.5) but are'
+                                                                            ' {0}'.format(dataset.sweep_grids))
+
+        # the grid must give the same range as searching the sweep
+        vg = dataset.get_column('vg')
+        segment = dataset.sweep_segments[:, 1]
+        expected = dataset._index_master_independent_range('vg', vg.magnitude, vg.magnitude, [2.2, 7.8], segment[:, 0], segment[:, 1])
+        result = dataset.get_column('vg_bwd', master_independent_value_range=[2.2, 7.8])
+
+        self.assertTrue(np.array_equal(result.magnitude, expected), 'Error in the IdVgDataSet get column function.  The range indexed with'
+                                                                    ' the sweep grid does not match the searched range')
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vd.txt')
+
+        dataset = IdVdDataSet(data_path=path)
+
+        self.assertEqual(dataset.sweep_grids, [(-5.0, 0.125), (5.0, -0.125)], 'Error in the IdVdDataSet sweep grids.  The Vd sweeps'
+                                                                              ' should be the grids (-5.0, 0.125) and (5.0, -0.125) but'
+                                                                              ' are {0}'.format(dataset.sweep_grids))
+
+        # 200 up and down cycles of Vg, where the Vg of the second set is shifted in the last cycle
+        vg = np.tile(np.concatenate((np.linspace(-10.0, 10.0, 21), np.linspace(10.0, -10.0, 21))), 200)
+        shifted_vg = np.concatenate((vg[:-42], vg[-42:] + 1.0))
+        dataset = IdVgDataSet(data_path=pd.DataFrame({'GateV(1)': vg, 'DrainI(1)': np.arange(vg.size) * 1e-6,
+                                                      'DrainV(1)': np.full(vg.size, 0.1), 'GateV(2)': shifted_vg,
+                                                      'DrainI(2)': np.arange(vg.size) * 2e-6, 'DrainV(2)': np.full(vg.size, 1.0)}))
+
+        self.assertEqual(dataset.sweep_grids[:-2], [(-10.0, 1.0), (10.0, -1.0)] * 199, 'Error in the IdVgDataSet sweep grids.  The'
+                                                                                       ' sweeps of the first 199 cycles should share'
+                                                                                       ' their grids')
+
+        self.assertTrue(np.allclose(dataset.sweep_grids[-2], [[-10.0, -9.0], [1.0, 1.0]]), 'Error in the IdVgDataSet sweep grids.  The'
+                                                                                           ' last fwd sweep should have the grid of'
+                                                                                           ' each set')
+
+    def test_append_sweep_grids(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+
+        vg = dataset.get_column_set('vg', Value(2.0, ureg.volt))
+        id = dataset.get_column_set('id', Value(2.0, ureg.volt))
+        dataset.append_sweep(Value(2.5, ureg.volt), {'Vg': vg, 'Id': id})
+
+        self.assertEqual(dataset.sweep_grids, [(-20.0, 0.5), (20.0, -0.5)], 'Error in IdVgDataSet.append_sweep.  A set with the same Vg'
+                                                                            ' sweeps should keep the shared grids but the grids are'
+                                                                            ' {0}'.format(dataset.sweep_grids))
+
+        dataset.append_sweep(Value(3.0, ureg.volt), {'Vg': vg * 0.5, 'Id': id})
+
+        self.assertTrue(np.allclose(dataset.sweep_grids[0], [[-20.0] * 4 + [-10.0], [0.5] * 4 + [0.25]]), 'Error in'
+                                                                                                           ' IdVgDataSet.append_sweep.'
+                                                                                                           '  A set with a different'
+                                                                                                           ' Vg sweep should save the'
+                                                                                                           ' grid of each set')
+
+        result = dataset.get_column('vg_fwd', master_independent_value_range=[0.0, 5.0])
+
+        self.assertEqual((result[4][0], result[4][-1]), (Value(0.0, ureg.volt), Value(4.75, ureg.volt)), 'Error in the IdVgDataSet get'
+                                                                                                          ' column function with the'
+                                                                                                          ' grid of each set')
+
+        # the second Vg point is moved off of the grid
+        uneven_vg = np.array(vg.magnitude)
+        uneven_vg[1] += 0.1
+        dataset.append_sweep(Value(3.5, ureg.volt), {'Vg': uneven_vg, 'Id': id})
+
+        self.assertIsNone(dataset.sweep_grids[0], 'Error in IdVgDataSet.append_sweep.  The fwd sweep is not an affine grid in every set')
+
+    def test_float32_storage(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+        dataset_32 = IdVgDataSet(data_path=path, dtype='float32')
+
+        result = dataset_32.get_column('id')
+
+        self.assertEqual(result.dtype, np.float32, 'Error in the IdVgDataSet float32 storage.  The column should be float32 but is'
+                                                   ' {0}'.format(result.dtype))
+
+        self.assertTrue(np.shares_memory(result, dataset_32._data), 'Error in the IdVgDataSet float32 storage.  The column should be a'
+                                                                    ' view of the data array, not a float64 copy')
+
+        self.assertTrue(np.allclose(result.magnitude, dataset.get_column('id').magnitude, rtol=1e-6, equal_nan=True),
+                        'Error in the IdVgDataSet float32 storage.  The float32 Id does not match the float64 Id')
+
+    def test_derived_columns(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+        id = np.array(dataset.get_column('id').magnitude)
+
+        calls = []
+        dataset.add_derived_column('id_2x', func=lambda id: calls.append(1) or id * 2.0, depends_on=['id'])
+        dataset.add_derived_column('id_4x', func=lambda id_2x: id_2x * 2.0, depends_on=['id_2x'])
+
+        self.assertEqual(len(calls), 0, 'Error in the IdVgDataSet derived columns.  The column should not be computed until it is used')
+
+        dataset.get_column('id_4x')
+        dataset.get_column('id_2x')
+
+        self.assertEqual(len(calls), 1, 'Error in the IdVgDataSet derived columns.  The column should only be computed once, but was'
+                                        ' computed {0} times'.format(len(calls)))
+
+        dataset.adjust_column('id', func=lambda x: x * 3.0)
+        result = dataset.get_column('id_4x')
+
+        self.assertTrue(np.allclose(result.magnitude, id * 12.0, equal_nan=True), 'Error in the IdVgDataSet derived columns.  The derived'
+                                                                                  ' columns were not recomputed after the Id changed')
+
+        # only the appended set is computed, and the existing sets are kept
+        num_sets = []
+        dataset.add_derived_column('num_sets', func=lambda id: num_sets.append(id.shape[0]) or np.zeros_like(id), depends_on=['id'])
+        dataset.get_column('num_sets')
+        dataset.append_sweep(Value(3.0, ureg.volt), {'Vg': dataset.get_column_set('vg', Value(2.0, ureg.volt)),
+                                                     'Id': dataset.get_column_set('id', Value(2.0, ureg.volt)) * 2.0})
+        result = dataset.get_column('id_4x')
+        dataset.get_column('num_sets')
+
+        self.assertEqual(num_sets, [3, 1], 'Error in IdVgDataSet derived columns.  Only the appended set should be computed, but the'
+                                           ' sets computed were {0}'.format(num_sets))
+        self.assertTrue(np.allclose(result.magnitude[:3], id * 12.0, equal_nan=True), 'Error in IdVgDataSet derived columns.  The'
+                                                                                      ' existing sets changed after append_sweep')
+        self.assertTrue(np.allclose(result.magnitude[3], dataset.get_column_set('id', Value(3.0, ureg.volt)).magnitude * 4.0,
+                                    equal_nan=True), 'Error in IdVgDataSet derived columns.  The appended set was not computed')
+
+    def test_pickle(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+        dataset.add_derived_column('id_2x', func=lambda id: id * 2.0, depends_on=['id'])
+
+        result = pickle.loads(pickle.dumps(dataset, 2))
+
+        self.assertTrue(np.array_equal(result.get_column('id_2x').magnitude, dataset.get_column('id_2x').magnitude, equal_nan=True),
+                        'Error in pickling the IdVgDataSet.  The derived column does not match after loading')
+
+        self.assertEqual(result.get_column('id').unit, ureg.amp, 'Error in pickling the IdVgDataSet.  The unit of Id should be amps but'
+                                                                 ' is {0}'.format(result.get_column('id').unit))
+
+        self.assertEqual(result.get_secondary_indep_values(), dataset.get_secondary_indep_values(), 'Error in pickling the IdVgDataSet.'
+                                                                                                    '  The Vd values do not match after'
+                                                                                                    ' loading')
+
+    def test_shared_memory(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        dataset = IdVgDataSet(data_path=path)
+        size = len(pickle.dumps(dataset, 2))
+        dataset.share_memory()
+        try:
+            pickled = pickle.dumps(dataset, 2)
+
+            self.assertLess(len(pickled), size / 4, 'Error in the IdVgDataSet shared memory.  The pickled DataSet should only hold the'
+                                                    ' handle of the shared data, but is {0} bytes'.format(len(pickled)))
+
+            result = pickle.loads(pickled)
+            result.adjust_column('id', func=lambda x: x * 2.0)
+
+            self.assertTrue(np.allclose(result.get_column('id').magnitude, dataset.get_column('id').magnitude * 2.0, equal_nan=True),
+                            'Error in the IdVgDataSet shared memory.  The attached DataSet should copy the data before changing it')
+            result.release_shared_memory()
+        finally:
+            dataset.release_shared_memory()
+
+    def test_resample(self):
+
+        # two single sweep sets over shifted Vg ranges with different steps
+        vg = np.linspace(-10.0, 10.0, 41)
+        vg_shifted = np.linspace(-5.0, 15.0, 21)
+        df = pd.DataFrame({'GateV(1)': vg, 'DrainI(1)': vg * 1e-6, 'DrainV(1)': np.full(vg.size, 0.1),
+                           'GateV(2)': np.concatenate((vg_shifted, np.full(20, np.nan))),
+                           'DrainI(2)': np.concatenate((vg_shifted * 2e-6, np.full(20, np.nan))), 'DrainV(2)': np.full(vg.size, 1.0)})
+
+        dataset = IdVgDataSet(data_path=df)
+
+        grid, id = dataset.resample('id')
+
+        self.assertEqual((grid[0], grid[-1]), (Value(-5.0, ureg.volt), Value(10.0, ureg.volt)), 'Error in the IdVgDataSet resample'
+                                                                                                 ' function.  The grid should cover the'
+                                                                                                 ' Vg range of both sets')
+
+        self.assertTrue(np.allclose(id.magnitude, np.outer([1e-6, 2e-6], grid.magnitude)), 'Error in the IdVgDataSet resample function.'
+                                                                                            '  The resampled Id is wrong')
+
+        grid, (id, vd) = dataset.resample(['id', 'vd'], grid=Value.array_like(np.array([-8000.0, 0.0]), unit=ureg.millivolt))
+
+        self.assertTrue(np.isnan(id.magnitude[1, 0]) and np.allclose(vd.magnitude[:, 1], [0.1, 1.0]), 'Error in the IdVgDataSet resample'
+                                                                                                       ' function with a given grid')
@@ -0,0 +1,51 @@
+"""
+Testing for the parse cache of data files
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from SemiPy.Datasets.ParseCache import ParseCache
+from SemiPy.Datasets.Readers import read_data_file
+from SemiPy.helper.paths import get_abs_semipy_path
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_path, ignore_errors=True)
+
+    def test_parse_cache(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        cache = ParseCache(path=self.cache_path, max_size=2**30, enabled=True)
+
+        parsed = cache.load(path, reader=read_data_file)
+        cached = cache.load(path, reader=None)
+
+        self.assertEqual(list(parsed.columns), list(cached.columns), 'Error in the ParseCache.  The cached columns should be {0} but'
+                                                                     ' are {1}'.format(list(parsed.columns), list(cached.columns)))
+
+        numeric = parsed.select_dtypes('number').columns
+        self.assertTrue(np.array_equal(parsed[numeric].to_numpy(dtype=float), cached[numeric].to_numpy(dtype=float), equal_nan=True),
+                        'Error in the ParseCache.  The cached numeric data does not match the parsed data')
+
+        self.assertTrue(parsed.drop(columns=numeric).equals(cached.drop(columns=numeric)), 'Error in the ParseCache.  The cached'
+                                                                                            ' non-numeric data does not match the'
+                                                                                            ' parsed data')
+
+        cache.max_size = 0
+        cache.evict()
+
+        self.assertEqual(len(os.listdir(self.cache_path)), 0, 'Error in the ParseCache.  All entries should be evicted when the max'
+                                                              ' size is 0')
+
+        cache.enabled = False
+        cache.load(path, reader=read_data_file)
+
+        self.assertEqual(len(os.listdir(self.cache_path)), 0, 'Error in the ParseCache.  A disabled cache should not save entries')
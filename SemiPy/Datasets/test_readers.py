@@ -0,0 +1,48 @@
+"""
+Testing for the data file readers
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from SemiPy.Datasets import Readers
+from SemiPy.Datasets.Readers import sniff_format, read_data_header
+from SemiPy.helper.paths import get_abs_semipy_path
+
+
+class TestReaders(unittest.TestCase):
+
+    def test_sniff_format(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        file_format = sniff_format(path)
+
+        self.assertEqual((file_format.kind, file_format.encoding, file_format.sep), ('text', 'utf-16', '\t'),
+                         'Error in sniff_format.  {0} should be a utf-16 tab delimited text file, not {1}'.format(path, file_format))
+
+        # the format should not depend on the name of the file
+        temp_dir = tempfile.mkdtemp(prefix='txt_runs')
+        try:
+            renamed_path = os.path.join(temp_dir, 'renamed.xls')
+            shutil.copy(path, renamed_path)
+            self.assertEqual(read_data_header(renamed_path), read_data_header(path), 'Error in read_data_header.  The header of a renamed'
+                                                                                      ' file should not change')
+        finally:
+            shutil.rmtree(temp_dir)
+
+    @unittest.skipIf(Readers.xlrd is None or Readers.openpyxl is None, 'The excel engines are not installed')
+    def test_excel_header(self):
+
+        for path, engine in ((get_abs_semipy_path('SampleData/FETExampleData/SampleExcel.xlsx'), None),
+                             (get_abs_semipy_path('SampleData/2019-11-21-I71/4-3-100NM-D.xls'), 'xlrd')):
+            expected = list(pd.read_excel(path, engine=engine, nrows=0).columns)
+
+            # only the header row should be read, without parsing the sheet with pandas
+            with mock.patch.object(Readers.pd, 'read_excel', side_effect=AssertionError('The whole sheet was parsed')):
+                result = read_data_header(path)
+
+            self.assertEqual(result, expected, 'Error in read_data_header.  The header of {0} should be {1} but is'
+                                               ' {2}'.format(path, expected, result))
@@ -137,6 +137,8 @@ class FET(Transistor):
         # adding extra values to make the units be centimeter ** -2
         # replace any Vg < Vt_avg with Vt_avg
         if isinstance(vg, np.ndarray):
+            # copy vg so the data of the dataset is not changed
+            vg = vg.copy()
             vg[self.gt(self.Vt_avg.value, vg)] = self.Vt_avg.value
             # vg[vg < self.Vt_avg.value] = self.Vt_avg.value
             # n = carrier_density(self.gate_oxide.capacitance, vg, self.Vt_avg.value)
@@ -170,24 +172,31 @@ class FET(Transistor):
         _in = _in.adjust_unit(ureg.micrometer * ureg.millivolt / ureg.ampere)
         self._min_ss = _in
 
-    def max_value(self, array, return_index=False):
+    # the max and min functions take an optional axis.  If given, the values (and indices) are found for each set along the axis
+    # (i.e. axis=-1 for each Vd of IdVg data) instead of over the whole array
+
+    def max_value(self, array, return_index=False, axis=None):
         raise NotImplementedError('You must implement max_value')
 
-    def min_value(self, array, return_index=False):
+    def min_value(self, array, return_index=False, axis=None):
         raise NotImplementedError('You must implement max_value')
 
-    def max_slope_value(self, array, return_index=False):
+    def max_slope_value(self, array, return_index=False, axis=None):
         raise NotImplementedError('You must implement max_value')
 
-    def min_slope_value(self, array, return_index=False):
+    def min_slope_value(self, array, return_index=False, axis=None):
         raise NotImplementedError('You must implement max_value')
 
-    def _arg_max(self, array):
-        # get the arg max of an array
+    def _arg_max(self, array, axis=None):
+        # get the arg max of an array, or of each set along the axis
+        if axis is not None:
+            return np.argmax(np.asarray(array), axis=axis)
         return np.unravel_index(np.argmax(array), array.shape)
 
-    def _arg_min(self, array):
-        # get the arg min of an array
+    def _arg_min(self, array, axis=None):
+        # get the arg min of an array, or of each set along the axis
+        if axis is not None:
+            return np.argmin(np.asarray(array), axis=axis)
         return np.unravel_index(np.argmin(array), array.shape)
 
 
@@ -200,25 +209,30 @@ class NFET(FET):
         # should not have to adjust anything
         return super(NFET, self).norm_Id(Id)   # @property
 
-    def max_value(self, array, return_index=False):
-        result = abs(array).max()
+    def max_value(self, array, return_index=False, axis=None):
+        result = abs(array).max(axis=axis)
         if return_index:
-            return result, self._arg_max(abs(array))
+            return result, self._arg_max(abs(array), axis)
         return result
 
-    def min_value(self, array, return_index=False):
+    def min_value(self, array, return_index=False, axis=None):
         # remove all negative vlues because this is an NFET
-        array = array[array > 0.0]
-        result = array.min()
+        if axis is None:
+            array = array[array > 0.0]
+        else:
+            # keep the shape of the sets, so the negative values are replaced with inf instead
+            array = array.copy()
+            array[~(array > 0.0)] = np.inf
+        result = array.min(axis=axis)
         if return_index:
-            return result, self._arg_min(abs(array))
+            return result, self._arg_min(abs(array), axis)
         return result
 
-    def max_slope_value(self, array, return_index=False):
-        return self.max_value(array, return_index)
+    def max_slope_value(self, array, return_index=False, axis=None):
+        return self.max_value(array, return_index, axis)
 
-    def min_slope_value(self, array, return_index=False):
-        return self.min_value(array, return_index)
+    def min_slope_value(self, array, return_index=False, axis=None):
+        return self.min_value(array, return_index, axis)
 
 
 class PFET(FET):
@@ -234,30 +248,30 @@ class PFET(FET):
     # def norm_Vg(self, vg):
     #     return vg*-1
 
-    def max_value(self, array, return_index=False):
-        result = abs(array).max()
+    def max_value(self, array, return_index=False, axis=None):
+        result = abs(array).max(axis=axis)
         if return_index:
-            return result, self._arg_max(abs(array))
+            return result, self._arg_max(abs(array), axis)
         return result
 
-    def min_value(self, array, return_index=False):
-        result = abs(array).min()
+    def min_value(self, array, return_index=False, axis=None):
+        result = abs(array).min(axis=axis)
         if return_index:
-            return result, self._arg_min(abs(array))
+            return result, self._arg_min(abs(array), axis)
         return result
 
-    def max_slope_value(self, array, return_index=False):
+    def max_slope_value(self, array, return_index=False, axis=None):
         array = array * -1
-        result = array.max() * -1
+        result = array.max(axis=axis) * -1
         if return_index:
-            return result, self._arg_max(array)
+            return result, self._arg_max(array, axis)
         return result
 
-    def min_slope_value(self, array, return_index=False):
+    def min_slope_value(self, array, return_index=False, axis=None):
         array = array * -1
-        result = abs(array).min() * -1
+        result = abs(array).min(axis=axis) * -1
         if return_index:
-            return result, self._arg_min(array)
+            return result, self._arg_min(array, axis)
         return result
 
     def vg_to_n(self, vg):
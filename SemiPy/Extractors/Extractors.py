@@ -2,8 +2,10 @@
 Extractor objects for processing data
 """
 import numpy as np
+import warnings
 import matplotlib.pyplot as plt
-from physics.value import Value
+from physics.value import Value, ureg
+from SemiPy.Datasets.UnitArray import UnitArray, split_unit, unit_to_str, str_to_unit
 
 
 class Extractor(object):
@@ -17,6 +19,16 @@ class Extractor(object):
         self.x_data = None
         self.y_data = None
 
+    def __getstate__(self):
+        """
+        Get the state of the Extractor for pickling.  Values and object arrays of Values are saved as floats and a unit string, and the
+        DataSets pickle their own compact state
+        """
+        return {key: _pack_values(value) for key, value in self.__dict__.items()}
+
+    def __setstate__(self, state):
+        self.__dict__.update({key: _unpack_values(value) for key, value in state.items()})
+
     def _clean_data(self, ndarry, remove_zeroes = False):
         """
         Remove all nan and inf from an ndarray by replacing with 0.0
@@ -34,6 +46,21 @@ class Extractor(object):
             ndarry[ndarry == -0.0] = np.inf
         return ndarry
 
+    @staticmethod
+    def _upcast(ndarray):
+        """
+        Convert float32 data (see the dtype of the DataSets) to float64 before computations that lose precision, i.e. differences
+        and logs
+        Args:
+            ndarray (np.ndarray): The data
+
+        Returns:
+            The data as float64 (keeping the unit of a UnitArray)
+        """
+        if isinstance(ndarray, np.ndarray) and ndarray.dtype == np.float32:
+            return ndarray.astype(np.float64)
+        return ndarray
+
     def _slope(self, x_data, y_data, keep_dims=False, remove_zeroes = False):
         """
         Compute the slope at all data points
@@ -46,7 +73,7 @@ class Extractor(object):
             ndarray: The slope at all points (size n - 1 or n if keep_dims is True)
 
         """
-        slope = np.diff(y_data)/np.diff(x_data)
+        slope = np.diff(self._upcast(y_data))/np.diff(self._upcast(x_data))
         if keep_dims:
             slope = np.concatenate((slope, slope[..., -1:]), axis=-1)
 
@@ -91,76 +118,97 @@ class Extractor(object):
 
     def linear_regression(self, x_data, y_data):
         """
-        Simple function for linear regression to a dataset.
+        Least squares fit of a line y = a * x + b to a dataset, with the standard errors of a and b (the same as np.polyfit with
+        cov=True).  2D data are fit for every dataset at once with closed form sums along the first dimension.  Points where x or y
+        is nan are ignored.  The errors need at least 3 points (i.e. 3 TLM lengths), so they are nan for fits with fewer points.
         Args:
             x_data (np.ndarray): A 1 or 2D ndarray with the x data.  See y_data for 2D array details.
             y_data (np.ndarray): A 1 or 2D ndarray with the y data.  If 2D, then the first dimension will serve as the
              dataset and second dim as each individual dataset
 
         Returns:
-            slope, slope error, x-intercept, x-intercept error
+            slope, slope error, y-intercept, y-intercept error.  For 2D data, these are UnitArrays with a value for each dataset
         """
-
-        i_len = 100
-        # using x and y values as means, create normal distributions using the provided std's
-        # x_normal = np.array([np.random.normal(mean, std * 0, 1) for std, mean in zip(self.x_std, self.x)]).flatten()
-        # y_normal = np.array([np.random.normal(mean, std * 0, 1) for std, mean in zip(self.y_std, self.y)]).flatten()
-
-        # if x_data and y_data are 2D arrays, then loop over the second dim, using the first dim as the dataset
-        if len(x_data.shape) is 2 and len(y_data.shape) is 2:
-            a = []
-            a_error = []
-            b = []
-            b_error = []
-            for i in range(x_data.shape[1]):
-                a_t, a_e_t, b_t, b_e_t = self.__compute_linear_regression(x_data[:, i], y_data[:, i])
-                a.append(a_t)
-                a_error.append(a_e_t)
-                b.append(b_t)
-                b_error.append(b_e_t)
-        elif len(x_data.shape) is 1 and len(y_data.shape) is 1:
-            a, a_error, b, b_error = self.__compute_linear_regression(x_data, y_data)
-        else:
+        x_data, x_unit = split_unit(x_data)
+        y_data, y_unit = split_unit(y_data)
+        x = np.asarray(x_data, dtype=np.float64)
+        y = np.asarray(y_data, dtype=np.float64)
+        if x.shape != y.shape or x.ndim not in (1, 2):
             raise ValueError('Your x_data and y_data dimensions are off.  x_data is {0} and y_data {1}, but they'
-                             ' must have the same shape and either have 1 or 2 dimensions')
-
-        return a, a_error, b, b_error
-        # for i in range(i_len):
-        #     x_normal = np.array([np.random.normal(mean, std, 1) for std, mean in zip(self.x_std, self.x)]).flatten()
-        #     y_normal = np.array([np.random.normal(mean, std, 1) for std, mean in zip(self.y_std, self.y)]).flatten()
-        #
-        #     # fit the data using np.polyfit with 1
-        #     p, V = np.polyfit(x_normal, y_normal, 1, cov=True)
-        #     # self.a_avg += p[0]
-        #     # self.b_avg += p[1]
-        #     self.a_error_avg += slope_holder.unit_copy(np.sqrt(V[0][0]))
-        #     self.b_error_avg += self.y[0].unit_copy(np.sqrt(V[1][1]))
-        # # compute the averages
-        # # self.a_avg /= i_len + 1
-        # self.a_error_avg = (self.a_error_avg / (i_len + 1))
-        # # self.b_avg /= i_len + 1
-        # self.b_error_avg = (self.b_error_avg / (i_len + 1))
-
-        # return self.a_avg, self.a_error_avg, self.b_avg, self.b_error_avg
-
-    def __compute_linear_regression(self, x_data, y_data):
-        assert x_data.shape == y_data.shape, 'The x_data and y_data must have the same shape, but they' \
-                                             ' are {0} and {1}.'.format(x_data.shape, y_data.shape)
-        x_normal = np.array(x_data, dtype=float)
-        y_normal = np.array(y_data, dtype=float)
-        slope_holder = x_data[0] / y_data[0]
-
-        # fit the data using np.polyfit with 1 for more than two points
-        if x_data.shape[0] == 2:
-            order = 0
-        else:
-            order = 1
-        p, V = np.polyfit(x_normal, y_normal, order, cov=True)
-        a_avg = slope_holder.unit_copy(p[0])
-        b_avg = y_data[0].unit_copy(p[1])
-        a_error_avg = slope_holder.unit_copy(np.sqrt(V[0][0]))
-        b_error_avg = y_data[0].unit_copy(np.sqrt(V[1][1]))
-        return a_avg, a_error_avg, b_avg, b_error_avg
+                             ' must have the same shape and either have 1 or 2 dimensions'.format(x.shape, y.shape))
+
+        valid = np.isfinite(x) & np.isfinite(y)
+        n = np.sum(valid, axis=0)
+        if np.any(n < 3):
+            warnings.warn('At least 3 points are needed for the errors of a linear regression, but there are only {0} points.  The errors'
+                          ' are set to nan'.format(np.min(n)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_mean = np.sum(np.where(valid, x, 0.0), axis=0) / n
+            y_mean = np.sum(np.where(valid, y, 0.0), axis=0) / n
+            dx = np.where(valid, x - x_mean, 0.0)
+            dy = np.where(valid, y - y_mean, 0.0)
+            sxx = np.sum(dx * dx, axis=0)
+            a = np.sum(dx * dy, axis=0) / sxx
+            b = y_mean - a * x_mean
+            # the variance of the residuals, with two degrees of freedom used by the fit
+            variance = np.where(n < 3, np.nan, np.sum((dy - a * dx) ** 2, axis=0) / (n - 2))
+            a_error = np.sqrt(variance / sxx)
+            b_error = np.sqrt(variance * (1.0 / n + x_mean ** 2 / sxx))
+
+        if x_unit is None and y_unit is None:
+            return a, a_error, b, b_error
+        x_unit, y_unit = [ureg.dimensionless if unit is None else unit for unit in (x_unit, y_unit)]
+        return tuple(self.__attach_unit(result, unit) for result, unit in ((a, y_unit / x_unit), (a_error, y_unit / x_unit),
+                                                                            (b, y_unit), (b_error, y_unit)))
+
+    @staticmethod
+    def __attach_unit(result, unit):
+        # a single fit is returned as a Value and several fits as a UnitArray
+        if np.ndim(result) == 0:
+            return Value(value=float(result), unit=unit)
+        return UnitArray(result, unit=unit)
+
+
+class _PackedValues(object):
+    # an object array of Values saved as a UnitArray (see Extractor.__getstate__)
+
+    def __init__(self, array):
+        self.array = UnitArray(array)
+
+
+class _PackedValue(object):
+    # a single Value saved as a float and a unit string
+
+    def __init__(self, value):
+        self.magnitude = float(value.magnitude)
+        self.unit = unit_to_str(value.unit)
+
+    def to_value(self):
+        return Value(value=self.magnitude, unit=str_to_unit(self.unit))
+
+
+def _pack_values(obj):
+    if isinstance(obj, Value):
+        return _PackedValue(obj)
+    if isinstance(obj, np.ndarray) and not isinstance(obj, UnitArray) and split_unit(obj)[1] is not None:
+        return _PackedValues(obj)
+    if isinstance(obj, dict):
+        return type(obj)((key, _pack_values(value)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_pack_values(value) for value in obj)
+    return obj
+
+
+def _unpack_values(obj):
+    if isinstance(obj, _PackedValues):
+        return obj.array.to_values()
+    if isinstance(obj, _PackedValue):
+        return obj.to_value()
+    if isinstance(obj, dict):
+        return type(obj)((key, _unpack_values(value)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_unpack_values(value) for value in obj)
+    return obj
 
 
 class TrendLine(object):
@@ -0,0 +1,198 @@
+"""
+On-disk cache of extraction results.  Extracting the properties of a device only depends on its data files and the device, so the results
+of an extraction are saved and reused when the same data is extracted with the same device again.
+"""
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from physics.value import Value
+from SemiPy.config.settings import ResultCache_Path, ResultCache_Max_Size, ResultCache_Enabled
+from SemiPy.Datasets.ParseCache import file_hash, evict_entries
+from SemiPy.Datasets.UnitArray import unit_to_str
+from SemiPy.Devices.Materials.BaseMaterial import BaseMaterial
+from SemiPy.Devices.PhysicalProperty import PhysicalProperty
+from SemiPy.helper.paths import confirm_dir
+
+
+class ResultCache(object):
+    """
+    Cache of extraction results keyed by the content hash of the data files, the device class and parameters (i.e. the width, length,
+    gate oxide, and channel of a FET), any other parameters of the extraction, and the version of the extractor.  Each entry is a directory
+    holding the pickled results and a meta.json file with the data files of the entry.  When the cache grows above max_size bytes, the
+    least recently used entries are removed.
+
+    Args:
+        path (str): The directory of the cache
+        max_size (int): The max size of the cache in bytes
+        enabled (bool): If False, nothing is loaded or saved
+
+    Example:
+        >>> cache = ResultCache(path='/tmp/semipy_results', max_size=2**30, enabled=True)
+        >>> fetdata = FETExtractor(FET=fet, idvg_path=idvg_path, cache=cache)
+        # the IdVg data was measured again, so drop the results of the old data
+        >>> cache.invalidate(idvg_path)
+    """
+
+    meta_file = 'meta.json'
+    result_file = 'result.pickle'
+
+    def __init__(self, path=ResultCache_Path, max_size=ResultCache_Max_Size, enabled=ResultCache_Enabled):
+        self.path = path
+        self.max_size = max_size
+        self.enabled = enabled
+
+    def key(self, data_paths, device, version, parameters=None):
+        """
+        Get the cache key of an extraction
+        Args:
+            data_paths (list): Paths to the data files of the extraction (None for missing files)
+            device (BaseDevice): The device of the extraction
+            version (str): The version of the extractor.  Change the version when the extraction changes, so old results are not used
+            parameters (dict): Any other parameters of the extraction
+
+        Returns:
+            str
+        """
+        key = '|'.join(['' if data_path is None else file_hash(data_path) for data_path in data_paths] +
+                       [describe(device), describe(parameters), str(version)])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Get the result of a cache entry
+        Args:
+            key (str): The cache key
+
+        Returns:
+            The result, or None if the key is not in the cache
+        """
+        if not self.enabled:
+            return None
+        entry = os.path.join(self.path, key)
+        try:
+            with open(os.path.join(entry, self.result_file), 'rb') as file:
+                result = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # a missing or broken entry (i.e. from an older version of SemiPy) is treated as a miss
+            return None
+
+        # mark the entry as recently used for the eviction.  The entry may be read only or already evicted by another process
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result, data_paths=()):
+        """
+        Add a result to the cache.  The entry is written to a temporary directory and then moved into place, so other processes never load
+        a half written entry
+        Args:
+            key (str): The cache key
+            result (object): The result.  Must be picklable
+            data_paths (list): Paths to the data files of the result, for invalidate
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        confirm_dir(self.path)
+        meta = {'data_paths': [os.path.abspath(data_path) for data_path in data_paths if data_path is not None]}
+
+        temp_entry = tempfile.mkdtemp(dir=self.path, prefix='.tmp')
+        try:
+            with open(os.path.join(temp_entry, self.result_file), 'wb') as file:
+                pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(os.path.join(temp_entry, self.meta_file), 'w') as file:
+                json.dump(meta, file)
+            os.rename(temp_entry, os.path.join(self.path, key))
+        except OSError:
+            # another process already added the entry (or the cache is not writable)
+            shutil.rmtree(temp_entry, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def remove(self, key):
+        """
+        Remove an entry from the cache
+        Args:
+            key (str): The cache key
+
+        Returns:
+            None
+        """
+        shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
+
+    def invalidate(self, data_path):
+        """
+        Remove every entry of a data file from the cache
+        Args:
+            data_path (str): Path to the data file
+
+        Returns:
+            int of the number of removed entries
+        """
+        if not os.path.isdir(self.path):
+            return 0
+        data_path = os.path.abspath(data_path)
+        removed = 0
+        for key in os.listdir(self.path):
+            try:
+                with open(os.path.join(self.path, key, self.meta_file), 'r') as file:
+                    meta = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if data_path in meta.get('data_paths', []):
+                self.remove(key)
+                removed += 1
+        return removed
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is smaller than max_size
+        Returns:
+            None
+        """
+        evict_entries(self.path, self.max_size)
+
+    def clear(self):
+        """
+        Remove all entries from the cache
+        Returns:
+            None
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def describe(obj):
+    """
+    A str describing the parameters of an object for a cache key.  Devices and materials are described by their class and their Value,
+    number, str, and material attributes
+    Args:
+        obj (object): The object
+
+    Returns:
+        str
+    """
+    if isinstance(obj, Value) and not isinstance(obj, PhysicalProperty):
+        return '{0} {1}'.format(np.asarray(obj.magnitude, dtype=float).tolist(), unit_to_str(obj.unit))
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return repr(obj)
+    if isinstance(obj, dict):
+        return '{' + ', '.join('{0}: {1}'.format(key, describe(value)) for key, value in sorted(obj.items())) + '}'
+    if isinstance(obj, (list, tuple, np.ndarray)):
+        return '[' + ', '.join(describe(value) for value in obj) + ']'
+    # the parameters of a device or material are the attributes set when it was created, not the extracted properties
+    attributes = {key: value for key, value in vars(obj).items() if not key.startswith('_') and not isinstance(value, PhysicalProperty)
+                  and isinstance(value, (bool, int, float, str, Value, BaseMaterial))}
+    return '{0}.{1}{2}'.format(type(obj).__module__, type(obj).__name__, describe(attributes))
+
+
+# the cache used by the extractors
+result_cache = ResultCache()
@@ -5,7 +5,6 @@ from SemiPy.Extractors.Extractors import Extractor
 from SemiPy.Datasets.IVDataset import TLMDataSet
 from SemiPy.Devices.Devices.FET.Transistor import FET
 from SemiPy.Extractors.Transistor.FETExtractor import FETExtractor
-from physics.value import Value, ureg
 import os
 from SemiPy.helper.math import find_nearest_arg
 import warnings
@@ -44,8 +43,6 @@ class TLMExtractor(Extractor):
         >>> tlm.save_tlm_plots()
     """
 
-    maximum_n_varience = Value(8e11, ureg.centimeter ** -2)
-
     def __init__(self, lengths, widths, channel, gate_oxide, FET_class, vd_values=None, idvg_path=None, *args, **kwargs):
 
         super(TLMExtractor, self).__init__()
@@ -111,35 +108,19 @@ class TLMExtractor(Extractor):
 
             new_dataset = self.tlm_datasets[vd]
 
-            # now we can start computing TLM properties
+            # now we can start computing TLM properties.  The devices have different threshold voltages, so their carrier densities
+            # differ at every Vg.  Resample all the devices onto a common n grid over the range of n covered by every device
             n_full = new_dataset.get_column('n')
 
-            # get the column with the lowest max min
+            # get the lower bound of n from the positive n values of the device with the lowest max n
             min_max_n_col = np.argmin(np.max(n_full, axis=1))
-            # get the min_max n value
-            min_max_n = np.min(np.max(n_full, axis=1))
-            # now get the min n value from the column with the min_max_n.  This is important to ensure we get a rectangular n array
             max_min_n = np.partition(n_full[min_max_n_col][np.where(n_full[min_max_n_col, :] >= 1.0)[0]], 2)[2]
-            # value = 989429999999.9993 = 9.89e+11
-
-            # expr: np.where((n_full[1]>max_min_n) & (n_full[1]<min_max_n))
-            # looks like for n_full[1] range is 29-122 with gap 68-83 for total of 78 values
-            # n_full[0]: 37-114, missing 75-76 for total 76 values
-            # n_full[2]: 31-120, missing 68-83 for total 76 values
-            n = new_dataset.get_column('n', master_independent_value_range=[max_min_n, min_max_n.magnitude])
-
-            # check to make sure the n values are close enough.  If the Vg step is not fine enough and the device Vts are hihgly varied, the n values may not be close enough
-            # to extract TLM data at a specific n
-            max_n_varience = np.max(n[:, 1]) - np.min(n[:, 1])
-            assert max_n_varience < self.maximum_n_varience, 'Varience in carrier density between the devices is {0}, which is greater than {1}.  As such,' \
-                                                             'accurate TLM extraction is not possible.  This could be the result of too small a gate' \
-                                                             'voltage step and high varience between device threshold voltages.  You can try to remove ' \
-                                                             'device data with high varience, or lower the maximum_n_varience value in the' \
-                                                             'TLMExtractor object.'.format(max_n_varience, self.maximum_n_varience)
+
+            n, (r, l) = new_dataset.resample(['r', 'l'], value_range=[max_min_n, None])
+            # the n grid is the same for every device
+            n = n * np.ones(shape=r.shape)
 
             n_r = np.round(np.array(n, dtype=float) * 1e-12)
-            r = new_dataset.get_column('r', master_independent_value_range=[max_min_n, min_max_n.magnitude])
-            l = new_dataset.get_column('l', master_independent_value_range=[max_min_n, min_max_n.magnitude])
 
             n_units = '10<sup>12</sup> cm<sup>-2</sup>'
             r_units = '\u03A9\u2022\u03BCm'  # ;&times;&mu;m'
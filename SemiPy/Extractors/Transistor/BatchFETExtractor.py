@@ -0,0 +1,278 @@
+"""
+Extractor for extracting the properties of many Field-Effect Transistors at once (i.e. all the dies of a wafer), running the FETExtractors
+of the devices in a pool of worker processes.
+
+The batch extraction can also be run from the command line, i.e.
+
+    python -m SemiPy.Extractors.Transistor.BatchFETExtractor manifest.csv --fet nTFT --oxide SiO2 --tox 30 --channel MoS2 -o results.csv
+"""
+import argparse
+import contextlib
+import io
+import math
+import multiprocessing
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from physics.value import Value, ureg
+from SemiPy.config.settings import BatchExtraction_Processes
+from SemiPy.Devices.PhysicalProperty import PhysicalProperty
+from SemiPy.Devices.Devices.FET.Transistor import AmbipolarFET
+from SemiPy.Extractors.Transistor.FETExtractor import FETExtractor
+
+
+def find_devices(idvg_path, width, length, idvd_path=None):
+    """
+    Find the devices of a directory of IdVg data, where every file is the IdVg data of one device and all the devices have the same
+    geometry.
+    Args:
+        idvg_path (str): Path to the directory with the IdVg data
+        width (Value or float): The width of the devices.  Should be a Value or float in micrometers
+        length (Value or float): The length of the devices.  Should be a Value or float in micrometers
+        idvd_path (str): Path to a directory with the IdVd data of the devices.  The IdVd file of a device must have the same name as
+         its IdVg file.
+
+    Returns:
+        list of the device dicts (see read_manifest)
+    """
+    assert os.path.isdir(idvg_path), 'The IdVg path {0} is not a directory'.format(idvg_path)
+    width, length = _to_micrometers(width), _to_micrometers(length)
+    devices = []
+    for file_name in sorted(os.listdir(idvg_path)):
+        if not os.path.isfile(os.path.join(idvg_path, file_name)):
+            continue
+        idvd = None if idvd_path is None else os.path.join(idvd_path, file_name)
+        devices.append({'name': os.path.splitext(file_name)[0], 'idvg_path': os.path.join(idvg_path, file_name),
+                        'idvd_path': idvd if idvd is not None and os.path.isfile(idvd) else None,
+                        'width': width, 'length': length})
+    assert len(devices) != 0, 'There is no data in the IdVg path {0}.  Make sure the path is correct.'.format(idvg_path)
+    return devices
+
+
+def read_manifest(path):
+    """
+    Read the devices of a manifest, which is a csv file with a row for every device and the columns idvg_path, width, and length, plus the
+    optional columns name and idvd_path.  The width and length are in micrometers, and relative paths are relative to the manifest.
+    Args:
+        path (str): Path to the manifest
+
+    Returns:
+        list of dicts with the name, idvg_path, idvd_path, width, and length of every device
+    """
+    manifest = pd.read_csv(path)
+    manifest.columns = [column.strip().lower() for column in manifest.columns]
+    missing = [column for column in ('idvg_path', 'width', 'length') if column not in manifest.columns]
+    assert len(missing) == 0, 'The manifest {0} is missing the columns {1}'.format(path, missing)
+
+    root = os.path.dirname(os.path.abspath(path))
+    devices = []
+    for i, row in manifest.iterrows():
+        idvg = os.path.join(root, str(row['idvg_path']).strip())
+        idvd = row.get('idvd_path', None)
+        idvd = None if idvd is None or pd.isnull(idvd) else os.path.join(root, str(idvd).strip())
+        name = row.get('name', None)
+        devices.append({'name': os.path.splitext(os.path.basename(idvg))[0] if name is None or pd.isnull(name) else str(name),
+                        'idvg_path': idvg, 'idvd_path': idvd, 'width': float(row['width']), 'length': float(row['length'])})
+    return devices
+
+
+class BatchFETExtractor(object):
+    """
+    Extract the properties of many FETs in parallel.  Every device is extracted by a FETExtractor in a pool of worker processes, and the
+    published properties of the FETs (see BaseDevice.publish_csv) are collected into one table with a row for every device.
+
+    The FET_class, materials, and kwargs are handed to each worker process once when the pool starts (not with every device), and the
+    devices are scheduled in chunks so the workers are kept busy without sending every device separately.
+
+    Args:
+        devices (list): The devices to extract (see find_devices and read_manifest)
+        FET_class (class): The FET class of the devices (i.e. SemiPy.Devices.Devices.FET.ThinFilmFET.nTFT)
+        gate_oxide (Semiconductor): The gate oxide of the devices
+        channel (Semiconductor): The channel material of the devices
+        vd_values (list): The Vd values of the IdVg data.  If None, the Vd values are read from the data
+        processes (int): The number of worker processes.  Defaults to SEMIPY_PROCESSES, or the number of cpus.  If 1, the devices are
+         extracted in this process
+        chunksize (int): The number of devices sent to a worker at once.  Defaults to about four chunks per worker
+        **kwargs: Any other arguments of the FET_class (i.e. substrate)
+
+    Attributes:
+        results: A pd.DataFrame with a row for every device, and a column for the name, paths, and every property (with the unit in the
+         column name).  The error column has the error of devices that could not be extracted, and None for the devices that were
+         extracted.
+
+    Example:
+        >>> devices = read_manifest('wafer_3/manifest.csv')
+        >>> batch = BatchFETExtractor(devices, FET_class=nTFT, gate_oxide=SiO2(thickness=Value(30, ureg.nanometer)),
+        ...                           channel=MoS2(layer_number=1), substrate=Silicon(), processes=8)
+        >>> batch.results.to_csv('wafer_3.csv', index=False)
+    """
+
+    def __init__(self, devices, FET_class, gate_oxide, channel, vd_values=None, processes=None, chunksize=None, **kwargs):
+
+        self.devices = list(devices)
+        assert len(self.devices) != 0, 'There are no devices to extract'
+
+        if processes is None:
+            processes = BatchExtraction_Processes if BatchExtraction_Processes > 0 else os.cpu_count() or 1
+        self.processes = max(min(int(processes), len(self.devices)), 1)
+
+        if chunksize is None:
+            chunksize = int(math.ceil(len(self.devices) / (4.0 * self.processes)))
+        self.chunksize = max(int(chunksize), 1)
+
+        setup = (FET_class, dict(kwargs, gate_oxide=gate_oxide, channel=channel), vd_values)
+        if self.processes == 1:
+            _init_worker(*setup)
+            extracted = [_extract_device(device) for device in self.devices]
+        else:
+            with multiprocessing.Pool(processes=self.processes, initializer=_init_worker, initargs=setup) as pool:
+                extracted = pool.map(_extract_device, self.devices, chunksize=self.chunksize)
+
+        self.results = self._to_table(extracted)
+
+        failed = self.results['error'].notnull()
+        if np.any(failed):
+            warnings.warn('{0} of the {1} devices could not be extracted: {2}'.format(np.sum(failed), len(self.devices),
+                                                                                     list(self.results['name'][failed])))
+
+    def _to_table(self, extracted):
+        # one row per device.  A property with different units on different devices gets a column for every unit
+        rows = []
+        for device, (properties, _) in zip(self.devices, extracted):
+            row = {'name': device['name'], 'idvg_path': device['idvg_path'], 'idvd_path': device['idvd_path']}
+            row.update({'{0} ({1})'.format(key, unit): magnitude for key, (magnitude, unit) in properties.items()})
+            rows.append(row)
+        table = pd.DataFrame(rows)
+        # an object column keeps None for the devices that were extracted, instead of being inferred as a str column with nan
+        table['error'] = pd.Series([error for _, error in extracted], index=table.index, dtype=object)
+        columns = ['name', 'idvg_path', 'idvd_path'] + [column for column in table.columns
+                                                        if column not in ('name', 'idvg_path', 'idvd_path', 'error')] + ['error']
+        return table[columns]
+
+    def save_csv(self, path):
+        """
+        Save the results as a csv file
+        Args:
+            path (str): Path to the csv file
+
+        Returns:
+            None
+        """
+        self.results.to_csv(path, index=False)
+
+
+# the FET class and arguments of the devices in this worker process (see _init_worker)
+_worker_setup = None
+
+
+def _init_worker(FET_class, fet_kwargs, vd_values):
+    global _worker_setup
+    _worker_setup = (FET_class, fet_kwargs, vd_values)
+
+
+def _extract_device(device):
+    """
+    Extract one device in a worker process
+    Args:
+        device (dict): The device (see read_manifest)
+
+    Returns:
+        the published properties of the FET as a dict of (magnitude, unit str), and the error message (None if the extraction worked)
+    """
+    FET_class, fet_kwargs, vd_values = _worker_setup
+    try:
+        fet = FET_class(width=Value(device['width'], ureg.micrometer), length=Value(device['length'], ureg.micrometer), **fet_kwargs)
+        # the extractor prints its progress, which would interleave between the workers
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            FETExtractor(fet, vd_values=vd_values, idvg_path=device['idvg_path'], idvd_path=device['idvd_path'])
+    except Exception as e:
+        return {}, '{0}: {1}'.format(type(e).__name__, e)
+
+    if isinstance(fet, AmbipolarFET):
+        properties = {}
+        for prefix, branch in (('n_', fet.NBranch), ('p_', fet.PBranch)):
+            properties.update({prefix + key: value for key, value in _published_properties(branch).items()})
+        return properties, None
+    return _published_properties(fet), None
+
+
+def _published_properties(fet):
+    # the published properties of a FET (see BaseDevice.publish_csv) as plain floats and unit strs, so they are cheap to send back
+    properties = {}
+    for key in fet.publish_prop:
+        try:
+            prop = fet.__dict__[key]
+        except KeyError:
+            prop = getattr(fet, key)
+        if isinstance(prop, PhysicalProperty):
+            prop = prop.value
+        if isinstance(prop, Value):
+            properties[key] = (float(prop.magnitude), str(prop.unit))
+        elif prop is None:
+            properties[key] = (np.nan, '')
+    return properties
+
+
+def _to_micrometers(value):
+    if isinstance(value, Value):
+        assert value.unit.dimensionality == ureg.meter.dimensionality, 'The geometry must be a length, not {0}'.format(value.unit)
+        return float(value.adjust_unit(ureg.micrometer).magnitude)
+    return float(value)
+
+
+def _material(name, modules, **kwargs):
+    # find a material class by name in the given modules
+    for module in modules:
+        module = __import__(module, fromlist=[name])
+        if hasattr(module, name):
+            return getattr(module, name)(**kwargs)
+    raise ValueError('There is no material named {0}'.format(name))
+
+
+def main(argv=None):
+    """
+    Run a batch extraction from the command line
+    Args:
+        argv (list): The command line arguments.  Defaults to sys.argv
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description='Extract the properties of many FETs in parallel and save them as a csv file.')
+    parser.add_argument('path', help='A manifest csv file of the devices (see read_manifest), or a directory of IdVg data')
+    parser.add_argument('-o', '--output', default='fet_properties.csv', help='Path to the output csv file')
+    parser.add_argument('--idvd-path', default=None, help='A directory of IdVd data, for a directory of IdVg data')
+    parser.add_argument('--width', type=float, default=None, help='The width (micrometers), for a directory of IdVg data')
+    parser.add_argument('--length', type=float, default=None, help='The length (micrometers), for a directory of IdVg data')
+    parser.add_argument('--fet', default='nTFT', choices=['nTFT', 'pTFT', 'ambiTFT'], help='The FET class of the devices')
+    parser.add_argument('--oxide', default='SiO2', help='The gate oxide material (i.e. SiO2 or Al2O3)')
+    parser.add_argument('--tox', type=float, required=True, help='The gate oxide thickness (nanometers)')
+    parser.add_argument('--channel', default='MoS2', help='The 2D channel material (i.e. MoS2)')
+    parser.add_argument('--layers', type=int, default=1, help='The number of layers of the channel material')
+    parser.add_argument('--substrate', default='Silicon', help='The substrate material')
+    parser.add_argument('--vd', type=float, nargs='+', default=None, help='The Vd values of the IdVg data')
+    parser.add_argument('-j', '--processes', type=int, default=None, help='The number of worker processes')
+    parser.add_argument('--chunksize', type=int, default=None, help='The number of devices sent to a worker at once')
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.path):
+        assert args.width is not None and args.length is not None, 'Give the --width and --length of a directory of IdVg data'
+        devices = find_devices(args.path, width=args.width, length=args.length, idvd_path=args.idvd_path)
+    else:
+        devices = read_manifest(args.path)
+
+    FET_class = getattr(__import__('SemiPy.Devices.Devices.FET.ThinFilmFET', fromlist=[args.fet]), args.fet)
+    gate_oxide = _material(args.oxide, ['SemiPy.Devices.Materials.Oxides.MetalOxides'], thickness=Value(args.tox, ureg.nanometer))
+    channel = _material(args.channel, ['SemiPy.Devices.Materials.TwoDMaterials.TMD'], layer_number=args.layers)
+    substrate = _material(args.substrate, ['SemiPy.Devices.Materials.Semiconductors.BulkSemiconductors'])
+
+    batch = BatchFETExtractor(devices, FET_class=FET_class, gate_oxide=gate_oxide, channel=channel, substrate=substrate,
+                              vd_values=args.vd, processes=args.processes, chunksize=args.chunksize)
+    batch.save_csv(args.output)
+    print('Extracted {0} devices into {1}'.format(int(batch.results['error'].isnull().sum()), args.output))
+
+
+if __name__ == '__main__':
+    main()
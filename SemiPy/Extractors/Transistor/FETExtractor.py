@@ -2,15 +2,23 @@
 Extractor for extracting information of Field-Effect Transistors from IdVg and IdVd data sets.
 
 """
-from SemiPy.Extractors.Extractors import Extractor
+from SemiPy.Extractors.Extractors import Extractor, _pack_values, _unpack_values
+from SemiPy.Extractors.ResultCache import result_cache
+from SemiPy.Devices.PhysicalProperty import PhysicalProperty
 from SemiPy.Datasets.IVDataset import IdVgDataSet, IdVdDataSet
-from SemiPy.Devices.Devices.FET.Transistor import NFET, PFET,  AmbipolarFET
+from SemiPy.Datasets.UnitArray import UnitArray
+from SemiPy.Devices.Devices.FET.Transistor import AmbipolarFET
 from physics.value import Value, ureg
 import warnings
 import numpy as np
+from collections import OrderedDict, namedtuple
 from dash_cjm.plots.Basic import BasicPlot
 
 
+# a stage of the FET extraction (see FETExtractor.add_stage)
+ExtractionStage = namedtuple('ExtractionStage', ['name', 'func', 'inputs', 'eager'])
+
+
 class FETExtractor(Extractor):
 
     """
@@ -23,8 +31,14 @@ class FETExtractor(Extractor):
         tox (Value or float): Physical thickness of the FET oxide.  Should be a Value with correct units or float in nanometers.
         epiox (Value or float): Dielectric constant of the oxide.  Should be a Value or float (unitless).
         device_polarity (str): The polarity of the device, either 'n' or 'p' for electron or hole, respectively.
-        idvd_path (str): Path to the IdVd data.
-        idvg_path (str): Path to the IdVg data.
+        idvd_path (str or IdVdDataSet): Path to the IdVd data, or an already loaded IdVdDataSet.
+        idvg_path (str or IdVgDataSet): Path to the IdVg data, or an already loaded IdVgDataSet (i.e. a set from IdVgDataSet.stream).
+        lazy (bool): If True, nothing is extracted until it is asked for with extract.  The extraction is split into stages (max_ion,
+         gm_fwd, gm_bwd, gm, vt, ss, mobility, n, resistance), and extracting a stage only runs the stages it depends on.  The per Vd
+         properties (see extract_per_vd) are only extracted when asked for.
+        cache (ResultCache or bool): The cache of extraction results.  If the same files were already extracted with the same FET, the
+         data and properties are loaded from the cache instead of extracted.  Defaults to SemiPy.Extractors.ResultCache.result_cache
+         (which is turned on with SEMIPY_RESULT_CACHE_ENABLED=1), and False turns the cache off.  Lazy extractions are not cached.
 
     Attributes:
         FET: A SemiPy.Devices.FET.Transistor.Transistor instance.
@@ -41,9 +55,22 @@ class FETExtractor(Extractor):
         # access the extracted FET information.  See SemiPy.Devices.FET.Transistor.Transistor for full list of properties
         >>> print(fetdata.FET.max_gm)
         maximum transconductance = 3e-6 ampere / micrometer / volt
+        # only extract the threshold voltage (and the gm it needs)
+        >>> fetdata = FETExtractor(FET=fet, idvg_path=idvg_path, lazy=True)
+        >>> fetdata.extract('vt')
+        >>> print(fetdata.FET.Vt_avg)
     """
 
-    def __init__(self, FET, vd_values=None, idvd_path=None, idvg_path=None, *args, **kwargs):
+    # the extraction stages, in the order they are run when all the properties are extracted (see add_stage)
+    stages = OrderedDict()
+
+    # the version of the extraction for the ResultCache.  Increase it when a change to the extraction changes the results
+    cache_version = 1
+
+    # the properties of the FET saved in the ResultCache
+    cached_properties = ['max_Ion', 'max_gm', 'Vt_fwd', 'Vt_bwd', 'Vt_avg', 'hysteresis', 'min_ss', 'max_mobility']
+
+    def __init__(self, FET, vd_values=None, idvd_path=None, idvg_path=None, lazy=False, cache=None, *args, **kwargs):
 
         super(FETExtractor, self).__init__(*args, **kwargs)
 
@@ -51,19 +78,35 @@ class FETExtractor(Extractor):
         if idvd_path is None and idvg_path is None:
             raise ValueError('You have not given a path to IdVd or IdVg data, so there is nothing to extract')
 
+        # now create the FET model
+        self.FET = FET
+
+        # the results of the extraction stages, indexed by the stage name and the suffix of the FET branch (see extract)
+        self._stage_results = {}
+
+        # reuse the results of an earlier extraction of the same files with the same FET
+        cache = result_cache if cache is None else cache
+        cache_key = None
+        if cache and cache.enabled and not lazy and all(path is None or isinstance(path, str) for path in (idvg_path, idvd_path)):
+            cache_key = cache.key([idvg_path, idvd_path], device=self.FET, parameters={'vd_values': vd_values},
+                                  version='{0}|{1}|{2}'.format(type(self).__name__, self.cache_version, ','.join(self.stages.keys())))
+            if self._restore_cached_results(cache.get(cache_key)):
+                return
+
         if idvg_path is None:
             self.idvg = None
+        elif isinstance(idvg_path, IdVgDataSet):
+            self.idvg = idvg_path
         else:
             self.idvg = IdVgDataSet(data_path=idvg_path, secondary_independent_values=vd_values)
 
         if idvd_path is None:
             self.idvd = None
+        elif isinstance(idvd_path, IdVdDataSet):
+            self.idvd = idvd_path
         else:
             self.idvd = IdVdDataSet(data_path=idvd_path)
 
-        # now create the FET model
-        self.FET = FET
-
         # add some simple checks on the data.  Make sure Ig is not too high, Is and Id are reasonably matched, etc.
 
         # now normalize all the data in idvg and idvd
@@ -77,84 +120,279 @@ class FETExtractor(Extractor):
             self.idvd.adjust_column('id', func=adjust_current)
 
         # now run the extractions
-        if isinstance(self.FET, AmbipolarFET):
-            self.__extract_data(self.FET.NBranch, True)
-            self.__extract_data(self.FET.PBranch, True)
-        else:
-            self.__extract_data(self.FET, False)
+        if not lazy:
+            self.extract(*[name for name, stage in self.stages.items() if stage.eager])
 
-    def __extract_data(self, FET_instance, is_ambi): # Added type to indicate n/p/a-type
+        if cache_key is not None:
+            cache.put(cache_key, self._cached_results(), data_paths=[idvg_path, idvd_path])
+
+    def _cached_results(self):
+        """
+        The results of the extraction for the ResultCache: the data (with the derived columns), the results of the stages, and the
+        extracted properties of the FET
+        """
+        properties = {}
+        for FET_instance, suffix in self._branches():
+            for name in self.cached_properties:
+                prop = getattr(FET_instance, name)
+                if isinstance(prop, PhysicalProperty):
+                    if prop.value is not None:
+                        properties[(suffix, name)] = (prop.value, prop.input_values)
+                elif prop is not None:
+                    # a property that was replaced by a Value (i.e. min_ss)
+                    properties[(suffix, name)] = (prop, None)
+        return _pack_values({'idvg': self.idvg, 'idvd': self.idvd, 'stages': self._stage_results, 'properties': properties})
+
+    def _restore_cached_results(self, results):
         """
-        Extract the properties of the FET given the available data, including transconductance (gm), subthreshold swing (ss), field-effect
-        mobility (mufe), threshold voltage (vt), max on current (max_Ion), min off current at max Ion Vd (min_Ioff),
+        Restore the results of an extraction from the ResultCache (see _cached_results)
+        Returns:
+            bool of if the results were restored
+        """
+        if results is None:
+            return False
+        results = _unpack_values(results)
+        self.idvg, self.idvd = results['idvg'], results['idvd']
+        self._stage_results.update(results['stages'])
+        branches = dict((suffix, FET_instance) for FET_instance, suffix in self._branches())
+        for (suffix, name), (value, input_values) in results['properties'].items():
+            if input_values is not None:
+                getattr(branches[suffix], name).set(value, input_values)
+            else:
+                setattr(branches[suffix], name, value)
+        return True
+
+    @classmethod
+    def add_stage(cls, name, func, inputs=(), eager=True):
+        """
+        Add a stage to the extraction.  A stage is run at most once per FET branch, after the stages it takes as inputs.
+        Args:
+            name (str): The name of the stage
+            func (function): The function of the stage, called as func(extractor, FET_instance, suffix, *input results) where suffix is
+             added to the names of the columns of the FET branch ('_n' or '_p' for AmbipolarFETs).  The return is the result of the stage.
+            inputs (list): The names of the stages this stage depends on.  These must already be stages of the extractor.
+            eager (bool): If False, the stage is only run when it is asked for, even when the extractor is not lazy
+
+        Returns:
+            None
+        """
+        missing = [stage for stage in inputs if stage not in cls.stages]
+        assert len(missing) == 0, 'The inputs {0} of the stage {1} are not stages of {2}'.format(missing, name, cls.__name__)
+        # copy the stages so a stage added to a subclass is not added to its parents
+        if 'stages' not in cls.__dict__:
+            cls.stages = OrderedDict(cls.stages)
+        cls.stages[name] = ExtractionStage(name=name, func=func, inputs=tuple(inputs), eager=eager)
+
+    def extract(self, *names):
+        """
+        Run extraction stages, and the stages they depend on, for every FET branch.  Stages that have already run are not run again
+        Args:
+            *names (str): The names of the stages (see stages)
+
         Returns:
             None
         """
         print('starting extraction')
+        for FET_instance, suffix in self._branches():
+            for name in names:
+                self._run_stage(name, FET_instance, suffix)
 
-        # check the type of FET inserted
-        if is_ambi:
-            if isinstance(FET_instance, NFET):
-                type = "_n"
-            elif isinstance(FET_instance, PFET):
-                type = "_p"
-        else:
-            type = ""
+    def get_stage_result(self, name, suffix=''):
+        """
+        Get the result of an extraction stage, running the stage if it has not run yet
+        Args:
+            name (str): The name of the stage
+            suffix (str): The suffix of the FET branch, '_n' or '_p' for the branches of an AmbipolarFET
+
+        Returns:
+            The result of the stage
+        """
+        branches = dict((branch_suffix, FET_instance) for FET_instance, branch_suffix in self._branches())
+        assert suffix in branches, 'The suffix {0} is not a branch of the FET.  Use one of {1}'.format(suffix, list(branches.keys()))
+        return self._run_stage(name, branches[suffix], suffix)
 
-        # now compute the vt and gm using the max Vd
+    def clear_stages(self):
+        """
+        Forget the results of the extraction stages, so they are run again (i.e. after the data is changed)
+        Returns:
+            None
+        """
+        self._stage_results.clear()
+
+    def _branches(self):
+        # the FET instances of the extraction, with the suffix of their columns
+        if isinstance(self.FET, AmbipolarFET):
+            return [(self.FET.NBranch, '_n'), (self.FET.PBranch, '_p')]
+        return [(self.FET, '')]
+
+    def _run_stage(self, name, FET_instance, suffix):
+        assert name in self.stages, 'There is no extraction stage {0}.  The stages are {1}'.format(name, list(self.stages.keys()))
+        key = (name, suffix)
+        if key not in self._stage_results:
+            stage = self.stages[name]
+            inputs = [self._run_stage(stage_input, FET_instance, suffix) for stage_input in stage.inputs]
+            self._stage_results[key] = stage.func(self, FET_instance, suffix, *inputs)
+        return self._stage_results[key]
+
+    def _get_vd(self):
+        # the Vd of every set of the IdVg data, with the shape [num_set, 1]
         vd = self.idvg.get_secondary_indep_values()
-        # adjust the shape to be [num_set, 1]
-        vd = Value.array_like(np.expand_dims(np.array(vd), axis=-1), unit=ureg.volt)
-        max_vd = max(vd)
+        return Value.array_like(np.expand_dims(np.array(vd), axis=-1), unit=ureg.volt)
 
+    def _stage_max_ion(self, FET_instance, suffix):
+        """
+        The max on current (max_Ion)
+        """
+        vd = self._get_vd()
         vg = self.idvg.get_column('vg')
-        max_vg = FET_instance.max_value(vg)
-
-        # get the max and min Ion
         ion = self.idvg.get_column('id')
         max_ion, max_ion_i = FET_instance.max_value(ion, return_index=True)
         max_ion_vd = vd[max_ion_i[0], 0]
         max_ion_vg = vg[max_ion_i]
         FET_instance.max_Ion.set(value=max_ion, input_values={'Vg': max_ion_vg, 'Vd': max_ion_vd})
+        return max_ion
 
-        # compute the gm
-        gm_fwd, max_gm_fwd, max_gm_fwd_i = self._extract_gm(FET_instance, fwd=True, return_max=True)
-        gm_bwd, max_gm_bwd, max_gm_bwd_i = self._extract_gm(FET_instance, bwd=True, return_max=True)
+    def _stage_gm_fwd(self, FET_instance, suffix):
+        """
+        The transconductance (gm) of the fwd sweep, with its max and the index of the max
+        """
+        return self._extract_gm(FET_instance, fwd=True, return_max=True)
 
-        gm = np.concatenate((gm_fwd, gm_bwd), axis=-1)
+    def _stage_gm_bwd(self, FET_instance, suffix):
+        """
+        The transconductance (gm) of the bwd sweep, with its max and the index of the max
+        """
+        return self._extract_gm(FET_instance, bwd=True, return_max=True)
 
-        self.idvg.add_column(column_name='gm'+type, column_data=gm)
-        max_gm, max_gm_i = FET_instance.max_slope_value(self.idvg.get_column(column_name='gm'+type), return_index=True)
+    def _stage_gm(self, FET_instance, suffix, gm_fwd, gm_bwd):
+        """
+        The gm column and the max transconductance (max_gm)
+        """
+        # the derived columns are recomputed by the dataset whenever vg or id change (i.e. by adjust_column)
+        self.idvg.add_derived_column('gm'+suffix, func=self._gm_column, depends_on=['vg', 'id'])
+        # the fwd and bwd gm of a single sweep are both the gm of the whole sweep
+        gm = gm_fwd[0] if self.idvg.sweep_number == 1 else np.concatenate((gm_fwd[0], gm_bwd[0]), axis=-1)
+        max_gm, max_gm_i = FET_instance.max_slope_value(gm, return_index=True)
 
-        max_gm_vd = vd[max_gm_i[0], 0]
+        max_gm_vd = self._get_vd()[max_gm_i[0], 0]
         max_gm_input_values = {'Vg': self.idvg.get_column_set('vg', max_gm_vd)[max_gm_i[-1]], 'Vd': max_gm_vd}
 
         FET_instance.max_gm.set(max_gm, max_gm_input_values)
-        # print('set gm')
-        # Now extract the Vt values
+        return max_gm
+
+    def _gm_column(self, vg, id):
+        # the gm of the fwd and bwd sweeps of the given sets, or of the whole sweep of single sweep data
+        if self.idvg.sweep_number == 1:
+            return self._slope(x_data=vg, y_data=id, keep_dims=True)
+        sweeps = [self.idvg.get_sweep_slice('fwd'), self.idvg.get_sweep_slice('bwd')]
+        return np.concatenate([self._slope(x_data=vg[..., sweep], y_data=id[..., sweep], keep_dims=True) for sweep in sweeps], axis=-1)
+
+    def _stage_vt(self, FET_instance, suffix, gm_fwd, gm_bwd):
+        """
+        The fwd, bwd, and average threshold voltages (Vt) and the hysteresis
+        """
+        _, max_gm_fwd, max_gm_fwd_i = gm_fwd
+        _, max_gm_bwd, max_gm_bwd_i = gm_bwd
         vt_fwd = self._extract_vt(index=max_gm_fwd_i, max_gm=max_gm_fwd, fwd=True)
         vt_bwd = self._extract_vt(index=max_gm_bwd_i, max_gm=max_gm_bwd, bwd=True)
 
         FET_instance.Vt_fwd.set(vt_fwd)
         FET_instance.Vt_bwd.set(vt_bwd)
+        FET_instance.compute_properties()
+        # the carrier density is computed from the average Vt, so it is stale once the Vt changes
+        self.idvg.invalidate_column('n'+suffix)
+        return vt_fwd, vt_bwd
 
-        # compute the ss
-        ss = self._slope(y_data=self.idvg.get_column('vg'),
-                         x_data=np.log10(self.idvg.get_column('id')),
-                         keep_dims=True, remove_zeroes=True)
-        self.idvg.add_column(column_name='ss'+type, column_data=ss)
-        FET_instance.min_ss = FET_instance.min_value(self.idvg.get_column(column_name='ss'+type), return_index=False)
+    def _stage_ss(self, FET_instance, suffix):
+        """
+        The ss column and the min subthreshold swing (min_ss)
+        """
+        self.idvg.add_derived_column('ss'+suffix, func=lambda vg, id: self._slope(y_data=vg, x_data=np.log10(self._upcast(id)),
+                                                                                  keep_dims=True, remove_zeroes=True),
+                                     depends_on=['vg', 'id'])
+        FET_instance.min_ss = FET_instance.min_value(self.idvg.get_column(column_name='ss'+suffix), return_index=False)
+        return FET_instance.min_ss
 
+    def _stage_mobility(self, FET_instance, suffix, max_gm, vt):
+        """
+        The max field-effect mobility (max_mobility)
+        """
         FET_instance.compute_properties()
+        return FET_instance.max_mobility.value
+
+    def _stage_n(self, FET_instance, suffix, vt):
+        """
+        The carrier density (n) column.  The column is computed from the Vt of the vt stage, and is marked stale when the Vt changes
+        """
+        self.idvg.add_derived_column('n'+suffix, func=FET_instance.vg_to_n, depends_on=['vg'])
 
-        # now compute the carrier density
-        n = FET_instance.vg_to_n(self.idvg.get_column('vg'))
-        self.idvg.add_column('n'+type, n)
+    def _stage_resistance(self, FET_instance, suffix):
+        """
+        The resistance column
+        """
+        # the Vd column is used instead of the Vd of each set, so that sets added by append_sweep are computed with their own Vd.  If the
+        # data do not have a Vd column, it is made from the Vd of each set (and append_sweep then fills it for the new sets)
+        if not self.idvg.has_column('vd'):
+            self.idvg.add_column('vd', self._get_vd() * np.ones(shape=self.idvg.get_column('id').shape))
+        self.idvg.add_derived_column('resistance'+suffix, func=lambda vd, id: vd / id, depends_on=['vd', 'id'])
 
-        # print('adding r')
-        # now compute the resistance
-        r = vd / self.idvg.get_column('id')
-        self.idvg.add_column('resistance'+type, r)
+    def extract_per_vd(self, suffix=''):
+        """
+        Extract the gm, max gm, Vt, min ss, and max mobility of every Vd set of the IdVg data.  All the sets are extracted at once over the
+        (sets x points) data, so the cost barely grows with the number of Vd values.
+        Args:
+            suffix (str): The suffix of the FET branch, '_n' or '_p' for the branches of an AmbipolarFET
+
+        Returns:
+            dict of arrays with a value for each Vd: vd, max_gm (of both sweeps), max_gm_index (index of the max in the fwd then bwd
+            points), max_gm_vg, max_gm_fwd, max_gm_index_fwd, vt_fwd, max_gm_bwd, max_gm_index_bwd, vt_bwd, vt_avg, hysteresis, min_ss,
+            and max_mobility.  The gm_fwd and gm_bwd are the gm of every point, with the shape of the data
+        """
+        return self.get_stage_result('per_vd', suffix)
+
+    def _stage_per_vd(self, FET_instance, suffix):
+        """
+        The properties of every Vd set (see extract_per_vd)
+        """
+        vd = UnitArray(self.idvg.get_secondary_indep_values(), unit=ureg.volt)
+        results = {'vd': vd}
+        gm_unit = FET_instance.max_gm.prop_standard_units
+
+        vg = {}
+        for direction in ('fwd', 'bwd'):
+            current, gate = self._sweep_directions(['id', 'vg'], fwd=direction == 'fwd', bwd=direction == 'bwd')
+            vg[direction], current = self.idvg.get_column(gate), self.idvg.get_column(current)
+            gm = self._slope(x_data=vg[direction], y_data=current, keep_dims=True)
+            max_gm, max_gm_i = FET_instance.max_slope_value(gm, return_index=True, axis=-1)
+
+            # the line through the point of max gm of each set, with the slope of the max gm
+            sets = np.arange(gm.shape[0])
+            _, _, vt = self._linear_extraction(y=current[sets, max_gm_i], x=vg[direction][sets, max_gm_i], slope=max_gm)
+
+            results['gm_' + direction] = gm
+            results['max_gm_' + direction] = max_gm if gm_unit is None else max_gm.adjust_unit(gm_unit)
+            results['max_gm_index_' + direction] = max_gm_i
+            results['vt_' + direction] = vt
+
+        results['vt_avg'] = (results['vt_fwd'] + results['vt_bwd']) / 2.0
+        results['hysteresis'] = results['vt_fwd'] - results['vt_bwd']
+
+        # the max gm of both sweeps, as in the gm stage
+        max_gm, max_gm_i = FET_instance.max_slope_value(np.concatenate((results['gm_fwd'], results['gm_bwd']), axis=-1),
+                                                        return_index=True, axis=-1)
+        results['max_gm'] = max_gm if gm_unit is None else max_gm.adjust_unit(gm_unit)
+        results['max_gm_index'] = max_gm_i
+        results['max_gm_vg'] = np.concatenate((vg['fwd'], vg['bwd']), axis=-1)[np.arange(max_gm.shape[0]), max_gm_i]
+
+        # the min ss of each set, as in the ss stage
+        ss = self._slope(y_data=self.idvg.get_column('vg'), x_data=np.log10(self._upcast(self.idvg.get_column('id'))),
+                         keep_dims=True, remove_zeroes=True)
+        results['min_ss'] = FET_instance.min_value(ss, axis=-1).adjust_unit(ureg.micrometer * ureg.millivolt / ureg.ampere)
+
+        # the mobility at the max gm of each set, as in FET.compute_properties
+        mobility = max_gm * FET_instance.length / (vd * FET_instance.gate_oxide.capacitance)
+        results['max_mobility'] = mobility.adjust_unit(ureg.centimeter * ureg.centimeter / (ureg.volt * ureg.second))
+        return results
 
     def save_plots(self):
 
@@ -268,3 +506,15 @@ class FETExtractor(Extractor):
 
         # now return all the properties
         return length, width
+
+
+FETExtractor.add_stage('max_ion', FETExtractor._stage_max_ion)
+FETExtractor.add_stage('gm_fwd', FETExtractor._stage_gm_fwd)
+FETExtractor.add_stage('gm_bwd', FETExtractor._stage_gm_bwd)
+FETExtractor.add_stage('gm', FETExtractor._stage_gm, inputs=['gm_fwd', 'gm_bwd'])
+FETExtractor.add_stage('vt', FETExtractor._stage_vt, inputs=['gm_fwd', 'gm_bwd'])
+FETExtractor.add_stage('ss', FETExtractor._stage_ss)
+FETExtractor.add_stage('mobility', FETExtractor._stage_mobility, inputs=['gm', 'vt'])
+FETExtractor.add_stage('n', FETExtractor._stage_n, inputs=['vt'])
+FETExtractor.add_stage('resistance', FETExtractor._stage_resistance)
+FETExtractor.add_stage('per_vd', FETExtractor._stage_per_vd, eager=False)
@@ -0,0 +1,55 @@
+"""
+Testing for the batch FET extractor
+"""
+import unittest
+import os
+import tempfile
+import numpy as np
+from SemiPy.Extractors.Transistor.BatchFETExtractor import BatchFETExtractor, read_manifest, main
+from SemiPy.Devices.Materials.TwoDMaterials.TMD import MoS2
+from SemiPy.Devices.Materials.Oxides.MetalOxides import SiO2
+from SemiPy.Devices.Materials.Semiconductors.BulkSemiconductors import Silicon
+from SemiPy.Devices.Devices.FET.ThinFilmFET import nTFT
+from SemiPy.helper.paths import get_abs_semipy_path
+
+from physics.value import Value, ureg
+
+
+class TestBatchFETExtractor(unittest.TestCase):
+
+    def test_batch_extraction(self):
+        idvd_path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vd.txt')
+        idvg_path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        with tempfile.TemporaryDirectory() as directory:
+            # the same data as two devices of different widths, and a device with missing data
+            manifest = os.path.join(directory, 'manifest.csv')
+            with open(manifest, 'w') as f:
+                f.write('name,idvg_path,idvd_path,width,length\n')
+                f.write('die_1,{0},{1},1.0,1.0\n'.format(idvg_path, idvd_path))
+                f.write('die_2,{0},,2.0,1.0\n'.format(idvg_path))
+                f.write('die_3,missing.txt,,1.0,1.0\n')
+            devices = read_manifest(manifest)
+            self.assertEqual([device['name'] for device in devices], ['die_1', 'die_2', 'die_3'])
+            self.assertIsNone(devices[1]['idvd_path'])
+
+            batch = BatchFETExtractor(devices, FET_class=nTFT, gate_oxide=SiO2(thickness=Value(30, ureg.nanometer)),
+                                      channel=MoS2(layer_number=1), substrate=Silicon(), processes=2, chunksize=1)
+            results = batch.results
+            self.assertEqual(list(results['name']), ['die_1', 'die_2', 'die_3'])
+            self.assertEqual(results['error'].dtype, object)
+            self.assertIsNone(results['error'][0])
+            self.assertIsNotNone(results['error'][2])
+
+            # the same extraction as test_fetextractor, and the current density halves with twice the width
+            vt = [column for column in results.columns if column.startswith('Vt_avg')][0]
+            gm = [column for column in results.columns if column.startswith('max_gm')][0]
+            self.assertAlmostEqual(results[vt][0], 3.78, 1)
+            self.assertAlmostEqual(results[vt][0], results[vt][1], 5)
+            self.assertAlmostEqual(results[gm][0], 2.0 * results[gm][1], 5)
+            self.assertTrue(np.isnan(results[gm][2]))
+
+            # the command line gives the same table
+            output = os.path.join(directory, 'results.csv')
+            main([manifest, '-o', output, '--tox', '30', '-j', '1'])
+            self.assertTrue(os.path.exists(output))
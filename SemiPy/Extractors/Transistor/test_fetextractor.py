@@ -2,7 +2,11 @@
 Testing for transistor models
 """
 import unittest
+import pickle
+import numpy as np
+import pandas as pd
 from SemiPy.Extractors.Transistor.FETExtractor import FETExtractor
+from SemiPy.Datasets.IVDataset import IdVgDataSet
 from SemiPy.Devices.Materials.TwoDMaterials.TMD import MoS2
 from SemiPy.Devices.Materials.Oxides.MetalOxides import SiO2, aIGZO
 from SemiPy.Devices.Materials.Semiconductors.BulkSemiconductors import Silicon
@@ -121,7 +125,125 @@ class TestFETExtractors(unittest.TestCase):
         print(result.FET.max_mobility)
         print(result.FET.Vt_avg)
         print(result.FET.min_ss)
-        
+
+    def test_lazy_stages(self):
+        idvg_path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        gate_oxide = SiO2(thickness=Value(30, ureg.nanometer))
+        fet = nTFT(gate_oxide=gate_oxide, channel=MoS2(layer_number=1), width=Value(1, ureg.micrometer), substrate=Silicon(),
+                   length=Value(1, ureg.micrometer))
+
+        result = FETExtractor(FET=fet, idvg_path=idvg_path, lazy=True)
+        self.assertEqual(len(result._stage_results), 0)
+
+        # only vt and its inputs are extracted
+        result.extract('vt')
+        self.assertEqual(sorted(name for name, suffix in result._stage_results.keys()), ['gm_bwd', 'gm_fwd', 'vt'])
+        self.assertIsNone(result.FET.max_gm.value)
+        self.assertNotIn('ss', result.idvg._derived_columns)
+        self.assert_value_equals(result.FET.Vt_avg, Value(3.78, ureg.volt), 'Vt avg')
+
+        # the stages that already ran are reused
+        vt = result.get_stage_result('vt')
+        result.extract('vt', 'mobility')
+        self.assertIs(result.get_stage_result('vt'), vt)
+        self.assert_value_equals(result.FET.max_mobility, Value(15.82, ureg.centimeter ** 2 / ureg.second / ureg.volt), 'Max Mobility')
+
+        # the gm column is the gm of the fwd and bwd stages
+        gm = np.concatenate((result.get_stage_result('gm_fwd')[0], result.get_stage_result('gm_bwd')[0]), axis=-1)
+        self.assertTrue(np.allclose(result.idvg.get_column('gm').magnitude, np.asarray(gm.magnitude), equal_nan=True))
+
+        # the carrier density is computed again when the Vt changes
+        result.extract('n')
+        n = np.array(result.idvg.get_column('n').magnitude)
+        result.clear_stages()
+        result.idvg.adjust_column('id', func=lambda id: id + 2.0 * np.nanmax(id))
+        result.extract('vt')
+        self.assertNotAlmostEqual(result.FET.Vt_avg.magnitude, 3.78, 1)
+        self.assertTrue(np.allclose(result.idvg.get_column('n').magnitude, np.asarray(fet.vg_to_n(result.idvg.get_column('vg')).magnitude),
+                                    equal_nan=True))
+        self.assertFalse(np.allclose(result.idvg.get_column('n').magnitude, n, equal_nan=True))
+
+        # new stages can be added to a subclass
+        class OnOffExtractor(FETExtractor):
+            pass
+        OnOffExtractor.add_stage('on_off', lambda extractor, FET_instance, suffix, max_ion: 2.0 * max_ion, inputs=['max_ion'])
+        self.assertNotIn('on_off', FETExtractor.stages)
+        result = OnOffExtractor(FET=fet, idvg_path=idvg_path, lazy=True)
+        self.assertAlmostEqual(result.get_stage_result('on_off').magnitude, 2.0 * result.get_stage_result('max_ion').magnitude)
+
+    def test_per_vd_extraction(self):
+        idvg_path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        gate_oxide = SiO2(thickness=Value(30, ureg.nanometer))
+        fet = nTFT(gate_oxide=gate_oxide, channel=MoS2(layer_number=1), width=Value(1, ureg.micrometer), substrate=Silicon(),
+                   length=Value(1, ureg.micrometer))
+
+        result = FETExtractor(FET=fet, idvg_path=idvg_path)
+        self.assertNotIn(('per_vd', ''), result._stage_results)
+        per_vd = result.extract_per_vd()
+        self.assertEqual(list(per_vd['vd'].magnitude), result.idvg.get_secondary_indep_values())
+
+        # the same as extracting each Vd set on its own
+        for i, vd in enumerate(result.idvg.get_secondary_indep_values()):
+            vg = result.idvg.get_column_set('vg_fwd', vd)
+            id = result.idvg.get_column_set('id_fwd', vd)
+            gm = result._slope(x_data=vg, y_data=id, keep_dims=True)
+            max_gm, max_gm_i = fet.max_slope_value(gm, return_index=True)
+            _, _, vt = result._linear_extraction(x=vg[max_gm_i], y=id[max_gm_i], slope=max_gm)
+            self.assertEqual(per_vd['max_gm_index_fwd'][i], max_gm_i[0])
+            self.assertAlmostEqual(per_vd['vt_fwd'][i].magnitude, vt.magnitude, 5)
+
+        # the max over all the Vd sets is the extracted property of the FET
+        self.assert_value_equals(per_vd['vt_fwd'][-1], Value(3.5, ureg.volt), 'Vt fwd at max Vd')
+        self.assert_value_equals(per_vd['vt_avg'][-1], Value(3.78, ureg.volt), 'Vt avg at max Vd')
+        self.assert_value_equals(per_vd['max_gm'][-1], Value(3.64, ureg.microsiemens / ureg.micrometer), 'Max Gm at max Vd')
+        self.assert_value_equals(per_vd['max_mobility'][-1], Value(15.82, ureg.centimeter ** 2 / ureg.second / ureg.volt),
+                                 'Max Mobility at max Vd')
+        self.assert_value_equals(per_vd['min_ss'].min(), Value(534.15, ureg.micrometer * ureg.millivolt / ureg.ampere), 'min SS')
+
+    def test_append_sweep(self):
+        idvg_path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+
+        gate_oxide = SiO2(thickness=Value(30, ureg.nanometer))
+        fet = nTFT(gate_oxide=gate_oxide, channel=MoS2(layer_number=1), width=Value(1, ureg.micrometer), substrate=Silicon(),
+                   length=Value(1, ureg.micrometer))
+
+        result = FETExtractor(FET=fet, idvg_path=idvg_path)
+        resistance = np.array(result.idvg.get_column('resistance').magnitude)
+
+        # the derived columns of a new Vd set are computed with the Vd of that set
+        vg = result.idvg.get_column_set('vg', Value(2.0, ureg.volt))
+        id = result.idvg.get_column_set('id', Value(2.0, ureg.volt))
+        result.idvg.append_sweep(Value(4.0, ureg.volt), {'Vg': vg, 'Id': id})
+        new_resistance = result.idvg.get_column('resistance').magnitude
+
+        self.assertEqual(new_resistance.shape[0], resistance.shape[0] + 1)
+        self.assertTrue(np.allclose(new_resistance[:-1], resistance, equal_nan=True))
+        self.assertTrue(np.allclose(new_resistance[-1], 2.0 * resistance[-1], equal_nan=True),
+                        'Error in the FET extractor.  The resistance of the appended set should use its own Vd')
+
+    def test_single_sweep(self):
+        # a single fwd sweep with the max gm at Vg = 10 V, so Vt = 10 - id / gm = 7 V
+        vg = np.linspace(0.0, 20.0, 41)
+        id = 1e-6 * (np.tanh((vg - 10.0) / 3.0) + 1.0)
+        idvg = IdVgDataSet(data_path=pd.DataFrame({'GateV(1)': vg, 'DrainI(1)': id, 'DrainV(1)': np.full(vg.size, 1.0),
+                                                   'GateV(2)': vg, 'DrainI(2)': 2.0 * id, 'DrainV(2)': np.full(vg.size, 2.0)}))
+        self.assertEqual(idvg.sweep_number, 1)
+
+        gate_oxide = SiO2(thickness=Value(30, ureg.nanometer))
+        fet = nTFT(gate_oxide=gate_oxide, channel=MoS2(layer_number=1), width=Value(1, ureg.micrometer), substrate=Silicon(),
+                   length=Value(1, ureg.micrometer))
+        result = FETExtractor(FET=fet, idvg_path=idvg)
+
+        self.assertEqual(result.idvg.get_column('gm').shape, (2, vg.size), 'Error in the FET extractor.  The gm of a single sweep'
+                                                                           ' should have a point for every Vg')
+        self.assert_value_equals(result.FET.Vt_fwd, Value(7.0, ureg.volt), 'Vt fwd of a single sweep')
+        self.assert_value_equals(result.FET.Vt_avg, Value(7.0, ureg.volt), 'Vt avg of a single sweep')
+
+        # every derived column can be computed, so the dataset can be pickled
+        result = pickle.loads(pickle.dumps(result.idvg))
+        self.assertEqual(result.get_column('gm').shape, (2, vg.size))
 
     def assert_value_equals(self, result_value, true_value, value_name):
 
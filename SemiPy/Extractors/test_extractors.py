@@ -0,0 +1,43 @@
+"""
+Testing for the base extractor
+"""
+import unittest
+import warnings
+import numpy as np
+from SemiPy.Extractors.Extractors import Extractor
+from physics.value import Value, ureg
+
+
+class TestExtractor(unittest.TestCase):
+
+    def test_linear_regression(self):
+
+        x = np.array([[1.0, 1.0], [2.0, 2.0], [3.0, 3.0], [4.0, np.nan]])
+        y = np.array([[3.0, 1.0], [5.0, 3.0], [7.1, 5.0], [8.9, np.nan]])
+
+        a, a_error, b, b_error = Extractor().linear_regression(x, y)
+
+        for i in range(2):
+            fit, cov = np.polyfit(x[:, i][~np.isnan(x[:, i])], y[:, i][~np.isnan(y[:, i])], 1, cov=True)
+            self.assertAlmostEqual(a[i], fit[0], 10, 'Error in Extractor.linear_regression.  The slope should be {0} but is'
+                                                     ' {1}'.format(fit[0], a[i]))
+            self.assertAlmostEqual(b[i], fit[1], 10, 'Error in Extractor.linear_regression.  The intercept should be {0} but is'
+                                                     ' {1}'.format(fit[1], b[i]))
+        self.assertAlmostEqual(a_error[0], np.sqrt(np.polyfit(x[:, 0], y[:, 0], 1, cov=True)[1][0, 0]), 10)
+
+    def test_two_point_regression(self):
+
+        # a TLM with only two devices gives the line through the two points, and the errors cannot be computed
+        lengths = Value.array_like(np.array([1.0, 2.0]), unit=ureg.micrometer)
+        resistances = Value.array_like(np.array([3.0, 5.0]), unit=ureg.ohm)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            a, a_error, b, b_error = Extractor().linear_regression(lengths, resistances)
+
+        self.assertEqual(len(caught), 1, 'Error in Extractor.linear_regression.  A regression of 2 points should warn once')
+        self.assertAlmostEqual(a.magnitude, 2.0, 10)
+        self.assertAlmostEqual(b.magnitude, 1.0, 10)
+        self.assertTrue(np.isnan(a_error.magnitude) and np.isnan(b_error.magnitude), 'Error in Extractor.linear_regression.  The'
+                                                                                     ' errors of 2 points should be nan but are'
+                                                                                     ' {0} and {1}'.format(a_error, b_error))
@@ -0,0 +1,63 @@
+"""
+Testing for the cache of extraction results
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from SemiPy.Extractors.ResultCache import ResultCache
+from SemiPy.Extractors.Transistor.FETExtractor import FETExtractor
+from SemiPy.Devices.Materials.TwoDMaterials.TMD import MoS2
+from SemiPy.Devices.Materials.Oxides.MetalOxides import SiO2
+from SemiPy.Devices.Materials.Semiconductors.BulkSemiconductors import Silicon
+from SemiPy.Devices.Devices.FET.ThinFilmFET import nTFT
+from SemiPy.helper.paths import get_abs_semipy_path
+from physics.value import Value, ureg
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_path, ignore_errors=True)
+
+    def create_fet(self, width=1.0, tox=30.0):
+        return nTFT(gate_oxide=SiO2(thickness=Value(tox, ureg.nanometer)), channel=MoS2(layer_number=1), substrate=Silicon(),
+                    width=Value(width, ureg.micrometer), length=Value(1.0, ureg.micrometer))
+
+    def test_result_cache(self):
+
+        path = get_abs_semipy_path('SampleData/FETExampleData/WSe2_Sample_4_Id_Vg.txt')
+        cache = ResultCache(path=self.cache_path, max_size=2**30, enabled=True)
+
+        extracted = FETExtractor(FET=self.create_fet(), idvg_path=path, cache=cache)
+        self.assertEqual(len(os.listdir(self.cache_path)), 1, 'Error in the ResultCache.  The extraction should be cached')
+
+        # a cache hit must not load the data file
+        with mock.patch('SemiPy.Extractors.Transistor.FETExtractor.IdVgDataSet', side_effect=AssertionError('the data was loaded')):
+            cached = FETExtractor(FET=self.create_fet(), idvg_path=path, cache=cache)
+
+        for name in ('Vt_avg', 'Vt_fwd', 'max_gm', 'max_mobility', 'max_Ion'):
+            self.assertAlmostEqual(getattr(cached.FET, name).value.magnitude, getattr(extracted.FET, name).value.magnitude, 5,
+                                   'Error in the ResultCache.  The cached {0} does not match the extraction'.format(name))
+        self.assertAlmostEqual(cached.FET.min_ss.magnitude, extracted.FET.min_ss.magnitude, 5)
+        self.assertEqual(cached.FET.max_gm['Vd'], extracted.FET.max_gm['Vd'])
+        self.assertTrue(np.allclose(np.asarray(cached.idvg.get_column('n'), dtype=float),
+                                    np.asarray(extracted.idvg.get_column('n'), dtype=float)),
+                        'Error in the ResultCache.  The cached carrier density does not match the extraction')
+
+        # a different FET is a different entry
+        FETExtractor(FET=self.create_fet(tox=90.0), idvg_path=path, cache=cache)
+        self.assertEqual(len(os.listdir(self.cache_path)), 2)
+
+        self.assertEqual(cache.invalidate(path), 2, 'Error in the ResultCache.  Both entries of the file should be invalidated')
+        self.assertEqual(len(os.listdir(self.cache_path)), 0)
+
+        cache.max_size = 0
+        FETExtractor(FET=self.create_fet(), idvg_path=path, cache=cache)
+        self.assertEqual(len(os.listdir(self.cache_path)), 0, 'Error in the ResultCache.  All entries should be evicted when the max'
+                                                              ' size is 0')
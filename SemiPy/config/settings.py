@@ -5,3 +5,22 @@ import os
 
 # get the path to the SemiPy directory
 SemiPy_Path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the on-disk cache of parsed data files (see SemiPy.Datasets.ParseCache).  Set SEMIPY_PARSE_CACHE_ENABLED=1 to save the parsed columns
+# of data files and memory map them on later loads, and SEMIPY_PARSE_CACHE to move the cache
+ParseCache_Path = os.environ.get('SEMIPY_PARSE_CACHE', os.path.join(os.path.expanduser('~'), '.semipy', 'parse_cache'))
+ParseCache_Max_Size = int(os.environ.get('SEMIPY_PARSE_CACHE_MAX_SIZE', 2**30))
+ParseCache_Enabled = os.environ.get('SEMIPY_PARSE_CACHE_ENABLED', '0') != '0'
+
+# the float dtype of the data stored in the DataSets.  Set SEMIPY_DTYPE=float32 to halve the memory of large collections of data, at the
+# cost of precision (about 7 significant digits, which is more than the instruments measure)
+DataSet_Dtype = os.environ.get('SEMIPY_DTYPE', 'float64')
+
+# the number of worker processes of batch extractions (see SemiPy.Extractors.Transistor.BatchFETExtractor).  0 uses every cpu
+BatchExtraction_Processes = int(os.environ.get('SEMIPY_PROCESSES', 0))
+
+# the on-disk cache of extraction results (see SemiPy.Extractors.ResultCache).  Set SEMIPY_RESULT_CACHE_ENABLED=1 to reuse the results of
+# extractions of the same data and device
+ResultCache_Path = os.environ.get('SEMIPY_RESULT_CACHE', os.path.join(os.path.expanduser('~'), '.semipy', 'result_cache'))
+ResultCache_Max_Size = int(os.environ.get('SEMIPY_RESULT_CACHE_MAX_SIZE', 2**30))
+ResultCache_Enabled = os.environ.get('SEMIPY_RESULT_CACHE_ENABLED', '0') != '0'
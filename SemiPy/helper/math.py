@@ -15,3 +15,189 @@ def find_nearest_arg(array, value, axis=None):
         return np.argmin(np.abs(array - value))
     else:
         return np.argmin(np.abs(array - value), axis=axis)
+
+
+def searchsorted_rows(array, values, start=None, stop=None, direction=None):
+    """
+    Vectorized np.searchsorted (side='left') over every row of a 2D array at once.  np.searchsorted only works on a single 1D array, so
+    this runs a binary search on all rows together, costing O(rows x log(points)) without a python loop over the rows.
+    Args:
+        array (np.ndarray): 2D array of shape (number of rows, number of points)
+        values (np.ndarray): The value to search for in each row, of shape (number of rows,), or the values of shape (number of rows,
+         number of values)
+        start (np.ndarray): The first index of the sorted segment of each row.  Defaults to 0
+        stop (np.ndarray): The last index (exclusive) of the sorted segment of each row.  Defaults to the number of points
+        direction (np.ndarray): 1 for rows sorted in ascending order and -1 for rows sorted in descending order.  Defaults to 1
+
+    Returns:
+        np.ndarray of the index in each row where each value would be inserted to keep the segment sorted (same shape as values)
+    """
+    values = np.asarray(values, dtype=float)
+    # the arrays of each row are broadcast along the values of the row
+    per_row = (slice(None),) + (np.newaxis,) * (values.ndim - 1)
+    rows = np.arange(array.shape[0])[per_row]
+    lo = np.zeros(shape=values.shape, dtype=int) + (0 if start is None else np.array(start, dtype=int)[per_row])
+    hi = np.zeros(shape=values.shape, dtype=int) + (array.shape[1] if stop is None else np.array(stop, dtype=int)[per_row])
+    direction = 1.0 if direction is None else np.asarray(direction)[per_row]
+    values = values * direction
+
+    for _ in range(int(np.ceil(np.log2(array.shape[1] + 1))) + 1):
+        active = lo < hi
+        mid = np.minimum((lo + hi) // 2, array.shape[1] - 1)
+        go_right = active & (array[rows, mid] * direction < values)
+        lo = np.where(go_right, mid + 1, lo)
+        hi = np.where(active & ~go_right, mid, hi)
+    return lo
+
+
+def find_nearest_sorted_arg(array, values, start=None, stop=None, direction=None):
+    """
+    Same as find_nearest_arg for every row of a 2D array, but uses searchsorted_rows on rows that are sorted between start and stop.  If
+    two points are equally close, the lower index is returned (the same as np.argmin).
+    Args:
+        array (np.ndarray): 2D array of shape (number of rows, number of points)
+        values (np.ndarray): The value to find in each row, of shape (number of rows,)
+        start (np.ndarray): The first index of the sorted segment of each row.  Defaults to 0
+        stop (np.ndarray): The last index (exclusive) of the sorted segment of each row.  Defaults to the number of points
+        direction (np.ndarray): 1 for rows sorted in ascending order and -1 for rows sorted in descending order.  Defaults to 1
+
+    Returns:
+        np.ndarray of the index of the nearest value in each row
+    """
+    rows = np.arange(array.shape[0])
+    start = np.zeros(shape=rows.shape, dtype=int) if start is None else np.array(start, dtype=int)
+    stop = np.full(shape=rows.shape, fill_value=array.shape[1], dtype=int) if stop is None else np.array(stop, dtype=int)
+    values = np.asarray(values, dtype=float)
+
+    index = searchsorted_rows(array, values, start, stop, direction)
+    # the nearest value is either just before or at the insertion index
+    after = np.clip(index, start, stop - 1)
+    before = np.clip(index - 1, start, stop - 1)
+    use_before = np.abs(array[rows, before] - values) <= np.abs(array[rows, after] - values)
+    nearest = np.where(use_before, before, after)
+    # if the nearest value is repeated, use its first index
+    return searchsorted_rows(array, array[rows, nearest], start, stop, direction)
+
+
+def find_sweep_changes(array):
+    """
+    Find the points where the sweep direction changes along the last axis of the array.  The direction is the sign of each step with
+    the zero steps (i.e. a repeated final point) dropped, so the change is found with or without a repeated final point.  The final
+    point is kept with the sweep it ends, i.e. Vg = [1, 2, 3, 3, 2, 1] => [3] so the sweeps are [1, 2, 3] and [3, 2, 1], and
+    Vg = [0, 1, 2, 1, 0] => [3] so the sweeps are [0, 1, 2] and [1, 0]
+    Args:
+        array (np.ndarray): The swept values
+
+    Returns:
+        np.ndarray from np.argwhere with the index of the first point of each new sweep in the last column
+    """
+    steps = np.sign(np.diff(array, axis=-1))
+    # the index of every non zero step, in order along the last axis of each row
+    step_i = np.argwhere((steps != 0) & ~np.isnan(steps))
+    step_signs = steps[tuple(step_i.T)]
+    # the direction changes between consecutive non zero steps of the same row with different signs
+    same_row = np.all(step_i[1:, :-1] == step_i[:-1, :-1], axis=-1)
+    change_i = step_i[:-1][same_row & (step_signs[1:] != step_signs[:-1])]
+    # only the index along the last axis is shifted, from the last step of the sweep to the point after its final point
+    change_i[:, -1] += 2
+    return change_i
+
+
+def find_affine_grid(array, start, stop, rtol=1e-6):
+    """
+    Check which segments of the rows of a 2D array are affine grids (i.e. np.linspace sweeps), so that value[k] = first + k * step
+    within a tolerance of rtol times the span of the segment.  The segments of each row must be in order and must not overlap, so every
+    point is checked once for all of the segments at the same time
+    Args:
+        array (np.ndarray): 2D array of shape (number of rows, number of points)
+        start (np.ndarray): The first index of every segment of shape (number of rows, number of segments)
+        stop (np.ndarray): The last index (exclusive) of every segment of shape (number of rows, number of segments)
+        rtol (float): The tolerance relative to the span of each segment
+
+    Returns:
+        (first, step) arrays of shape (number of rows, number of segments) with the first value and step of each segment, which are nan
+        for the segments that are not affine grids
+    """
+    num_rows, num_points = array.shape
+    rows = np.arange(num_rows)[:, np.newaxis]
+    start, stop = np.asarray(start, dtype=int), np.asarray(stop, dtype=int)
+    count = stop - start
+
+    first = array[rows, np.minimum(start, num_points - 1)]
+    span = array[rows, np.clip(stop - 1, 0, num_points - 1)] - first
+    with np.errstate(divide='ignore', invalid='ignore'):
+        step = span / (count - 1)
+    affine = (count >= 2) & (step != 0) & ~np.isnan(step)
+
+    # the segment of every point, found from the start of the segments in the flattened array
+    flat_start, flat_stop = (start + rows * num_points).ravel(), (stop + rows * num_points).ravel()
+    points = np.arange(array.size)
+    segment = np.maximum(np.searchsorted(flat_start, points, side='right') - 1, 0)
+    in_segment = (points >= flat_start[segment]) & (points < flat_stop[segment])
+    residual = array.ravel() - (first.ravel()[segment] + (points - flat_start[segment]) * step.ravel()[segment])
+    # a segment with any point off of its grid is not affine
+    off_grid = in_segment & ~(np.abs(residual) <= rtol * np.abs(span.ravel()[segment]))
+    affine &= np.bincount(segment[off_grid], minlength=affine.size).reshape(affine.shape) == 0
+    return np.where(affine, first, np.nan), np.where(affine, step, np.nan)
+
+
+def affine_grid_arg(first, step, count, values):
+    """
+    Same as find_nearest_arg for an affine grid, but computes the index directly in O(1).  If two points are equally close, the lower
+    index is returned (the same as np.argmin)
+    Args:
+        first (float or np.ndarray): The first value of the grid
+        step (float or np.ndarray): The step of the grid
+        count (int or np.ndarray): The number of points of the grid
+        values (float or np.ndarray): The values to find
+
+    Returns:
+        np.ndarray of the index of the nearest grid point
+    """
+    index = np.ceil((np.asarray(values, dtype=float) - first) / step - 0.5)
+    return np.clip(index, 0, np.asarray(count) - 1).astype(int)
+
+
+def interp_rows(x, ys, grid, start=None, stop=None):
+    """
+    Batched np.interp of every row of 2D arrays onto a grid, where x is sorted (in ascending or descending order) between start and stop
+    of each row.  The grid indices of all rows are found with one searchsorted_rows call and reused for every y array.
+    Args:
+        x (np.ndarray): The x data of shape (number of rows, number of points)
+        ys (list): The y arrays of shape (number of rows, number of points) to interpolate
+        grid (np.ndarray): The x values to interpolate to, of shape (number of grid points,) for a common grid or (number of rows,
+         number of grid points)
+        start (np.ndarray): The first index of the sorted segment of each row.  Defaults to 0
+        stop (np.ndarray): The last index (exclusive) of the sorted segment of each row.  Defaults to the number of points
+
+    Returns:
+        list of the interpolated ys of shape (number of rows, number of grid points).  Grid points outside the x range of a row are nan
+    """
+    x = np.asarray(x, dtype=float)
+    num_rows = x.shape[0]
+    start = np.zeros(shape=(num_rows,), dtype=int) + (0 if start is None else np.asarray(start, dtype=int))
+    stop = np.zeros(shape=(num_rows,), dtype=int) + (x.shape[1] if stop is None else np.asarray(stop, dtype=int))
+    grid = np.broadcast_to(np.asarray(grid, dtype=float), (num_rows, np.shape(grid)[-1]))
+
+    rows = np.arange(num_rows)
+    first, last = x[rows, start], x[rows, stop - 1]
+    direction = np.sign(last - first)
+    direction[direction == 0] = 1
+
+    # the grid points lie between the points lower and upper of each row
+    upper = np.clip(searchsorted_rows(x, grid, start, stop, direction), (start + 1)[:, np.newaxis], (stop - 1)[:, np.newaxis])
+    lower = upper - 1
+    rows = rows[:, np.newaxis]
+    x_lower, x_upper = x[rows, lower], x[rows, upper]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(x_upper == x_lower, 0.0, (grid - x_lower) / (x_upper - x_lower))
+    outside = (grid < np.minimum(first, last)[:, np.newaxis]) | (grid > np.maximum(first, last)[:, np.newaxis])
+
+    result = []
+    for y in ys:
+        y = np.asarray(y, dtype=float)
+        y_lower = y[rows, lower]
+        y = y_lower + weight * (y[rows, upper] - y_lower)
+        y[outside] = np.nan
+        result.append(y)
+    return result
@@ -2,25 +2,60 @@
 Simple functions for determining the similarity between words
 """
 import numpy as np
+from functools import lru_cache
 
-memo = {}
 
+@lru_cache(maxsize=4096)
 def levenshtein(s, t):
-    if s == "":
-        return len(t)
-    if t == "":
-        return len(s)
-    cost = 0 if s[-1] == t[-1] else 1
-
-    i1 = (s[:-1], t)
-    if not i1 in memo:
-        memo[i1] = levenshtein(*i1)
-    i2 = (s, t[:-1])
-    if not i2 in memo:
-        memo[i2] = levenshtein(*i2)
-    i3 = (s[:-1], t[:-1])
-    if not i3 in memo:
-        memo[i3] = levenshtein(*i3)
-    res = min([memo[i1]+1, memo[i2]+1, memo[i3]+cost])
-
-    return res
+    """
+    The levenshtein (edit) distance between two words, computed with two rows of the dynamic programming table so the memory is
+    O(len(t)).  The most recent results are cached.
+    Args:
+        s (str): The first word
+        t (str): The second word
+
+    Returns:
+        int of the number of single character edits to change s into t
+    """
+    previous = list(range(len(t) + 1))
+    for i in range(1, len(s) + 1):
+        current = [i]
+        for j in range(1, len(t) + 1):
+            cost = 0 if s[i - 1] == t[j - 1] else 1
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost))
+        previous = current
+    return previous[-1]
+
+
+def levenshtein_batch(s, words):
+    """
+    The levenshtein distance between a word and every word in a list.  All words are scored at once by running the dynamic
+    programming over a padded array of the words, so the cost is O(len(s) x max word length) numpy operations.
+    Args:
+        s (str): The word to compare
+        words (list): The words to compare s against
+
+    Returns:
+        np.ndarray of the distance between s and each word
+    """
+    words = list(words)
+    if len(words) == 0:
+        return np.zeros(shape=(0,), dtype=int)
+
+    lengths = np.array([len(word) for word in words])
+    # the unicode code points of the words, padded with -1 (which never matches a character)
+    codes = np.full(shape=(len(words), lengths.max()), fill_value=-1, dtype=np.int64)
+    for k, word in enumerate(words):
+        codes[k, :len(word)] = [ord(c) for c in word]
+
+    previous = np.tile(np.arange(codes.shape[1] + 1), (len(words), 1))
+    for i in range(1, len(s) + 1):
+        cost = (codes != ord(s[i - 1])).astype(int)
+        current = np.empty_like(previous)
+        current[:, 0] = i
+        # the substitution and deletion costs do not depend on the current row, so only the insertions run along the words
+        current[:, 1:] = np.minimum(previous[:, 1:] + 1, previous[:, :-1] + cost)
+        for j in range(1, codes.shape[1] + 1):
+            current[:, j] = np.minimum(current[:, j], current[:, j - 1] + 1)
+        previous = current
+    return previous[np.arange(len(words)), lengths]